@@ -0,0 +1,359 @@
+# batch.py
+
+"""
+Headless batch calculation of LCA scores, eg. to precompute the scores of a whole product catalog overnight.
+
+Reuses `PanelLCA` (database, SPARQL ingestion, LCA, graph traversal and scope analysis) without Panel or Plotly.
+Jobs are the combinations of product labels, methods (impact category abbreviations, eg. `GCC`) and amounts,
+or the rows of a CSV file with the columns `product`, `method`, `amount` and optionally `cutoff`.
+
+All products are ingested first, in this process; the calculations then run in a pool of worker processes,
+which only read the database. Every result is appended to the output file as soon as it arrives
+(CSV: one row at a time; Parquet: one part file per `--flush-every` results in the output directory).
+When restarted with the same output, jobs which already have a result are skipped;
+failed jobs (with an `error`) are only repeated with `--retry-failed`.
+
+Usage (from the `app` directory):
+
+    python batch.py --products-file products.txt --methods GCC ACID --amounts 100 --output results.csv --workers 4
+    python batch.py --jobs jobs.csv --output results.parquet
+"""
+
+import os
+import csv
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import bw2data as bd
+from constants import DATABASE_NAME
+from lca_model import PanelLCA, GRAPH_TRAVERSAL_ENGINES
+from utils import create_sanitized_key
+from export import is_pyarrow_available
+
+# Columns identifying a job; a job is skipped if the output already contains a row with the same values
+JOB_KEY_COLUMNS = ['product', 'method', 'amount', 'cutoff']
+
+RESULT_COLUMNS = JOB_KEY_COLUMNS + [
+    'engine', 'score', 'unit', 'scope_1', 'scope_2', 'scope_3', 'nodes', 'wall_time_s', 'error',
+]
+
+
+def get_job_key(job: dict) -> tuple:
+    return (str(job['product']), str(job['method']), float(job['amount']), float(job['cutoff']))
+
+
+def create_jobs(products: list, methods: list, amounts: list, cutoff: float) -> pd.DataFrame:
+    """
+    Returns all combinations of products, methods and amounts as job table.
+    """
+    return pd.DataFrame(
+        [
+            {'product': product, 'method': method, 'amount': float(amount), 'cutoff': float(cutoff)}
+            for product, method, amount in itertools.product(products, methods, amounts)
+        ],
+        columns=JOB_KEY_COLUMNS,
+    )
+
+
+def read_jobs(path: str, cutoff: float) -> pd.DataFrame:
+    """
+    Reads a job table from a CSV file with the columns `product`, `method`, `amount` and optionally `cutoff`.
+    """
+    df = pd.read_csv(path, dtype={'product': str, 'method': str})
+    missing = [column for column in ['product', 'method', 'amount'] if column not in df.columns]
+    if missing:
+        raise ValueError(f'The job file {path} lacks the columns {missing}.')
+    if 'cutoff' not in df.columns:
+        df['cutoff'] = cutoff
+    df['amount'] = df['amount'].astype(float)
+    df['cutoff'] = df['cutoff'].astype(float)
+    return df[JOB_KEY_COLUMNS]
+
+
+class CSVResultWriter:
+    """
+    Appends results to a CSV file, one row at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> pd.DataFrame:
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) == 0:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        return pd.read_csv(self.path, dtype={'product': str, 'method': str, 'error': str})
+
+    def write(self, row: dict):
+        write_header = not os.path.isfile(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS)
+            if write_header:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def close(self):
+        pass
+
+
+class ParquetResultWriter:
+    """
+    Writes results to a directory of Parquet part files, which can be read as a single table
+    (eg. with `pd.read_parquet(path)`). Results are buffered and written every `flush_every` rows;
+    a restart only repeats the jobs of the buffer.
+    """
+
+    def __init__(self, path: str, flush_every: int = 100):
+        if not is_pyarrow_available():
+            raise ImportError('Parquet output requires the optional dependency `pyarrow`.')
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer = []
+
+    def get_part_paths(self) -> list:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.startswith('part-') and name.endswith('.parquet')
+        )
+
+    def read(self) -> pd.DataFrame:
+        parts = self.get_part_paths()
+        if not parts:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+    def write(self, row: dict):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        number = len(self.get_part_paths())
+        path_part = os.path.join(self.path, f'part-{number:05d}.parquet')
+        df = pd.DataFrame(self.buffer, columns=RESULT_COLUMNS).astype({'error': str})
+        # written under a temporary name first, so that an interrupted write never leaves a broken part file
+        df.to_parquet(f'{path_part}.tmp', index=False, engine='pyarrow')
+        os.replace(f'{path_part}.tmp', path_part)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+
+def create_result_writer(path: str, flush_every: int = 100):
+    if path.endswith('.parquet'):
+        return ParquetResultWriter(path, flush_every=flush_every)
+    if path.endswith('.csv'):
+        return CSVResultWriter(path)
+    raise ValueError(f"Unknown output format of '{path}'. Use a '.csv' file or a '.parquet' directory.")
+
+
+def get_completed_keys(df_results: pd.DataFrame, retry_failed: bool) -> set:
+    if retry_failed:
+        df_results = df_results[df_results['error'].isna() | (df_results['error'].astype(str).isin(['', 'nan', 'None']))]
+    return {get_job_key(row) for row in df_results[JOB_KEY_COLUMNS].to_dict('records')}
+
+
+def ingest_products(panel_lca: PanelLCA, products: list) -> dict:
+    """
+    Ingests the supply chains of `products` (labels) into the database, one after the other.
+    Products whose node already exists (eg. from a previous run) are not ingested again.
+
+    Returns
+    -------
+    dict
+        Dictionary mapping every product label to the code of its node,
+        or to the error message if the product could not be ingested.
+    """
+    dict_codes = {}
+    for product in products:
+        src = panel_lca.dict_label_to_src.get(product)
+        if src is None:
+            dict_codes[product] = ValueError(f"The src value for '{product}' could not be found.")
+            continue
+        code = create_sanitized_key(src)
+        try:
+            bd.get_node(database=panel_lca.db_name, code=code)
+        except Exception:
+            try:
+                code = panel_lca.get_src_and_get_technosphere_and_biosphere(product)['code']
+            except Exception as error:
+                dict_codes[product] = error
+                continue
+        dict_codes[product] = code
+    return dict_codes
+
+
+# `PanelLCA` instance of a worker process (see `initialize_worker`)
+_panel_lca = None
+
+
+def create_panel_lca(db_name: str) -> PanelLCA:
+    panel_lca = PanelLCA()
+    panel_lca.db_name = db_name
+    bd.projects.set_current(db_name)
+    panel_lca.db = bd.Database(db_name)
+    panel_lca.set_methods_objects()
+    return panel_lca
+
+
+def initialize_worker(db_name: str):
+    global _panel_lca
+    _panel_lca = create_panel_lca(db_name)
+
+
+def calculate(job: dict, code: str, engine: str, panel_lca: PanelLCA = None) -> dict:
+    """
+    Calculates the LCA score and scope totals of a job. Errors are returned in the `error` column.
+
+    Parameters
+    ----------
+    job : dict
+        Job with the keys `product`, `method`, `amount` and `cutoff` (in %, as in the app).
+    code : str
+        Code of the product node.
+    engine : str
+        Graph traversal engine (see `lca_model.GRAPH_TRAVERSAL_ENGINES`).
+    panel_lca : PanelLCA
+        Instance to use; by default the instance of the worker process.
+    """
+    panel_lca = panel_lca or _panel_lca
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update({key: job[key] for key in JOB_KEY_COLUMNS})
+    row['engine'] = engine
+    start = time.perf_counter()
+    try:
+        method, name, unit = panel_lca.dict_db_methods[job['method']]
+        panel_lca.chosen_activity = bd.get_node(database=panel_lca.db_name, code=code)
+        panel_lca.set_chosen_method_and_unit((job['method'], name, unit))
+        panel_lca.set_chosen_amount(float(job['amount']))
+        panel_lca.perform_lca()
+        panel_lca.set_graph_traversal_cutoff(float(job['cutoff']) / 100)
+        panel_lca.set_graph_traversal_engine(engine)
+        panel_lca.perform_graph_traversal()
+        panel_lca.set_df_tabulator_from_traversal()
+        panel_lca.perform_scope_analysis(df=panel_lca.df_tabulator)
+        row.update({
+            'score': float(panel_lca.lca.score),
+            'unit': unit,
+            'scope_1': float(panel_lca.scope_dict['Scope 1']),
+            'scope_2': float(panel_lca.scope_dict['Scope 2']),
+            'scope_3': float(panel_lca.scope_dict['Scope 3']),
+            'nodes': len(panel_lca.df_traversal),
+        })
+    except Exception as error:
+        row['error'] = f'{type(error).__name__}: {error}'
+    row['wall_time_s'] = time.perf_counter() - start
+    return row
+
+
+def run_batch(
+        df_jobs: pd.DataFrame,
+        writer,
+        db_name: str = DATABASE_NAME,
+        engine: str = 'bw_graph_tools',
+        workers: int = 1,
+        retry_failed: bool = False,
+    ) -> dict:
+    """
+    Runs all jobs which do not have a result in the output of `writer` yet.
+
+    Returns
+    -------
+    dict
+        Number of jobs `skipped` (already done), `completed` and `failed`.
+    """
+    completed_keys = get_completed_keys(writer.read(), retry_failed=retry_failed)
+    jobs = [job for job in df_jobs.to_dict('records') if get_job_key(job) not in completed_keys]
+    counts = {'skipped': len(df_jobs) - len(jobs), 'completed': 0, 'failed': 0}
+    if not jobs:
+        return counts
+
+    panel_lca = PanelLCA()
+    panel_lca.db_name = db_name
+    panel_lca.set_db()
+    panel_lca.set_list_db_products()
+    dict_codes = ingest_products(panel_lca, list(dict.fromkeys(job['product'] for job in jobs)))
+    # the database is processed once here, so that the workers only read it
+    panel_lca.db.process()
+
+    def record(row: dict):
+        writer.write(row)
+        counts['failed' if row['error'] else 'completed'] += 1
+
+    runnable = []
+    for job in jobs:
+        code = dict_codes[job['product']]
+        if isinstance(code, Exception):
+            row = dict.fromkeys(RESULT_COLUMNS)
+            row.update({key: job[key] for key in JOB_KEY_COLUMNS}, engine=engine, error=f'{type(code).__name__}: {code}')
+            record(row)
+        else:
+            runnable.append((job, code))
+
+    try:
+        if workers <= 1:
+            panel_lca = create_panel_lca(db_name)
+            for job, code in runnable:
+                record(calculate(job, code, engine, panel_lca=panel_lca))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker, initargs=(db_name,)) as executor:
+                futures = [executor.submit(calculate, job, code, engine) for job, code in runnable]
+                for future in as_completed(futures):
+                    record(future.result())
+    finally:
+        writer.close()
+    return counts
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=str, default=None, help='CSV file with the columns product, method, amount (and cutoff).')
+    parser.add_argument('--products', type=str, nargs='+', default=[], help='Product labels.')
+    parser.add_argument('--products-file', type=str, default=None, help='Text file with one product label per line.')
+    parser.add_argument('--methods', type=str, nargs='+', default=['GCC'], help='Impact category abbreviations.')
+    parser.add_argument('--amounts', type=float, nargs='+', default=[100])
+    parser.add_argument('--cutoff', type=float, default=10, help='Graph traversal cut-off in %%.')
+    parser.add_argument('--engine', type=str, default='bw_graph_tools', choices=GRAPH_TRAVERSAL_ENGINES)
+    parser.add_argument('--database', type=str, default=DATABASE_NAME)
+    parser.add_argument('--output', type=str, required=True, help="A '.csv' file or a '.parquet' directory.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--flush-every', type=int, default=100, help='Results per Parquet part file.')
+    parser.add_argument('--retry-failed', action='store_true', help='Repeat jobs which failed in a previous run.')
+    args = parser.parse_args(argv)
+
+    products = list(args.products)
+    if args.products_file:
+        with open(args.products_file, encoding='utf-8') as file:
+            products += [line.strip() for line in file if line.strip()]
+    if args.jobs:
+        df_jobs = read_jobs(args.jobs, cutoff=args.cutoff)
+    elif products:
+        df_jobs = create_jobs(products, args.methods, args.amounts, args.cutoff)
+    else:
+        parser.error('Provide --jobs, --products or --products-file.')
+
+    start = time.perf_counter()
+    counts = run_batch(
+        df_jobs=df_jobs,
+        writer=create_result_writer(args.output, flush_every=args.flush_every),
+        db_name=args.database,
+        engine=args.engine,
+        workers=args.workers,
+        retry_failed=args.retry_failed,
+    )
+    print(
+        f"{len(df_jobs)} jobs: {counts['completed']} completed, {counts['failed']} failed, "
+        f"{counts['skipped']} skipped (already done) in {time.perf_counter() - start:,.1f} s"
+    )
+
+
+if __name__ == '__main__':
+    main()
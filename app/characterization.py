@@ -0,0 +1,162 @@
+# characterization.py
+
+import os
+from functools import lru_cache
+
+import pandas as pd
+import bw2data as bd
+from bw2data.backends import ActivityDataset
+from bw2data.errors import MissingIntermediateData
+
+PATH_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_data')
+
+# Table of characterization factors, with the columns
+# `method` (components of the method tuple separated by '|'), `flow` (name of the elementary flow),
+# `category` (compartment of the flow; empty for all compartments) and `factor`.
+# By default the IPCC AR6 GWP100 factors of the most common greenhouse gases for the method `('IPCC',)`;
+# another table can be chosen with the environment variable `LCA_CHARACTERIZATION_FACTORS`.
+PATH_CHARACTERIZATION_FACTORS = os.path.join(PATH_DATA, 'characterization_factors.csv')
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """
+    Returns the normalized form of flow names or categories used to match them:
+    lower case, without any characters other than letters and digits.
+
+    Flow nodes created from SPARQL results are named by their sanitized key (see `utils.create_sanitized_key`),
+    eg. `'Carbondioxidefossil'` for `'Carbon dioxide, fossil'`; both have the same normalized form.
+    """
+    return names.fillna('').astype(str).str.lower().str.replace(r'[^a-z0-9]', '', regex=True)
+
+
+def get_characterization_factors_path(path: str = None) -> str:
+    return path or os.environ.get('LCA_CHARACTERIZATION_FACTORS', PATH_CHARACTERIZATION_FACTORS)
+
+
+@lru_cache(maxsize=4)
+def _load_characterization_factors(path: str, modified: float) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype={'method': str, 'flow': str, 'category': str}, keep_default_na=False)
+    df['method'] = [tuple(part.strip() for part in method.split('|')) for method in df['method']]
+    df['factor'] = df['factor'].astype(float)
+    df['name_key'] = normalize_names(df['flow'])
+    df['category_key'] = normalize_names(df['category'])
+    return df
+
+
+def load_characterization_factors(path: str = None) -> pd.DataFrame:
+    """
+    Loads a table of characterization factors (see `PATH_CHARACTERIZATION_FACTORS`)
+    and adds the normalized flow names and categories (columns `name_key` and `category_key`).
+    The table is read once per process, and again only if the file has been modified.
+    """
+    path = get_characterization_factors_path(path)
+    return _load_characterization_factors(path, os.path.getmtime(path))
+
+
+def get_flows(db_name: str) -> pd.DataFrame:
+    """
+    Returns the elementary flows of a database (all nodes which are not processes or products)
+    with their ids, names and categories, using a single database query.
+    """
+    rows = ActivityDataset.select(ActivityDataset.id, ActivityDataset.name, ActivityDataset.data).where(
+        (ActivityDataset.database == db_name)
+        & (ActivityDataset.type.not_in(bd.labels.lci_node_types + bd.labels.other_node_types))
+    )
+    return pd.DataFrame(
+        [(row.id, row.name, tuple(row.data.get('categories') or ())) for row in rows],
+        columns=['id', 'name', 'categories'],
+    )
+
+
+def get_existing_ids(ids: list) -> set:
+    """
+    Returns the ids of the list which belong to nodes of any database.
+    """
+    existing_ids = set()
+    # queried in chunks, below the limit of SQLite query parameters
+    for start in range(0, len(ids), 900):
+        rows = ActivityDataset.select(ActivityDataset.id).where(ActivityDataset.id.in_(ids[start:start + 900]))
+        existing_ids.update(row.id for row in rows)
+    return existing_ids
+
+
+def map_characterization_factors(df_flows: pd.DataFrame, df_factors: pd.DataFrame) -> pd.DataFrame:
+    """
+    Matches elementary flows to characterization factors by their normalized names,
+    with one join over all flows instead of a string comparison per flow.
+
+    Factors for a specific category apply to flows which have this category at any level
+    and take precedence over factors for all categories.
+
+    Parameters
+    ----------
+    df_flows : pd.DataFrame
+        Elementary flows, see `get_flows`.
+    df_factors : pd.DataFrame
+        Characterization factors, see `load_characterization_factors`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns 'method', 'id' and 'factor'; one row per method and characterized flow.
+    """
+    df_flows = df_flows[['id', 'name', 'categories']].assign(name_key=normalize_names(df_flows['name']))
+    is_specific = df_factors['category_key'] != ''
+    df_general = df_flows.merge(df_factors.loc[~is_specific, ['method', 'name_key', 'factor']], on='name_key')
+    df_categories = df_flows[['id', 'name_key', 'categories']].explode('categories')
+    df_categories['category_key'] = normalize_names(df_categories['categories'])
+    df_specific = df_categories.merge(
+        df_factors.loc[is_specific, ['method', 'name_key', 'category_key', 'factor']],
+        on=['name_key', 'category_key'],
+    )
+    df = pd.concat([df_specific[['method', 'id', 'factor']], df_general[['method', 'id', 'factor']]], ignore_index=True)
+    return df.drop_duplicates(subset=['method', 'id'], keep='first').reset_index(drop=True)
+
+
+def characterize_database(db_name: str, path: str = None) -> dict:
+    """
+    Sets the characterization factors of all elementary flows of a database
+    in the methods of a table of characterization factors (see `load_characterization_factors`).
+
+    Every method is written once, and only if its factors changed.
+    Factors of flows of other databases are kept; methods which do not exist yet are registered.
+
+    Parameters
+    ----------
+    db_name : str
+        Name of the database.
+    path : str
+        Table of characterization factors. By default, `PATH_CHARACTERIZATION_FACTORS`.
+
+    Returns
+    -------
+    dict
+        Statistics: numbers of elementary flows, characterized flows and written methods.
+    """
+    df_flows = get_flows(db_name)
+    df_factors = load_characterization_factors(path)
+    df_mapped = map_characterization_factors(df_flows, df_factors)
+    dict_mapped = {method_name: df for method_name, df in df_mapped.groupby('method', sort=False)}
+    flow_ids = set(df_flows['id'].tolist())
+    number_of_written_methods = 0
+    for method_name in df_factors['method'].unique():
+        df_method = dict_mapped.get(method_name, df_mapped.iloc[:0])
+        method = bd.Method(method_name)
+        if not method.registered:
+            method.register(description=f'Characterization factors from {os.path.basename(get_characterization_factors_path(path))}')
+        try:
+            existing = [(flow, cf.get('amount') if isinstance(cf, dict) else cf) for flow, cf in method.load()]
+        except MissingIntermediateData:
+            existing = []
+        # factors of flows of other databases are kept, unless these flows have been deleted
+        other_flow_ids = get_existing_ids([flow for flow, _ in existing if flow not in flow_ids])
+        factors = [(flow, cf) for flow, cf in existing if flow in other_flow_ids]
+        factors += list(zip(df_method['id'].tolist(), df_method['factor'].tolist()))
+        if sorted(factors) != sorted(existing):
+            method.write(factors)
+            number_of_written_methods += 1
+    return {
+        'flows': len(df_flows),
+        'characterized_flows': df_mapped['id'].nunique(),
+        'written_methods': number_of_written_methods,
+    }
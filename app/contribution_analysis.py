@@ -0,0 +1,86 @@
+# contribution_analysis.py
+
+import numpy as np
+import pandas as pd
+
+# Number of activities and flows listed by default
+CONTRIBUTION_TOP_K = 10
+
+
+def top_k_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the positions of the `k` largest absolute values of `scores`, sorted by decreasing absolute value.
+    Only these `k` values are sorted; all others are separated with a single partition.
+    """
+    scores = np.asarray(scores)
+    if k <= 0 or not len(scores):
+        return np.array([], dtype=np.int64)
+    if k >= len(scores):
+        candidates = np.arange(len(scores))
+    else:
+        candidates = np.argpartition(-np.abs(scores), k - 1)[:k]
+    return candidates[np.argsort(-np.abs(scores[candidates]), kind='stable')]
+
+
+def top_k_contributions(scores: np.ndarray, reversed_dict, k: int, total_score: float) -> pd.DataFrame:
+    """
+    Returns the `k` largest contributions as dataframe with the columns 'Rank', 'id', 'Score' and 'Share [%]'.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        Score of every matrix row or column.
+    reversed_dict : mapping
+        Mapping from matrix indices to database ids, eg. `lca.dicts.activity.reversed`.
+    k : int
+        Number of contributions.
+    total_score : float
+        Total LCA score, used for the shares.
+    """
+    positions = top_k_positions(scores, k)
+    return pd.DataFrame({
+        'Rank': np.arange(1, len(positions) + 1),
+        'id': np.array([reversed_dict[position] for position in positions.tolist()], dtype=np.int64),
+        'Score': scores[positions],
+        'Share [%]': scores[positions] / total_score * 100 if total_score else np.zeros(len(positions)),
+    })
+
+
+def contribution_analysis(lca, k: int = CONTRIBUTION_TOP_K) -> dict:
+    """
+    Determines the activities and elementary flows contributing most to the score of an LCA.
+
+    The direct contribution of every activity (column) and every flow (row) of the characterized inventory
+    is computed with one sparse column sum and one sparse row sum;
+    the matrix is never converted to a dense array or enumerated entry by entry.
+    Unlike the graph traversal, the analysis covers the whole supply chain, regardless of any cutoff.
+
+    Parameters
+    ----------
+    lca : bw2calc.LCA
+        LCA object on which `lci()` and `lcia()` have been called.
+    k : int
+        Number of activities and flows returned.
+
+    Returns
+    -------
+    dict
+        Dictionary with the keys `activities` and `flows`,
+        each a dataframe of the `k` largest contributions (see `top_k_contributions`).
+    """
+    characterized_inventory = lca.characterized_inventory
+    total_score = lca.score
+    return {
+        'activities': top_k_contributions(
+            scores=np.asarray(characterized_inventory.sum(axis=0)).ravel(),
+            reversed_dict=lca.dicts.activity.reversed,
+            k=k,
+            total_score=total_score,
+        ),
+        'flows': top_k_contributions(
+            scores=np.asarray(characterized_inventory.sum(axis=1)).ravel(),
+            reversed_dict=lca.dicts.biosphere.reversed,
+            k=k,
+            total_score=total_score,
+        ),
+    }
@@ -0,0 +1,83 @@
+# event_coordinator.py
+
+import panel as pn
+
+
+class EventCoordinator:
+    """
+    Debounces and coalesces the requests of widget event handlers for an expensive calculation.
+
+    Every request replaces the pending one, so that only the latest set of parameters is ever computed.
+    Requests are delayed by `debounce_ms`; every new request within the delay restarts it,
+    so that eg. a series of slider moves or keystrokes leads to a single calculation.
+    A calculation whose memo key equals the key of the last completed calculation is skipped.
+
+    Parameters
+    ----------
+    callback : callable
+        Function performing the calculation. Called as `callback(params, previous_params)`,
+        where `previous_params` are the parameters of the last completed calculation (or `None`),
+        so that the callback can skip the steps whose inputs did not change.
+    memo_key : callable
+        Function returning a hashable key of the effective inputs of a calculation from its parameters.
+    debounce_ms : int
+        Delay in milliseconds between the last request and the start of the calculation.
+    """
+
+    def __init__(self, callback, memo_key, debounce_ms: int = 300):
+        self.callback = callback
+        self.memo_key = memo_key
+        self.debounce_ms = debounce_ms
+        self.pending_params = None
+        self.last_params = None
+        self.periodic_callback = None
+        self.running = False
+
+    def request(self, params: dict, immediate: bool = False):
+        """
+        Requests a calculation with the parameters `params`, replacing any pending request.
+
+        Parameters
+        ----------
+        params : dict
+            Parameters of the calculation.
+        immediate : bool
+            If `True`, the calculation starts without delay (eg. after a button click).
+        """
+        self.pending_params = params
+        self.stop_timer()
+        if immediate or self.running:
+            # a request made during a calculation is picked up as soon as the calculation is done
+            self.flush()
+        else:
+            self.periodic_callback = pn.state.add_periodic_callback(self.flush, period=self.debounce_ms, count=1)
+
+    def stop_timer(self):
+        if self.periodic_callback is not None:
+            self.periodic_callback.stop()
+            self.periodic_callback = None
+
+    def flush(self):
+        """
+        Runs the calculation for the pending request, unless its memo key equals the one of the last calculation.
+        Requests arriving while the calculation runs are coalesced and computed afterwards.
+        """
+        self.stop_timer()
+        if self.running:
+            return
+        self.running = True
+        try:
+            while self.pending_params is not None:
+                params, self.pending_params = self.pending_params, None
+                if self.last_params is not None and self.memo_key(params) == self.memo_key(self.last_params):
+                    continue
+                self.callback(params, self.last_params)
+                self.last_params = params
+        finally:
+            self.running = False
+
+    def invalidate(self):
+        """
+        Forgets the last calculation, so that the next request is computed even if its inputs did not change.
+        """
+        self.last_params = None
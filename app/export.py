@@ -0,0 +1,177 @@
+# export.py
+
+import io
+import gzip
+import tempfile
+import importlib.util
+
+import numpy as np
+import pandas as pd
+from graph_traversal import parent_positions_from_uids
+
+# Formats offered for the table download: label -> (format, file extension)
+# Parquet and Arrow IPC require the optional dependency `pyarrow`.
+EXPORT_FORMATS = {
+    'Parquet': ('parquet', '.parquet'),
+    'Arrow IPC': ('arrow', '.arrow'),
+    'CSV (gzip)': ('csv.gz', '.csv.gz'),
+}
+
+# Rows serialized at once; bounds the memory used on top of the table itself
+EXPORT_CHUNK_SIZE = 50_000
+
+# In-memory size above which the export file is moved to disk
+EXPORT_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Columns which are only meaningful inside the app and are not exported
+EXPORT_EXCLUDED_COLUMNS = ['Branch', 'producer_unique_id']
+
+
+def is_pyarrow_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def available_export_formats() -> dict:
+    """
+    Returns the subset of `EXPORT_FORMATS` which can be written in the current environment.
+    """
+    if is_pyarrow_available():
+        return dict(EXPORT_FORMATS)
+    return {label: value for label, value in EXPORT_FORMATS.items() if value[0] == 'csv.gz'}
+
+
+def iter_chunks(df: pd.DataFrame, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yields consecutive row slices of `df`. The slices are views; the table is not copied.
+    """
+    for start in range(0, len(df), chunk_size):
+        yield start, df.iloc[start:start + chunk_size]
+
+
+def branch_offsets_and_values(uids: np.ndarray, parent_positions: np.ndarray, rows: np.ndarray) -> tuple:
+    """
+    Returns the branches of the nodes at the positions `rows` of a traversal tree
+    as flat arrays of offsets and values, as used by Arrow list arrays.
+
+    The branch of a node is the list of UIDs from the first node below the functional unit
+    down to the node itself (see `graph_traversal.branches_from_parent_uids`).
+    The ancestors of all nodes are resolved together, one tree level per step.
+
+    Parameters
+    ----------
+    uids : np.ndarray
+        UIDs of all nodes of the tree.
+    parent_positions : np.ndarray
+        Position of the parent of every node in `uids`, -1 for nodes without parent.
+    rows : np.ndarray
+        Positions of the nodes whose branches are returned.
+
+    Returns
+    -------
+    tuple
+        `(offsets, values)`; the branch of the i-th node is `values[offsets[i]:offsets[i + 1]]`.
+    """
+    levels = []
+    current = np.asarray(rows, dtype=np.int64)
+    while len(current) and (current >= 0).any():
+        valid = current >= 0
+        levels.append(np.where(valid, uids[np.where(valid, current, 0)], -1))
+        current = np.where(valid, parent_positions[np.where(valid, current, 0)], -1)
+    if not levels:
+        return np.zeros(len(rows) + 1, dtype=np.int32), np.array([], dtype=np.int64)
+    # one row per node, from the top of the tree down to the node; shorter branches are padded with -1 on the left
+    ancestors = np.stack(levels[::-1], axis=1)
+    valid = ancestors >= 0
+    offsets = np.zeros(len(rows) + 1, dtype=np.int32)
+    np.cumsum(valid.sum(axis=1), out=offsets[1:])
+    return offsets, ancestors[valid]
+
+
+def write_csv_gzip(df: pd.DataFrame, file, chunk_size: int = EXPORT_CHUNK_SIZE):
+    with gzip.GzipFile(fileobj=file, mode='wb') as gzip_file:
+        with io.TextIOWrapper(gzip_file, encoding='utf-8', newline='') as text_file:
+            for start, chunk in iter_chunks(df, chunk_size):
+                chunk.to_csv(text_file, index=False, header=(start == 0))
+
+
+def write_arrow(
+        df: pd.DataFrame,
+        file,
+        file_format: str,
+        include_branches: bool = False,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+    ):
+    """
+    Writes `df` as Parquet (one row group per chunk) or Arrow IPC file (one record batch per chunk).
+    If `include_branches` is `True`, a 'Branch' column of type `list<int64>` is added, computed from 'UID' and 'ParentUID'.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table_schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    schema = table_schema
+    if include_branches:
+        schema = schema.append(pa.field('Branch', pa.list_(pa.int64())))
+        uids = df['UID'].to_numpy(dtype=np.int64)
+        parent_positions = parent_positions_from_uids(uids, df['ParentUID'].to_numpy())
+
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(file, schema)
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_file(file, schema)
+        write = writer.write_batch
+    with writer:
+        for start, chunk in iter_chunks(df, chunk_size):
+            table = pa.Table.from_pandas(chunk, schema=table_schema, preserve_index=False)
+            if include_branches:
+                offsets, values = branch_offsets_and_values(uids, parent_positions, np.arange(start, start + len(chunk)))
+                table = table.append_column('Branch', pa.ListArray.from_arrays(pa.array(offsets), pa.array(values)))
+            if file_format == 'parquet':
+                write(table)
+            else:
+                for batch in table.to_batches():
+                    write(batch)
+
+
+def export_table(
+        df: pd.DataFrame,
+        file_format: str,
+        include_branches: bool = False,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+    ):
+    """
+    Writes a supply chain table to a temporary file, chunk by chunk.
+
+    The table is serialized in slices of `chunk_size` rows, so that only one slice is converted at a time.
+    The file is kept in memory up to `EXPORT_SPOOL_SIZE` and spilled to disk beyond.
+    Parent-child relations are exported as the integer column 'ParentUID';
+    Parquet and Arrow IPC files can additionally hold the full branch of every node as list column.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Supply chain table, eg. `PanelLCA.df_tabulator`.
+    file_format : str
+        One of `'parquet'`, `'arrow'` or `'csv.gz'`.
+    include_branches : bool
+        Adds a 'Branch' list column (Parquet and Arrow IPC only). Requires the columns 'UID' and 'ParentUID'.
+    chunk_size : int
+        Number of rows serialized at once.
+
+    Returns
+    -------
+    tempfile.SpooledTemporaryFile
+        The exported file, positioned at its beginning.
+    """
+    df = df.drop(columns=[column for column in EXPORT_EXCLUDED_COLUMNS if column in df.columns])
+    file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    if file_format == 'csv.gz':
+        write_csv_gzip(df, file, chunk_size)
+    elif file_format in ('parquet', 'arrow'):
+        include_branches = include_branches and {'UID', 'ParentUID'} <= set(df.columns)
+        write_arrow(df, file, file_format, include_branches, chunk_size)
+    else:
+        raise ValueError(f"Unknown export format: {file_format}")
+    file.seek(0)
+    return file
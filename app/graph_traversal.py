@@ -0,0 +1,292 @@
+# graph_traversal.py
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from matrix_cache import get_production_exchanges
+
+
+def sparse_graph_traversal(
+        lca,
+        cutoff: float = 5e-3,
+        max_depth: int = None,
+        max_nodes: int = 100000,
+    ) -> dict:
+    """
+    Unrolls the supply chain of the functional unit of an LCA into a tree,
+    following the same "new node each visit" logic as `bgt.NewNodeEachVisitGraphTraversal`.
+
+    Instead of solving one linear system per visited node, the cumulative score per unit of every product
+    is computed once with a single transposed solve. The tree is then expanded level by level:
+    all nodes of one depth are expanded together with one sparse matrix product,
+    and the cutoff is applied to all candidate nodes of a level with a single numpy mask.
+
+    Parameters
+    ----------
+    lca : bw2calc.LCA
+        LCA object on which `lci()` and `lcia()` have been called.
+    cutoff : float
+        Nodes with an absolute cumulative score below `cutoff` times the absolute total score are not added.
+    max_depth : int
+        Maximum depth of the tree. Default is no maximum.
+    max_nodes : int
+        Maximum number of nodes. If a level would exceed the limit,
+        only its nodes with the highest absolute cumulative scores are kept and the traversal stops.
+
+    Returns
+    -------
+    dict
+        Dictionary with keys `nodes` and `edges`, each a dictionary of equal-length numpy arrays.
+
+        `nodes` has the keys `UID`, `ParentUID`, `activity_index`, `product_index`, `activity_datapackage_id`,
+        `SupplyAmount` (activity scaling), `Burden(Direct)`, `Burden(Cumulative)` and `Depth`.
+        Nodes are sorted by UID and every parent comes before its children.
+        The functional unit itself is not a node; the nodes demanded by it have the `ParentUID` -1.
+
+        `edges` has the keys `consumer_unique_id`, `producer_unique_id` and `amount` (product amount).
+    """
+    total_score = lca.score
+    if total_score == 0:
+        raise ValueError("Zero total LCA score makes traversal impossible")
+    cutoff_score = abs(total_score * cutoff)
+
+    technosphere_matrix = lca.technosphere_matrix.tocsc()
+    product_indices, activity_indices = get_production_exchanges(lca.technosphere_mm)
+    producer_of_product = np.full(technosphere_matrix.shape[0], -1, dtype=np.int64)
+    producer_of_product[product_indices] = activity_indices
+    production_amounts = np.zeros(technosphere_matrix.shape[0])
+    production_amounts[product_indices] = np.asarray(technosphere_matrix[product_indices, activity_indices]).ravel()
+
+    # inputs of every activity, as positive amounts, without the production exchanges
+    production_exchanges = sparse.coo_matrix(
+        (production_amounts[product_indices], (product_indices, activity_indices)),
+        shape=technosphere_matrix.shape,
+    )
+    input_matrix = (production_exchanges.tocsc() - technosphere_matrix).tocsr()
+    input_matrix.eliminate_zeros()
+
+    # score per unit activity (direct) and per unit product (cumulative)
+    direct_score_per_activity = np.asarray((lca.characterization_matrix @ lca.biosphere_matrix).sum(axis=0)).ravel()
+    cumulative_score_per_product = spsolve(technosphere_matrix.T.tocsc(), direct_score_per_activity)
+
+    activity_datapackage_ids = np.array(
+        [lca.dicts.activity.reversed[index] for index in range(technosphere_matrix.shape[1])],
+        dtype=np.int64
+    )
+
+    # the functional unit; one node per demanded product
+    frontier_products = np.array([lca.dicts.product[key] for key in lca.demand], dtype=np.int64)
+    frontier_amounts = np.array(list(lca.demand.values()), dtype=float)
+    frontier_parents = np.full(len(frontier_products), -1, dtype=np.int64)
+
+    list_levels = []
+    number_of_nodes = 0
+    depth = 1
+    while len(frontier_products):
+        cumulative_scores = cumulative_score_per_product[frontier_products] * frontier_amounts
+        mask = np.abs(cumulative_scores) >= cutoff_score
+        if number_of_nodes + np.count_nonzero(mask) > max_nodes:
+            candidates = np.flatnonzero(mask)
+            keep = candidates[np.argsort(-np.abs(cumulative_scores[candidates]), kind='stable')[:max_nodes - number_of_nodes]]
+            mask = np.zeros_like(mask)
+            mask[keep] = True
+
+        products = frontier_products[mask]
+        activities = producer_of_product[products]
+        scaling = frontier_amounts[mask] / production_amounts[products]
+        uids = np.arange(number_of_nodes, number_of_nodes + len(products), dtype=np.int64)
+        number_of_nodes += len(products)
+
+        list_levels.append({
+            'UID': uids,
+            'ParentUID': frontier_parents[mask],
+            'activity_index': activities,
+            'product_index': products,
+            'activity_datapackage_id': activity_datapackage_ids[activities],
+            'SupplyAmount': scaling,
+            'Burden(Direct)': direct_score_per_activity[activities] * scaling,
+            'Burden(Cumulative)': cumulative_scores[mask],
+            'Depth': np.full(len(products), depth, dtype=np.int64),
+            'amount': frontier_amounts[mask],
+        })
+
+        if number_of_nodes >= max_nodes or (max_depth is not None and depth >= max_depth) or not len(products):
+            break
+
+        # expand all nodes of this level at once: column k of `demand` holds the inputs of node k
+        selection = sparse.csc_matrix(
+            (scaling, (activities, np.arange(len(products)))),
+            shape=(technosphere_matrix.shape[1], len(products)),
+        )
+        demand = (input_matrix @ selection).tocoo()
+        order = np.lexsort((-np.abs(cumulative_score_per_product[demand.row] * demand.data), demand.col))
+        frontier_products = demand.row[order].astype(np.int64)
+        frontier_amounts = demand.data[order]
+        frontier_parents = uids[demand.col[order]]
+        depth += 1
+
+    nodes = {
+        key: np.concatenate([level[key] for level in list_levels]) if list_levels else np.array([])
+        for key in [
+            'UID', 'ParentUID', 'activity_index', 'product_index', 'activity_datapackage_id',
+            'SupplyAmount', 'Burden(Direct)', 'Burden(Cumulative)', 'Depth', 'amount'
+        ]
+    }
+    edges = {
+        'consumer_unique_id': nodes['ParentUID'],
+        'producer_unique_id': nodes['UID'],
+        'amount': nodes.pop('amount'),
+    }
+    return {'nodes': nodes, 'edges': edges}
+
+
+def branches_from_parent_uids(uids: np.ndarray, parent_uids: np.ndarray) -> list:
+    """
+    Returns the branch of every node of a traversal tree,
+    ie. the list of UIDs from the first node below the functional unit down to the node itself.
+
+    Parameters
+    ----------
+    uids : np.ndarray
+        UIDs of the nodes. Every parent must come before its children.
+    parent_uids : np.ndarray
+        UIDs of the parent nodes, -1 for nodes demanded by the functional unit.
+
+    Returns
+    -------
+    list
+        A list of branches (lists of integers), in the same order as `uids`.
+    """
+    dict_branches = {-1: []}
+    branches = []
+    for uid, parent_uid in zip(uids.tolist(), parent_uids.tolist()):
+        branch = dict_branches[parent_uid] + [uid]
+        dict_branches[uid] = branch
+        branches.append(branch)
+    return branches
+
+
+def parent_positions_from_uids(uids: np.ndarray, parent_uids: np.ndarray) -> np.ndarray:
+    """
+    Returns the position of the parent of every node of a traversal tree.
+
+    Parameters
+    ----------
+    uids : np.ndarray
+        UIDs of the nodes.
+    parent_uids : np.ndarray
+        UIDs of the parent nodes, -1 for nodes without parent.
+
+    Returns
+    -------
+    np.ndarray
+        Positions of the parent nodes in `uids`, -1 for nodes without parent (or whose parent is not in `uids`).
+    """
+    uids = np.asarray(uids, dtype=np.int64)
+    parent_uids = np.asarray(parent_uids, dtype=np.int64)
+    if not len(uids):
+        return np.array([], dtype=np.int64)
+    positions = np.full(uids.max() + 1, -1, dtype=np.int64)
+    positions[uids] = np.arange(len(uids))
+    has_parent = (parent_uids >= 0) & (parent_uids <= uids.max())
+    return np.where(has_parent, positions[np.where(has_parent, parent_uids, 0)], -1)
+
+
+def iter_levels(depths: np.ndarray):
+    """
+    Yields the positions of the nodes of a traversal tree, one array per depth level, from the top down.
+    """
+    order = np.argsort(depths, kind='stable')
+    boundaries = np.flatnonzero(np.diff(np.asarray(depths)[order])) + 1
+    yield from np.split(order, boundaries)
+
+
+def mask_traversal_by_cutoff(
+        cumulative_scores: np.ndarray,
+        parent_positions: np.ndarray,
+        depths: np.ndarray,
+        cutoff_score: float,
+    ) -> np.ndarray:
+    """
+    Returns a boolean mask of the nodes of a traversal tree which a traversal at a higher cutoff would have visited:
+    nodes whose absolute cumulative score is at least `cutoff_score` and whose ancestors are all kept as well.
+
+    Parameters
+    ----------
+    cumulative_scores : np.ndarray
+        Cumulative score of every node.
+    parent_positions : np.ndarray
+        Position of the parent of every node in the same arrays, -1 for nodes without parent.
+    depths : np.ndarray
+        Depth of every node.
+    cutoff_score : float
+        Absolute score below which nodes are removed.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask of the kept nodes.
+    """
+    keep = np.abs(cumulative_scores) >= cutoff_score
+    has_parent = parent_positions >= 0
+    for level in iter_levels(depths):
+        level = level[has_parent[level]]
+        keep[level] &= keep[parent_positions[level]]
+    return keep
+
+
+class TraversalCache:
+    """
+    Stores the graph traversal of an LCA at the lowest cutoff requested so far.
+
+    Any higher cutoff for the same LCA and traversal engine is answered by masking the stored tree
+    with the stored cumulative scores (see `mask_traversal_by_cutoff`) instead of traversing the graph again.
+    The result equals a new traversal unless the stored traversal was truncated by its calculation limit.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.lca = None
+        self.engine = None
+        self.cutoff = None
+        self.total_score = None
+        self.df_nodes = None
+        self.parent_positions = None
+
+    def covers(self, lca, engine: str, cutoff: float) -> bool:
+        """
+        Returns `True` if a traversal of `lca` with `engine` at `cutoff` can be answered from the cache.
+        """
+        return self.lca is lca and self.engine == engine and self.cutoff is not None and cutoff >= self.cutoff
+
+    def store(self, lca, engine: str, cutoff: float, df_nodes):
+        """
+        Stores a traversal. `df_nodes` must have the columns 'UID', 'ParentUID', 'Depth' and 'Burden(Cumulative)'.
+        """
+        self.lca = lca
+        self.engine = engine
+        self.cutoff = cutoff
+        self.total_score = lca.score
+        self.df_nodes = df_nodes.reset_index(drop=True)
+        self.parent_positions = parent_positions_from_uids(
+            uids=self.df_nodes['UID'].to_numpy(),
+            parent_uids=self.df_nodes['ParentUID'].to_numpy(),
+        )
+
+    def get(self, cutoff: float):
+        """
+        Returns the nodes dataframe of the stored traversal at `cutoff`.
+        `cutoff` must not be lower than the cutoff of the stored traversal.
+        If no node is removed, the stored dataframe itself is returned.
+        """
+        keep = mask_traversal_by_cutoff(
+            cumulative_scores=self.df_nodes['Burden(Cumulative)'].to_numpy(),
+            parent_positions=self.parent_positions,
+            depths=self.df_nodes['Depth'].to_numpy(),
+            cutoff_score=abs(self.total_score * cutoff),
+        )
+        if keep.all():
+            return self.df_nodes
+        return self.df_nodes[keep].reset_index(drop=True)
@@ -2,7 +2,7 @@
 
 import panel as pn
 from table_col import table_col
-from management_col import management_col
+from management_col import management_col, sync_profiling_with_location
 from constants import DATABASE_NAME
 
 pn.extension(notifications=True)
@@ -43,3 +43,6 @@ gspec[:, 1:3] = table_col
 
 template.main.append(gspec)
 template.servable()
+
+# the URL query parameter `?profile=true` of every session enables profiling (see `management_col.py`)
+pn.state.onload(sync_profiling_with_location)
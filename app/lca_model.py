@@ -5,11 +5,22 @@ import numpy as np
 import bw2data as bd
 import bw2calc as bc
 from bw2data.errors import UnknownObject
-import bw_graph_tools as bgt
+from bw2data.backends import ActivityDataset, ExchangeDataset
 from bw2data.backends.proxies import Activity
 from utils import brightway_wasm_database_storage_workaround, create_sanitized_key
 from constants import DATABASE_NAME
 from sparql_queries import get_activity_labels, get_biosphere, get_technosphere
+from characterization import characterize_database
+from rdf_import import is_imported_database, get_imported_activity_labels
+from method_registry import get_method_registry
+from graph_traversal import sparse_graph_traversal, branches_from_parent_uids, parent_positions_from_uids, iter_levels, TraversalCache
+from scope_classification import ScopeClassifier, assign_scopes
+from scope_aggregation import ScopeAggregator
+from matrix_what_if import MatrixWhatIf
+from matrix_cache import get_matrix_cache, get_database_content_hash, invalidate_database_content_hash, get_file_hash, CachedMatrixGraphTraversal
+from result_cache import get_result_cache, get_result_key
+from tracing import tracer
+from contribution_analysis import contribution_analysis, CONTRIBUTION_TOP_K
 
 class PanelLCA:
     """
@@ -30,11 +41,17 @@ class PanelLCA:
         self.chosen_amount = 0
         self.lca = None
         self.scope_dict = {'Scope 1': 0, 'Scope 2': 0, 'Scope 3': 0}
+        self.scope_classifier = ScopeClassifier()
+        self.dict_scope_overrides = {}
+        self.scope_aggregator = None
         self.graph_traversal_cutoff = 1
+        self.graph_traversal_engine = 'bw_graph_tools'
         self.graph_traversal = {}
-        self.df_graph_traversal_nodes = None
-        self.df_graph_traversal_edges = None
-        self.df_tabulator_from_traversal = None
+        self.traversal_cache = TraversalCache()
+        self.matrix_what_if = None
+        self.contribution_cache = {}
+        self.contributions = None
+        self.df_traversal = None
         self.df_tabulator_from_user = None
         self.df_tabulator = None
         self.bool_user_provided_data = False
@@ -65,6 +82,7 @@ class PanelLCA:
         )
         co2.save()
         ipcc = bd.Method(('IPCC',))
+        ipcc.register(description='Sample IPCC Method', unit='kg CO2eq')
         ipcc.write([
             (co2.key, {'amount': 1, 'uncertainty_type': 3, 'loc': 1, 'scale': 0.05}),
         ])
@@ -73,8 +91,12 @@ class PanelLCA:
         """
         Sets `list_db_products` to a list of product names (srcLabels) from the database
         and creates a reverse dictionary `dict_label_to_src` mapping each srcLabel to its src.
+        Databases imported from an RDF dump list their own products instead of querying the endpoint.
         """
-        labels = get_activity_labels()  # Get list of dicts with 'src' and 'srcLabel'
+        if is_imported_database(self.db_name):
+            labels = get_imported_activity_labels(self.db_name)
+        else:
+            labels = get_activity_labels()  # Get list of dicts with 'src' and 'srcLabel'
         
         # Extract only the srcLabel values for list_db_products
         self.list_db_products = [label['srcLabel'] for label in labels]
@@ -82,127 +104,188 @@ class PanelLCA:
         # Create a dictionary mapping srcLabel to src for quick reverse lookup
         self.dict_label_to_src = {label['srcLabel']: label['src'] for label in labels}
 
-    def get_src_and_get_technosphere_and_biosphere(self, srcValue):
+    def is_ingested(self, srcValue) -> bool:
+        """
+        Returns whether the complete supply chain of the product with the srcLabel `srcValue` is in the database,
+        so that `get_src_and_get_technosphere_and_biosphere` does not query the SPARQL endpoint.
+        """
+        selected_src = self.dict_label_to_src.get(srcValue)
+        return is_imported_database(self.db_name) or (
+            selected_src is not None and create_sanitized_key(selected_src) in _ingested_activities.get(self.db_name, ())
+        )
+
+    @tracer.traced()
+    def get_src_and_get_technosphere_and_biosphere(self, srcValue, supply_chain: tuple = None):
         """
         Fetches and adds technosphere and biosphere information for the provided srcValue to the Brightway database,
         ensuring nodes and edges are only added if they do not already exist.
+        All elementary flows are added; they are characterized afterwards (see `characterization.characterize_database`).
+
+        The supply chain of an activity contains the supply chains of all its upstream activities;
+        once ingested, none of them is queried again by this process (see `is_ingested`).
 
         Parameters
         ----------
         srcValue : str
             The srcLabel for the selected activity in the database.
+        supply_chain : tuple
+            The results of `get_technosphere` and `get_biosphere` for the activity, if they have been fetched before
+            (see `prefetch.py`). By default, they are queried.
         """
         # Step 1: Extract the `src` from `dict_label_to_src`
         selected_src = self.dict_label_to_src.get(srcValue)
         if not selected_src:
             raise ValueError(f"The src value for '{srcValue}' could not be found.")
 
+        # Databases imported from an RDF dump already contain the supply chains of all products,
+        # the live database those of all activities ingested before
+        if self.is_ingested(srcValue):
+            try:
+                return bd.get_node(database=self.db_name, code=create_sanitized_key(selected_src))
+            except UnknownObject:
+                # the database has been replaced since
+                _ingested_activities.get(self.db_name, set()).clear()
+
         # Initialize database object
         database = bd.Database(self.db_name)
+        # Nodes are looked up once per code, edges already in the database are never added again
+        dict_nodes = {}
+        existing_edges = get_existing_edges(self.db_name)
         
         # Step 2: Query technosphere and biosphere
-        technosphere_data = get_technosphere(selected_src)
-        biosphere_data = get_biosphere(selected_src)
+        if supply_chain is not None:
+            technosphere_data, biosphere_data = supply_chain
+        else:
+            with tracer.span('sparql: get_technosphere') as span:
+                technosphere_data = get_technosphere(selected_src)
+                span.set(rows=len(technosphere_data))
+            with tracer.span('sparql: get_biosphere') as span:
+                biosphere_data = get_biosphere(selected_src)
+                span.set(rows=len(biosphere_data))
         
         # Step 3: Add Technosphere nodes and edges to the Brightway database
         # Inside `get_src_and_get_technosphere_and_biosphere` method
-        for entry in technosphere_data:
-            parent_code = create_sanitized_key(entry['parentElement'])
-            child_code = create_sanitized_key(entry['childElement'])
-            parent_name = entry['parent']
-            child_name = entry['child']
-            parent_location = entry.get('parentLocation', 'GLO')
-            child_location = entry.get('location', 'GLO')
-            parent_unit = entry.get('parentUnit', 'unitless')
-            child_unit = entry.get('unit', 'unitless')
-
-            # Check if parent node exists; if not, create and save it
-            try:
-                parent_node = bd.get_node(database=self.db_name, code=parent_code)
-            except UnknownObject:
-                parent_node = database.new_node(
-                    code=parent_code,
-                    name=parent_name,
-                    categories=('technosphere',),
-                    location=parent_location,
-                    unit=parent_unit,
-                    type='process'
-                )
-                parent_node.save()
-
-            # Check if child node exists; if not, create and save it
-            try:
-                child_node = bd.get_node(database=self.db_name, code=child_code)
-            except UnknownObject:
-                child_node = database.new_node(
-                    code=child_code,
-                    name=child_name,
-                    categories=('technosphere',),
-                    location=child_location,
-                    unit=child_unit,
-                    type='process'
-                )
-                child_node.save()
+        # Nodes are processes with reference product, which have an implicit production exchange of 1
+        with tracer.span('ingestion: technosphere') as span:
+            span.set(rows=len(technosphere_data))
+            for entry in technosphere_data:
+                parent_code = create_sanitized_key(entry['parentElement'])
+                child_code = create_sanitized_key(entry['childElement'])
+                parent_name = entry['parent']
+                child_name = entry['child']
+                parent_location = entry.get('parentLocation', 'GLO')
+                child_location = entry.get('location', 'GLO')
+                parent_unit = entry.get('parentUnit', 'unitless')
+                child_unit = entry.get('unit', 'unitless')
+
+                # Check if parent node exists; if not, create and save it
+                parent_node = dict_nodes.get(parent_code)
+                if parent_node is None:
+                    try:
+                        parent_node = bd.get_node(database=self.db_name, code=parent_code)
+                    except UnknownObject:
+                        parent_node = database.new_node(
+                            code=parent_code,
+                            name=parent_name,
+                            categories=('technosphere',),
+                            location=parent_location,
+                            unit=parent_unit,
+                            type=bd.labels.chimaera_node_default
+                        )
+                        parent_node.save()
+                    dict_nodes[parent_code] = parent_node
+
+                # Check if child node exists; if not, create and save it
+                child_node = dict_nodes.get(child_code)
+                if child_node is None:
+                    try:
+                        child_node = bd.get_node(database=self.db_name, code=child_code)
+                    except UnknownObject:
+                        child_node = database.new_node(
+                            code=child_code,
+                            name=child_name,
+                            categories=('technosphere',),
+                            location=child_location,
+                            unit=child_unit,
+                            type=bd.labels.chimaera_node_default
+                        )
+                        child_node.save()
+                    dict_nodes[child_code] = child_node
             
-            # Add edge using `new_edge` if there is a defined exchange value
-            if 'value' in entry and entry['value']:
-                try:
-                    parent_node.new_edge(
-                        amount=float(entry['value']),
-                        type='technosphere',
-                        input=child_node.key
-                    ).save()
-                except UnknownObject:
-                    print(f"Error adding edge between {parent_code} and {child_code}")
+                # Add edge using `new_edge` if there is a defined exchange value
+                if 'value' in entry and entry['value'] and (parent_code, child_code, 'technosphere') not in existing_edges:
+                    try:
+                        parent_node.new_edge(
+                            amount=float(entry['value']),
+                            type='technosphere',
+                            input=child_node.key
+                        ).save()
+                    except UnknownObject:
+                        print(f"Error adding edge between {parent_code} and {child_code}")
 
         # Similarly, apply try-except in the biosphere section
-        for entry in biosphere_data:
-            parent_code = create_sanitized_key(entry['parentElement'])
-            exchange_name = create_sanitized_key(entry['exchangeName'])
-            exchange_unit = entry.get('unit', 'unitless')
-
-            # Check if biosphere parent node exists; if not, create and save it
-            try:
-                parent_node = bd.get_node(database=self.db_name, code=parent_code)
-            except UnknownObject:
-                parent_node = database.new_node(
-                    code=parent_code,
-                    name=entry['srcLabel'],
-                    categories=('biosphere', entry.get('category', '')),
-                    unit=exchange_unit,
-                    type='emission'
-                )
-                parent_node.save()
-
-            # Check if exchange node exists; if not, create and save it
-            try:
-                exchange_node = bd.get_node(database=self.db_name, code=exchange_name)
-            except UnknownObject:
-                exchange_node = database.new_node(
-                    code=exchange_name,
-                    name=exchange_name,
-                    categories=('biosphere', entry.get('subCategory', '')),
-                    unit=exchange_unit,
-                    type='emission'
-                )
-                exchange_node.save()
+        with tracer.span('ingestion: biosphere') as span:
+            span.set(rows=len(biosphere_data))
+            for entry in biosphere_data:
+                parent_code = create_sanitized_key(entry['parentElement'])
+                exchange_name = create_sanitized_key(entry['exchangeName'])
+                exchange_unit = entry.get('unit', 'unitless')
+
+                # Check if biosphere parent node exists; if not, create and save it
+                parent_node = dict_nodes.get(parent_code)
+                if parent_node is None:
+                    try:
+                        parent_node = bd.get_node(database=self.db_name, code=parent_code)
+                    except UnknownObject:
+                        parent_node = database.new_node(
+                            code=parent_code,
+                            name=entry['srcLabel'],
+                            categories=('biosphere', entry.get('category', '')),
+                            unit=exchange_unit,
+                            type='emission'
+                        )
+                        parent_node.save()
+                    dict_nodes[parent_code] = parent_node
+
+                # Check if exchange node exists; if not, create and save it
+                exchange_node = dict_nodes.get(exchange_name)
+                if exchange_node is None:
+                    try:
+                        exchange_node = bd.get_node(database=self.db_name, code=exchange_name)
+                    except UnknownObject:
+                        exchange_node = database.new_node(
+                            code=exchange_name,
+                            name=exchange_name,
+                            categories=('biosphere', entry.get('subCategory', '')),
+                            unit=exchange_unit,
+                            type='emission'
+                        )
+                        exchange_node.save()
+                    dict_nodes[exchange_name] = exchange_node
             
-            # Add edge if value is present
-            if 'value' in entry and entry['value']:
-                try:
-                    parent_node.new_edge(
-                        amount=float(entry['value']),
-                        type='biosphere',
-                        input=exchange_node.key
-                    ).save()
-                    ipcc = bd.Method(('IPCC',))
-                    ipcc.write([
-                        (exchange_node.key, {'amount': 1, 'uncertainty_type': 3, 'loc': 1, 'scale': 0.05}),
-                    ])
-                except UnknownObject:
-                    print(f"Error adding edge for biosphere {parent_code} and exchange {exchange_name}")
+                # Add edge if value is present
+                if 'value' in entry and entry['value'] and (parent_code, exchange_name, 'biosphere') not in existing_edges:
+                    try:
+                        parent_node.new_edge(
+                            amount=float(entry['value']),
+                            type='biosphere',
+                            input=exchange_node.key
+                        ).save()
+                    except UnknownObject:
+                        print(f"Error adding edge for biosphere {parent_code} and exchange {exchange_name}")
+
+        # Every method is written once for all elementary flows
+        with tracer.span('characterization') as span:
+            statistics = characterize_database(self.db_name)
+            span.set(rows=statistics['flows'])
+        invalidate_database_content_hash()
 
         santized_src = create_sanitized_key(selected_src)
+        _ingested_activities.setdefault(self.db_name, set()).update(
+            [santized_src]
+            + [create_sanitized_key(entry['parentElement']) for entry in technosphere_data]
+            + [create_sanitized_key(entry['childElement']) for entry in technosphere_data]
+        )
         print('loaded whole activity')
         return bd.get_node(
             database=self.db_name,
@@ -213,64 +296,11 @@ class PanelLCA:
     def set_methods_objects(self):
         """
         Sets the methods available in the database.
+        Names and units are looked up in the cached method registry (see `method_registry.py`).
         """
-        dict_methods = {i[-1]: [i] for i in bd.methods}
-
-        dict_methods_names = {
-            "HRSP": "Human Health - Respiratory Effects",
-            "OZON": "Ozone Depletion",
-            "HNC": "Human Health Noncancer",
-            "WATR": "Water",
-            "METL": "Metals",
-            "EUTR": "Eutrophication",
-            "HTOX": "Human Health Cancer and Noncancer",
-            "LAND": "Land",
-            "NREN": "Nonrenewable Energy",
-            "ETOX": "Freshwater Aquatic Ecotoxicity",
-            "PEST": "Pesticides",
-            "REN": "Renewable Energy",
-            "MINE": "Minerals and Metals",
-            "GCC": "Global Climate Change",
-            "ACID": "Acid Rain",
-            "HAPS": "Hazardous Air Pollutants",
-            "HC": "Human Health Cancer",
-            "SMOG": "Smog Formation",
-            "ENRG": "Energy",
-            "IPCC": "Sample IPCC Method"
-        }
-
-        dict_methods_units = {
-            "HRSP": "[kg PM2.5 eq]",
-            "OZON": "[kg O3 eq]",
-            "HNC": "[CTUh]",
-            "WATR": "[m3]",
-            "METL": "[kg]",
-            "EUTR": "[kg N eq]",
-            "HTOX": "[CTUh]",
-            "LAND": "[m2*yr]",
-            "NREN": "[MJ]",
-            "ETOX": "[CTUe]",
-            "PEST": "[kg]",
-            "REN": "[MJ]",
-            "MINE": "[kg]",
-            "GCC": "[kg CO2 eq]",
-            "ACID": "[kg SO2 eq]",
-            "HAPS": "[kg]",
-            "HC": "[CTUh]",
-            "SMOG": "[kg O3 eq]",
-            "ENRG": "[MJ]",
-            "IPCC": "[kg CO2eq]"
-        }
-
-        dict_methods_enriched = {
-            key: [dict_methods[key][0], dict_methods_names[key], dict_methods_units[key]]
-            for key in dict_methods
-        }
-
-        list_methods_for_autocomplete = [(key, value[1], value[2]) for key, value in dict_methods_enriched.items()]
-
-        self.dict_db_methods = dict_methods_enriched
-        self.list_db_methods = list_methods_for_autocomplete
+        method_registry = get_method_registry()
+        self.dict_db_methods = method_registry.dict_db_methods
+        self.list_db_methods = method_registry.list_methods_for_autocomplete
 
     def set_chosen_activity(self, selected_node):
         """
@@ -295,16 +325,141 @@ class PanelLCA:
         """
         self.chosen_amount = amount_value
 
+    @tracer.traced()
     def perform_lca(self):
         """
         Performs the LCA calculation using the chosen product, method, and amount.
+        The matrices are loaded from the on-disk matrix cache if the database has not changed (see `matrix_cache.py`).
+        """
+        with tracer.span('bc.LCA'):
+            self.lca = bc.LCA(
+                demand={self.chosen_activity: self.chosen_amount},
+                method=self.chosen_method.name
+            )
+        with tracer.span('matrix build') as span:
+            matrix_cache = get_matrix_cache()
+            if matrix_cache is None:
+                self.lca.load_lci_data()
+            else:
+                span.set(cache_hit=matrix_cache.load_lci_data(self.lca, [self.chosen_activity['database']]))
+            span.set(rows=self.lca.technosphere_matrix.shape[0])
+        with tracer.span('lci'):
+            self.lca.lci()
+        with tracer.span('lcia'):
+            self.lca.lcia()
+
+    @tracer.traced()
+    def perform_contribution_analysis(self, k: int = CONTRIBUTION_TOP_K) -> dict:
+        """
+        Sets `contributions` to the `k` activities and elementary flows contributing most to the LCA score,
+        with their names (see `contribution_analysis.contribution_analysis`).
+
+        Results are cached per activity, method and amount. After an exact what-if update,
+        the LCA no longer matches these inputs; its contributions are computed, but not cached.
+        """
+        key = (self.chosen_activity.id, tuple(self.chosen_method.name), float(self.chosen_amount), k)
+        use_cache = self.matrix_what_if is None or self.matrix_what_if.lca is not self.lca
+        if use_cache and key in self.contribution_cache:
+            self.contributions = self.contribution_cache[key]
+            return self.contributions
+
+        contributions = contribution_analysis(self.lca, k=k)
+        dict_names = get_activity_names(np.concatenate([df['id'].to_numpy() for df in contributions.values()]))
+        for df in contributions.values():
+            df.insert(1, 'Name', [dict_names.get(i, '') for i in df['id'].tolist()])
+        if use_cache:
+            if len(self.contribution_cache) >= CONTRIBUTION_CACHE_SIZE:
+                # the cache keeps insertion order; the oldest entry is removed
+                del self.contribution_cache[next(iter(self.contribution_cache))]
+            self.contribution_cache[key] = contributions
+        self.contributions = contributions
+        return contributions
+
+    def get_result_cache_key(self, activity_code: str, method: tuple, amount: float) -> str:
+        """
+        Returns the key of a calculation result in the result cache (see `result_cache.get_result_key`)
+        for the current contents of the database and the method, graph traversal settings and scope overrides.
+        """
+        return get_result_key(
+            database_version=get_database_content_hash([self.db_name]),
+            activity_code=activity_code,
+            method=method,
+            amount=amount,
+            cutoff=self.graph_traversal_cutoff,
+            engine=self.graph_traversal_engine,
+            dict_scope_overrides=self.dict_scope_overrides,
+            method_version=get_file_hash(bd.Method(method).filepath_processed()),
+        )
+
+    @tracer.traced()
+    def load_cached_result(self, product_label: str, method_value: tuple, amount: float) -> bool:
+        """
+        Looks up the result of a calculation in the result cache (see `result_cache.py`),
+        using the graph traversal settings set before.
+        On a hit, sets the chosen product, method and amount, `df_traversal`, `contributions` and `scope_dict`
+        without any bw2calc calculation; `lca` is set to `None` and only calculated if needed later
+        (see `apply_user_input_to_matrices`).
+
+        Parameters
+        ----------
+        product_label : str
+            The srcLabel of the product.
+        method_value : tuple
+            The chosen method, as in `list_db_methods`.
+        amount : float
+            The demanded amount.
+
+        Returns
+        -------
+        bool
+            Whether the result was found in the cache.
+        """
+        result_cache = get_result_cache()
+        selected_src = self.dict_label_to_src.get(product_label)
+        if result_cache is None or not selected_src or method_value[0] not in self.dict_db_methods:
+            return False
+        activity_code = create_sanitized_key(selected_src)
+        with tracer.span('result cache') as span:
+            result = result_cache.get(
+                self.get_result_cache_key(activity_code, self.dict_db_methods[method_value[0]][0], amount)
+            )
+            span.set(cache_hit=result is not None)
+        if result is None:
+            return False
+        self.chosen_activity = bd.get_node(database=self.db_name, code=activity_code)
+        self.set_chosen_method_and_unit(method_value)
+        self.set_chosen_amount(amount)
+        self.lca = None
+        self.traversal_cache.clear()
+        self.df_traversal = result['df_traversal']
+        self.contributions = result['contributions']
+        self.scope_dict = result['scope_dict']
+        return True
+
+    @tracer.traced()
+    def store_result(self):
         """
-        self.lca = bc.LCA(
-            demand={self.chosen_activity: self.chosen_amount},
-            method=self.chosen_method.name
+        Stores the result of the current calculation (score, `scope_dict`, `df_traversal` and `contributions`)
+        in the result cache. Results of LCAs modified by an exact what-if update are not stored.
+        The dataframes are copied, since the cached result is shared by all sessions.
+        """
+        result_cache = get_result_cache()
+        if result_cache is None or self.lca is None or self.df_traversal is None:
+            return
+        if self.matrix_what_if is not None and self.matrix_what_if.lca is self.lca:
+            return
+        key = self.get_result_cache_key(
+            self.chosen_activity['code'], tuple(self.chosen_method.name), self.chosen_amount
         )
-        self.lca.lci()
-        self.lca.lcia()
+        contributions = self.contributions
+        if contributions is not None:
+            contributions = {name: df.copy() for name, df in contributions.items()}
+        result_cache.put(key, {
+            'score': float(self.lca.score),
+            'scope_dict': dict(self.scope_dict),
+            'df_traversal': self.df_traversal.copy(),
+            'contributions': contributions,
+        })
 
     def set_graph_traversal_cutoff(self, cutoff_value):
         """
@@ -312,46 +467,386 @@ class PanelLCA:
         """
         self.graph_traversal_cutoff = cutoff_value
 
+    def set_graph_traversal_engine(self, engine):
+        """
+        Sets the `graph_traversal_engine` attribute.
+        Must be one of `GRAPH_TRAVERSAL_ENGINES`.
+        """
+        if engine not in GRAPH_TRAVERSAL_ENGINES:
+            raise ValueError(f"Unknown graph traversal engine '{engine}'. Choose one of {GRAPH_TRAVERSAL_ENGINES}.")
+        self.graph_traversal_engine = engine
+
+    @tracer.traced()
     def perform_graph_traversal(self):
         """
-        Performs graph traversal.
+        Performs graph traversal and sets `df_traversal`, the compact node table (see `compact_traversal_table`).
+        Uses either `bgt.NewNodeEachVisitGraphTraversal` (see `matrix_cache.CachedMatrixGraphTraversal`) or the sparse matrix traversal of `graph_traversal.py`,
+        depending on `graph_traversal_engine`.
+
+        If the same LCA has already been traversed with the same engine at a lower cutoff,
+        the stored traversal is filtered instead (see `graph_traversal.TraversalCache`).
         """
-        self.graph_traversal: dict = bgt.NewNodeEachVisitGraphTraversal.calculate(
-            self.lca, cutoff=self.graph_traversal_cutoff
-        )
-        self.df_graph_traversal_nodes: pd.DataFrame = nodes_dict_to_dataframe(self.graph_traversal['nodes'])
-        self.df_graph_traversal_edges: pd.DataFrame = edges_dict_to_dataframe(self.graph_traversal['edges'])
-        if not self.df_graph_traversal_edges.empty:
-            self.df_graph_traversal_edges = add_branch_information_to_edges_dataframe(self.df_graph_traversal_edges)
-            self.df_tabulator_from_traversal = pd.merge(
-                self.df_graph_traversal_nodes,
-                self.df_graph_traversal_edges,
-                left_on='UID',
-                right_on='producer_unique_id',
-                how='left'
+        if not self.traversal_cache.covers(self.lca, self.graph_traversal_engine, self.graph_traversal_cutoff):
+            if self.graph_traversal_engine == 'sparse':
+                with tracer.span('graph traversal') as span:
+                    self.graph_traversal: dict = sparse_graph_traversal(
+                        self.lca, cutoff=self.graph_traversal_cutoff
+                    )
+                    span.set(rows=len(self.graph_traversal['nodes']['UID']))
+                with tracer.span('dataframe conversion'):
+                    df_nodes: pd.DataFrame = node_arrays_to_dataframe(self.graph_traversal['nodes'])
+            else:
+                with tracer.span('graph traversal') as span:
+                    self.graph_traversal: dict = CachedMatrixGraphTraversal.calculate(
+                        self.lca, cutoff=self.graph_traversal_cutoff
+                    )
+                    span.set(rows=len(self.graph_traversal['nodes']))
+                with tracer.span('dataframe conversion'):
+                    df_nodes: pd.DataFrame = nodes_dict_to_dataframe(self.graph_traversal['nodes'])
+                    df_nodes['ParentUID'] = parent_uids_from_edges(
+                        uids=df_nodes['UID'].to_numpy(),
+                        df_edges=edges_dict_to_dataframe(self.graph_traversal['edges']),
+                    )
+            self.traversal_cache.store(
+                lca=self.lca,
+                engine=self.graph_traversal_engine,
+                cutoff=self.graph_traversal_cutoff,
+                df_nodes=compact_traversal_table(df_nodes),
             )
-        else:
-            self.df_tabulator_from_traversal = self.df_graph_traversal_nodes.copy()
+        with tracer.span('scope assignment') as span:
+            self.df_traversal = assign_scopes(
+                df=self.traversal_cache.get(self.graph_traversal_cutoff),
+                classifier=self.scope_classifier,
+                dict_scope_overrides=self.dict_scope_overrides,
+            )
+            span.set(rows=len(self.df_traversal))
 
+    @property
+    def df_tabulator_from_traversal(self) -> pd.DataFrame:
+        """
+        The supply chain table as obtained from the graph traversal (before user edits).
+        """
+        return self.df_traversal
+
+    @property
+    def df_graph_traversal_nodes(self) -> pd.DataFrame:
+        return self.df_traversal
+
+    @property
+    def df_graph_traversal_edges(self) -> pd.DataFrame:
+        """
+        The edges of the graph traversal, computed on demand from the 'ParentUID' column of `df_traversal`.
+        """
+        if self.df_traversal is None:
+            return None
+        df_edges = self.df_traversal.loc[self.df_traversal['ParentUID'] != -1, ['ParentUID', 'UID']]
+        return df_edges.rename(columns={'ParentUID': 'consumer_unique_id', 'UID': 'producer_unique_id'})
+
+    @tracer.traced()
+    def get_branches(self, df: pd.DataFrame = None) -> pd.Series:
+        """
+        Returns the branch of every node of a supply chain table (default: `df_traversal`),
+        computed on demand from the 'ParentUID' column (see `graph_traversal.branches_from_parent_uids`).
+        """
+        if df is None:
+            df = self.df_traversal
+        order = np.argsort(df['Depth'].to_numpy(), kind='stable')
+        branches = branches_from_parent_uids(
+            uids=df['UID'].to_numpy()[order],
+            parent_uids=df['ParentUID'].to_numpy()[order],
+        )
+        series = pd.Series(branches, index=df.index[order], dtype=object)
+        return series.reindex(df.index)
+
+    @tracer.traced()
+    def set_df_tabulator_from_traversal(self):
+        """
+        Sets `df_tabulator`, the table edited by the user, to the traversal table and discards all previous user input.
+        Only the user-editable columns are copied; all other columns share their memory with `df_traversal`.
+        """
+        df = self.df_traversal.copy(deep=False)
+        for column in ['Scope', 'SupplyAmount', 'BurdenIntensity', 'Burden(Direct)']:
+            df[column] = df[column].to_numpy(copy=True)
+        df['Edited?'] = False
+        self.df_tabulator = df
+        self.df_tabulator_from_user = None
+
+    def set_scope_override(self, activity_datapackage_id, scope):
+        """
+        Stores a scope chosen by the user for an activity.
+        It takes precedence over the scope classifier in all following graph traversals.
+        """
+        self.dict_scope_overrides[int(activity_datapackage_id)] = int(scope)
+
+    @tracer.traced()
+    def perform_scope_analysis(self, df: pd.DataFrame):
+        """
+        Aggregates the direct burdens of the table `df` by scope, depth and branch in a single pass
+        and sets `scope_dict` (see `scope_aggregation.ScopeAggregator`).
+        """
+        self.scope_aggregator = ScopeAggregator(df)
+        self.scope_dict = self.scope_aggregator.scope_dict
+
+    @tracer.traced()
     def update_data_based_on_user_input(self):
         """
         Updates the supply chain data based on user input.
+
+        Compares the table edited by the user (`df_tabulator_from_user`) with the traversal table
+        and sets `df_tabulator` to the traversal table with the user data applied
+        (see `apply_user_input_to_arrays`).
+        Only the columns changed by the user input are allocated anew; all others share memory with `df_traversal`.
+        """
+        df_original = self.df_tabulator_from_traversal
+        positions = pd.Index(self.df_tabulator_from_user['UID']).get_indexer(df_original['UID'])
+        found = positions >= 0
+
+        arrays = {}
+        for column_name in ['SupplyAmount', 'BurdenIntensity']:
+            original = df_original[column_name].to_numpy()
+            user = np.full(len(df_original), np.nan)
+            user[found] = self.df_tabulator_from_user[column_name].to_numpy(dtype=float)[positions[found]]
+            user[user == original] = np.nan
+            arrays[column_name] = original.copy()
+            arrays[f'{column_name}_USER'] = user
+
+        burden = np.empty(len(df_original))
+        edited = apply_user_input_to_arrays(
+            parent_positions=parent_positions_from_uids(df_original['UID'].to_numpy(), df_original['ParentUID'].to_numpy()),
+            depths=df_original['Depth'].to_numpy(),
+            supply_amount=arrays['SupplyAmount'],
+            burden_intensity=arrays['BurdenIntensity'],
+            burden=burden,
+            supply_amount_user=arrays['SupplyAmount_USER'],
+            burden_intensity_user=arrays['BurdenIntensity_USER'],
+        )
+
+        scope = df_original['Scope'].to_numpy(copy=True)
+        if 'Scope' in self.df_tabulator_from_user.columns:
+            scope[found] = self.df_tabulator_from_user['Scope'].to_numpy()[positions[found]]
+
+        df = df_original.copy(deep=False)
+        df['Scope'] = scope
+        df['SupplyAmount'] = arrays['SupplyAmount']
+        df['BurdenIntensity'] = arrays['BurdenIntensity']
+        df['Burden(Direct)'] = burden
+        df['Edited?'] = edited
+        self.df_tabulator = df
+
+    @tracer.traced()
+    def apply_user_input(self, df_user: pd.DataFrame) -> np.ndarray:
+        """
+        What-if update of `df_tabulator` with the supply amounts and burden intensities entered by the user,
+        without a new graph traversal or LCA calculation.
+
+        Values in `df_user` which differ from `df_tabulator` are new user input; together with the user input
+        of previous updates, they are applied to the traversal table (see `update_data_based_on_user_input`).
+        The scope totals are then corrected for the changed rows only (see `ScopeAggregator.update_rows`).
+
+        Parameters
+        ----------
+        df_user : pd.DataFrame
+            The table shown to the user (eg. `widget_tabulator.value`), with the same rows as `df_tabulator`.
+            Must contain the columns 'UID', 'SupplyAmount' and 'BurdenIntensity'.
+
+        Returns
+        -------
+        np.ndarray
+            Positions of the rows of `df_tabulator` which changed.
+        """
+        df_previous = self.df_tabulator
+        if self.df_tabulator_from_user is None:
+            df_from_user = self.df_traversal[['UID', 'SupplyAmount', 'BurdenIntensity']].copy()
+        else:
+            df_from_user = self.df_tabulator_from_user.copy()
+        for column_name in ['SupplyAmount', 'BurdenIntensity']:
+            user = df_user[column_name].to_numpy(dtype=float)
+            new_input = user != df_previous[column_name].to_numpy(dtype=float)
+            values = df_from_user[column_name].to_numpy(dtype=float, copy=True)
+            values[new_input] = user[new_input]
+            df_from_user[column_name] = values
+        df_from_user['Scope'] = df_previous['Scope'].to_numpy()
+        self.df_tabulator_from_user = df_from_user
+        self.update_data_based_on_user_input()
+        self.bool_user_provided_data = True
+
+        changed = np.zeros(len(self.df_tabulator), dtype=bool)
+        for column_name in ['SupplyAmount', 'BurdenIntensity', 'Burden(Direct)', 'Edited?']:
+            changed |= self.df_tabulator[column_name].to_numpy() != df_previous[column_name].to_numpy()
+        positions = np.flatnonzero(changed)
+        if self.scope_aggregator is not None:
+            self.scope_aggregator.update_rows(
+                uids=self.df_tabulator['UID'].to_numpy()[positions],
+                burdens=self.df_tabulator['Burden(Direct)'].to_numpy()[positions],
+            )
+            self.scope_dict = self.scope_aggregator.scope_dict
+        return positions
+
+    @tracer.traced()
+    def apply_user_input_to_matrices(self, df_user: pd.DataFrame) -> int:
         """
-        self.df_tabulator_from_user = create_user_input_columns(
-            df_original=self.df_tabulator_from_traversal,
-            df_user_input=self.df_tabulator_from_user,
+        Exact what-if update: applies the supply amounts and burden intensities entered by the user
+        to the technosphere and biosphere matrices of the LCA, solves the modified system
+        and traverses the supply chain again (see `matrix_what_if.MatrixWhatIf`).
+
+        Changes accumulate over several updates; a new LCA calculation (`perform_lca`) discards them.
+
+        Parameters
+        ----------
+        df_user : pd.DataFrame
+            The table shown to the user (see `apply_user_input`).
+
+        Returns
+        -------
+        int
+            Number of matrix changes.
+        """
+        self.apply_user_input(df_user)
+        if self.lca is None:
+            # the result was loaded from the result cache; the matrices match its traversal table
+            self.perform_lca()
+        if self.matrix_what_if is None or self.matrix_what_if.lca is not self.lca:
+            self.matrix_what_if = MatrixWhatIf(self.lca)
+        number_of_changes = self.matrix_what_if.add_node_edits(
+            df_original=self.df_traversal,
+            df_edited=self.df_tabulator,
         )
-        self.df_tabulator_from_user = determine_edited_rows(df=self.df_tabulator_from_user)
-        self.df_tabulator_from_user = update_production_based_on_user_data(df=self.df_tabulator_from_user)
-        self.df_tabulator_from_user = update_burden_intensity_based_on_user_data(df=self.df_tabulator_from_user)
-        self.df_tabulator_from_user = update_burden_based_on_user_data(self.df_tabulator_from_user)
-        self.df_tabulator = self.df_tabulator_from_user.copy()
+        self.matrix_what_if.apply()
+        self.traversal_cache.clear()
+        self.perform_graph_traversal()
+        self.set_df_tabulator_from_traversal()
+        self.perform_scope_analysis(df=self.df_tabulator)
+        return number_of_changes
 
 # Data processing functions
 
-def nodes_dict_to_dataframe(nodes: dict, uid_electricity: int = 53) -> pd.DataFrame:
+GRAPH_TRAVERSAL_ENGINES = ('bw_graph_tools', 'sparse')
+
+# Number of contribution analyses kept by `PanelLCA.perform_contribution_analysis`
+CONTRIBUTION_CACHE_SIZE = 32
+
+# Codes of the activities whose complete supply chains have been ingested in this process, by database
+# (see `PanelLCA.get_src_and_get_technosphere_and_biosphere`)
+_ingested_activities = {}
+
+def get_existing_edges(db_name: str) -> set:
+    """
+    Returns the edges of a database as a set of `(output code, input code, type)` tuples,
+    using a single database query.
+    """
+    rows = ExchangeDataset.select(
+        ExchangeDataset.output_code, ExchangeDataset.input_code, ExchangeDataset.type
+    ).where(ExchangeDataset.output_database == db_name).tuples()
+    return set(rows)
+
+def get_activity_names(ids: np.ndarray) -> dict:
+    """
+    Returns the names of many activities with a few bulk database queries
+    instead of one `bd.get_node` call per activity.
+
+    Parameters
+    ----------
+    ids : np.ndarray
+        Activity ids (`activity_datapackage_id`).
+
+    Returns
+    -------
+    dict
+        Dictionary mapping activity ids to activity names.
+    """
+    unique_ids = np.unique(ids).tolist()
+    dict_names = {}
+    for start in range(0, len(unique_ids), 10000):
+        query = (
+            ActivityDataset
+            .select(ActivityDataset.id, ActivityDataset.name)
+            .where(ActivityDataset.id << unique_ids[start:start + 10000])
+        )
+        dict_names.update(query.tuples())
+    return dict_names
+
+def node_arrays_to_dataframe(nodes: dict) -> pd.DataFrame:
+    """
+    Returns a dataframe with human-readable descriptions and emissions values of the nodes
+    of a sparse matrix graph traversal (see `graph_traversal.sparse_graph_traversal`).
+    Has the same columns as `nodes_dict_to_dataframe`, plus the 'ParentUID' of every node.
+
+    Parameters
+    ----------
+    nodes : dict
+        A dictionary of numpy arrays describing the nodes in the graph traversal.
+
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with human-readable descriptions and emissions values of the nodes in the graph traversal.
+    """
+    supply_amount = nodes['SupplyAmount']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        burden_intensity = np.where(supply_amount != 0, nodes['Burden(Direct)'] / supply_amount, 0)
+    dict_names = get_activity_names(nodes['activity_datapackage_id'])
+    return pd.DataFrame({
+        'UID': nodes['UID'],
+        'Name': [dict_names[i] for i in nodes['activity_datapackage_id'].tolist()],
+        'SupplyAmount': supply_amount,
+        'BurdenIntensity': burden_intensity,
+        'Burden(Direct)': nodes['Burden(Direct)'],
+        'Burden(Cumulative)': nodes['Burden(Cumulative)'],
+        'Depth': nodes['Depth'],
+        'activity_datapackage_id': nodes['activity_datapackage_id'],
+        'ParentUID': nodes['ParentUID'],
+    })
+
+def parent_uids_from_edges(uids: np.ndarray, df_edges: pd.DataFrame) -> np.ndarray:
+    """
+    Returns the parent UID of every node, given a dataframe of graph edges.
+
+    Parameters
+    ----------
+    uids : np.ndarray
+        UIDs of the nodes.
+    df_edges : pd.DataFrame
+        Dataframe of graph edges with the columns 'consumer_unique_id' and 'producer_unique_id'. May be empty.
+
+    Returns
+    -------
+    np.ndarray
+        Parent UIDs in the same order as `uids`, -1 for nodes without parent.
+    """
+    if df_edges.empty:
+        return np.full(len(uids), -1, dtype=np.int64)
+    parents = pd.Series(
+        df_edges['consumer_unique_id'].to_numpy(),
+        index=df_edges['producer_unique_id'].to_numpy(),
+    )
+    return parents.reindex(uids).fillna(-1).to_numpy(dtype=np.int64)
+
+def compact_traversal_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a graph traversal table with compact dtypes: integer columns are downcast
+    to the smallest integer type which holds their values and 'Name' is categorical.
+    Amounts and burdens stay 64-bit floats.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Graph traversal table as returned by `nodes_dict_to_dataframe` or `node_arrays_to_dataframe`,
+        with a 'ParentUID' column.
+
+    Returns
+    -------
+    pd.DataFrame
+        The compact table.
+    """
+    for column in ['UID', 'ParentUID', 'Depth', 'activity_datapackage_id']:
+        df[column] = pd.to_numeric(df[column], downcast='integer')
+    df['Name'] = df['Name'].astype('category')
+    return df
+
+def nodes_dict_to_dataframe(nodes: dict) -> pd.DataFrame:
     """
     Returns a dataframe with human-readable descriptions and emissions values of the nodes in the graph traversal.
+    Scopes are assigned separately (see `scope_classification.assign_scopes`).
 
     Parameters
     ----------
@@ -363,23 +858,19 @@ def nodes_dict_to_dataframe(nodes: dict, uid_electricity: int = 53) -> pd.DataFr
     pd.DataFrame
         A dataframe with human-readable descriptions and emissions values of the nodes in the graph traversal.
     """
+    dict_names = get_activity_names(np.array([node.activity_datapackage_id for node in nodes.values()]))
     list_of_row_dicts = []
     for current_node in nodes.values():
-        scope: int = 3
         if current_node.unique_id == -1:
             continue
-        elif current_node.unique_id == 0:
-            scope = 1
-        elif current_node.activity_datapackage_id == uid_electricity:
-            scope = 2
         list_of_row_dicts.append(
             {
                 'UID': current_node.unique_id,
-                'Scope': scope,
-                'Name': bd.get_node(id=current_node.activity_datapackage_id)['name'],
+                'Name': dict_names[current_node.activity_datapackage_id],
                 'SupplyAmount': current_node.supply_amount,
                 'BurdenIntensity': current_node.direct_emissions_score / current_node.supply_amount if current_node.supply_amount else 0,
                 'Burden(Direct)': current_node.direct_emissions_score + current_node.direct_emissions_score_outside_specific_flows,
+                'Burden(Cumulative)': current_node.cumulative_score,
                 'Depth': current_node.depth,
                 'activity_datapackage_id': current_node.activity_datapackage_id,
             }
@@ -466,6 +957,68 @@ def add_branch_information_to_edges_dataframe(df_edges: pd.DataFrame) -> pd.Data
 
     return pd.DataFrame(branches)
 
+def apply_user_input_to_arrays(
+        parent_positions: np.ndarray,
+        depths: np.ndarray,
+        supply_amount: np.ndarray,
+        burden_intensity: np.ndarray,
+        burden: np.ndarray,
+        supply_amount_user: np.ndarray,
+        burden_intensity_user: np.ndarray,
+    ) -> np.ndarray:
+    """
+    Applies user-supplied supply amounts and burden intensities to the nodes of a graph traversal tree.
+    Fuses `determine_edited_rows`, `update_production_based_on_user_data`,
+    `update_burden_intensity_based_on_user_data` and `update_burden_based_on_user_data`
+    into a single pass over a fixed set of numpy arrays, which are modified in place.
+
+    The supply amount of every node upstream of a node with user-supplied supply amount
+    is scaled by the ratio of user-supplied to original supply amount of the nearest such node.
+    Nodes whose original supply amount is zero do not scale their upstream nodes.
+
+    Parameters
+    ----------
+    parent_positions : np.ndarray
+        Position of the parent of every node, -1 for nodes without parent (see `graph_traversal.parent_positions_from_uids`).
+    depths : np.ndarray
+        Depth of every node.
+    supply_amount : np.ndarray
+        Supply amounts. Updated in place.
+    burden_intensity : np.ndarray
+        Burden intensities. Updated in place.
+    burden : np.ndarray
+        Output array for the direct burdens (supply amount times burden intensity).
+    supply_amount_user : np.ndarray
+        User-supplied supply amounts, NaN where the user did not supply a value.
+    burden_intensity_user : np.ndarray
+        User-supplied burden intensities, NaN where the user did not supply a value.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array indicating which rows have been edited by the user.
+    """
+    has_supply_user = ~np.isnan(supply_amount_user)
+    has_intensity_user = ~np.isnan(burden_intensity_user)
+
+    # ratio of user-supplied to original supply amount, NaN where it does not propagate upstream
+    own_ratio = np.full(len(supply_amount), np.nan)
+    np.divide(supply_amount_user, supply_amount, out=own_ratio, where=has_supply_user & (supply_amount != 0))
+
+    # ratio inherited from the nearest edited ancestor, computed one depth level at a time
+    inherited_ratio = np.ones(len(supply_amount))
+    for level in iter_levels(depths):
+        level = level[parent_positions[level] >= 0]
+        parents = parent_positions[level]
+        parent_ratio = own_ratio[parents]
+        inherited_ratio[level] = np.where(np.isnan(parent_ratio), inherited_ratio[parents], parent_ratio)
+
+    np.multiply(supply_amount, inherited_ratio, out=supply_amount)
+    np.copyto(supply_amount, supply_amount_user, where=has_supply_user)
+    np.copyto(burden_intensity, burden_intensity_user, where=has_intensity_user)
+    np.multiply(supply_amount, burden_intensity, out=burden)
+    return has_supply_user | has_intensity_user
+
 def create_user_input_columns(
         df_original: pd.DataFrame,
         df_user_input: pd.DataFrame,
@@ -4,8 +4,12 @@ import panel as pn
 import numpy as np
 import pandas as pd
 from constants import DATABASE_NAME
-from utils import create_plotly_figure_piechart, determine_scope_emissions
-from shared_ui import panel_lca_instance, widget_tabulator, widget_plotly_figure_piechart
+from event_coordinator import EventCoordinator
+from tracing import tracer
+from prefetch import Prefetcher, record_selection
+from profiling import Profiler
+from shared_ui import panel_lca_instance, widget_tabulator, widget_plotly_figure_piechart, update_piechart, update_sankey, update_contributions, update_tabulator_rows, create_tabulator_view
+from shared_ui import widget_markdown_performance, widget_tabulator_performance, update_performance_panel
 
 # Widgets specific to col1
 widget_button_load_db = pn.widgets.Button(
@@ -54,6 +58,16 @@ widget_float_slider_cutoff = pn.widgets.EditableFloatSlider(
     sizing_mode='stretch_width'
 )
 
+widget_select_traversal_engine = pn.widgets.Select(
+    name='Graph Traversal Engine',
+    options={
+        'Brightway Graph Tools': 'bw_graph_tools',
+        'Sparse Matrix (faster for low cut-offs)': 'sparse',
+    },
+    value='bw_graph_tools',
+    sizing_mode='stretch_width',
+)
+
 widget_button_graph = pn.widgets.Button(
     name='Update Data based on User Input',
     icon='chart-donut-3',
@@ -61,6 +75,18 @@ widget_button_graph = pn.widgets.Button(
     sizing_mode='stretch_width'
 )
 
+widget_checkbox_exact_what_if = pn.widgets.Checkbox(
+    name='Exact update (re-solve the LCA matrices)',
+    value=False,
+    sizing_mode='stretch_width'
+)
+
+widget_checkbox_profiling = pn.widgets.Checkbox(
+    name='Profile calculations and what-if updates',
+    value=False,
+    sizing_mode='stretch_width'
+)
+
 widget_number_lca_score = pn.indicators.Number(
     name='LCA Impact Score',
     font_size='30pt',
@@ -72,6 +98,7 @@ widget_number_lca_score = pn.indicators.Number(
 
 # Event handlers for col1
 def button_action_load_database(event):
+    calculation_coordinator.invalidate()
     panel_lca_instance.set_db()
     panel_lca_instance.set_list_db_products()
     panel_lca_instance.set_methods_objects()
@@ -83,54 +110,227 @@ def button_action_load_database(event):
         if default_method:
             widget_select_method.value = default_method
 
-def button_action_perform_lca(event):
-    if widget_autocomplete_product.value == '':
-        pn.state.notifications.error('Please select a reference product first!', duration=5000)
-        return
-    else:
-        panel_lca_instance.df_graph_traversal_nodes = pd.DataFrame()
-        widget_plotly_figure_piechart.object = create_plotly_figure_piechart({'null': 0})
-        pn.state.notifications.info('Calculating LCA score...', duration=5000)
+def get_calculation_parameters() -> dict:
+    return {
+        'product': widget_autocomplete_product.value,
+        'method': widget_select_method.value,
+        'amount': widget_float_input_amount.value,
+        'cutoff': widget_float_slider_cutoff.value,
+        'engine': widget_select_traversal_engine.value,
+    }
+
+def get_lca_inputs(params: dict) -> tuple:
+    return (params['product'], params['method'], params['amount'])
+
+def get_calculation_memo_key(params: dict) -> tuple:
+    return get_lca_inputs(params) + (params['cutoff'], params['engine'])
+
+def perform_calculation(params: dict, previous_params: dict):
+    """
+    Performs the LCA, graph traversal and scope analysis for a set of widget values.
+    The LCA is only computed again if the product, method or amount changed since the last calculation.
+    Results found in the result cache (see `result_cache.py`) are shown without any calculation;
+    all other results are stored in it.
+    All stages are traced (see `tracing.py`) and shown in the performance panel.
+    """
+    lca_required = (
+        panel_lca_instance.lca is None
+        or previous_params is None
+        or get_lca_inputs(params) != get_lca_inputs(previous_params)
+    )
+    with tracer.run('perform_calculation', lca_required=lca_required, **params):
+        set_graph_traversal_settings(params)
+        if lca_required and panel_lca_instance.load_cached_result(params['product'], params['method'], params['amount']):
+            widget_number_lca_score.format = f'{{value:,.3f}} {panel_lca_instance.chosen_method_unit}'
+            update_contributions()
+            show_graph_traversal()
+            perform_scope_analysis()
+        else:
+            if lca_required:
+                pn.state.notifications.info('Calculating LCA score...', duration=5000)
+                panel_lca_instance.df_traversal = None
+                update_piechart({'Scope 1': 0, 'Scope 2': 0, 'Scope 3': 0})
+                perform_lca(params)
+                with tracer.span('update_contributions'):
+                    update_contributions()
+            else:
+                pn.state.notifications.info('Updating graph traversal...', duration=5000)
+            perform_graph_traversal(params)
+            perform_scope_analysis()
+            panel_lca_instance.store_result()
+    update_performance_panel()
+    pn.state.notifications.success('Calculation complete!', duration=5000)
+    record_selection(params['product'])
+    schedule_prefetch(params)
 
+def perform_lca(params: dict):
     # add chosen actvity to db
-    src = panel_lca_instance.get_src_and_get_technosphere_and_biosphere(widget_autocomplete_product.value)
+    # SPARQL responses prefetched in idle time are ingested now (see `prefetch.py`)
+    src = panel_lca_instance.get_src_and_get_technosphere_and_biosphere(
+        params['product'],
+        supply_chain=prefetcher.take_supply_chain(params['product']),
+    )
     print('print src', src.as_dict())
     panel_lca_instance.set_chosen_activity(src)
-    panel_lca_instance.set_chosen_method_and_unit(widget_select_method.value)
-    panel_lca_instance.set_chosen_amount(widget_float_input_amount.value)
+    panel_lca_instance.set_chosen_method_and_unit(params['method'])
+    panel_lca_instance.set_chosen_amount(params['amount'])
     panel_lca_instance.perform_lca()
-    pn.state.notifications.success('Completed LCA score calculation!', duration=5000)
     widget_number_lca_score.format = f'{{value:,.3f}} {panel_lca_instance.chosen_method_unit}'
-    perform_graph_traversal()
-    perform_scope_analysis()
 
-def perform_graph_traversal():
-    pn.state.notifications.info('Performing Graph Traversal...', duration=5000)
-    panel_lca_instance.bool_user_provided_data = False
-    panel_lca_instance.set_graph_traversal_cutoff(widget_float_slider_cutoff.value / 100)
+def set_graph_traversal_settings(params: dict):
+    panel_lca_instance.set_graph_traversal_cutoff(params['cutoff'] / 100)
+    panel_lca_instance.set_graph_traversal_engine(params['engine'])
+
+def perform_graph_traversal(params: dict):
+    set_graph_traversal_settings(params)
     panel_lca_instance.perform_graph_traversal()
-    panel_lca_instance.df_tabulator = panel_lca_instance.df_tabulator_from_traversal.copy()
-    widget_tabulator.value = panel_lca_instance.df_tabulator
+    show_graph_traversal()
+
+def show_graph_traversal():
+    panel_lca_instance.bool_user_provided_data = False
+    panel_lca_instance.set_df_tabulator_from_traversal()
+    with tracer.span('widget serialization') as span:
+        widget_tabulator.value = create_tabulator_view(panel_lca_instance.df_tabulator)
+        span.set(rows=len(widget_tabulator.value))
     # Set up column editors if needed
     column_editors = {
         colname: None
-        for colname in panel_lca_instance.df_tabulator.columns
+        for colname in widget_tabulator.value.columns
         if colname not in ['Scope', 'SupplyAmount', 'BurdenIntensity']
     }
     column_editors['Scope'] = {'type': 'list', 'values': [1, 2, 3]}
     widget_tabulator.editors = column_editors
-    pn.state.notifications.success('Graph Traversal Complete!', duration=5000)
 
 def perform_scope_analysis():
-    pn.state.notifications.info('Performing Scope Analysis...', duration=5000)
-    panel_lca_instance.scope_dict = determine_scope_emissions(df=widget_tabulator.value)
-    widget_plotly_figure_piechart.object = create_plotly_figure_piechart(panel_lca_instance.scope_dict)
-    widget_number_lca_score.value = panel_lca_instance.df_tabulator['Burden(Direct)'].sum()
-    pn.state.notifications.success('Scope Analysis Complete!', duration=5000)
+    panel_lca_instance.perform_scope_analysis(df=panel_lca_instance.df_tabulator)
+    with tracer.span('update_piechart'):
+        update_piechart(panel_lca_instance.scope_dict)
+    with tracer.span('update_sankey'):
+        update_sankey()
+    widget_number_lca_score.value = panel_lca_instance.scope_aggregator.total
+
+# All calculations go through the coordinator:
+# rapid changes of the inputs are debounced, queued requests are coalesced into the latest one
+# and requests whose inputs equal those of the last calculation are skipped.
+calculation_coordinator = EventCoordinator(
+    callback=perform_calculation,
+    memo_key=get_calculation_memo_key,
+    debounce_ms=300,
+)
+
+# After every calculation, the likely next products are prepared in a background thread (see `prefetch.py`);
+# the periodic callback only starts queued calculations in idle time. Every new user input cancels the queued work.
+PREFETCH_PERIOD_MS = 200
+prefetcher = Prefetcher()
+prefetch_periodic_callback = None
+
+def schedule_prefetch(params: dict):
+    global prefetch_periodic_callback
+    prefetcher.schedule(panel_lca_instance, params)
+    if len(prefetcher) > 0 and prefetch_periodic_callback is None:
+        prefetch_periodic_callback = pn.state.add_periodic_callback(run_prefetch_step, period=PREFETCH_PERIOD_MS)
+
+def run_prefetch_step():
+    # Prefetching only runs while no calculation is running or waiting to run
+    if (
+        calculation_coordinator.running
+        or calculation_coordinator.pending_params is not None
+        or calculation_coordinator.periodic_callback is not None
+    ):
+        return
+    if not prefetcher.step():
+        stop_prefetch()
+
+def stop_prefetch():
+    global prefetch_periodic_callback
+    if prefetch_periodic_callback is not None:
+        prefetch_periodic_callback.stop()
+        prefetch_periodic_callback = None
+
+def cancel_prefetch(event=None):
+    prefetcher.cancel()
+    stop_prefetch()
+
+def button_action_perform_lca(event):
+    cancel_prefetch()
+    if widget_autocomplete_product.value == '':
+        pn.state.notifications.error('Please select a reference product first!', duration=5000)
+        return
+    # The button always calculates again, eg. after an exact update, when the LCA matrices no longer match the database;
+    # only changes of the inputs are skipped if they do not change the calculation
+    calculation_coordinator.invalidate()
+    calculation_coordinator.request(get_calculation_parameters(), immediate=True)
+
+def input_action_update_calculation(event):
+    cancel_prefetch()
+    # Changes of the inputs only update an existing calculation; the first one is started with the button
+    if panel_lca_instance.df_traversal is None or widget_autocomplete_product.value == '':
+        return
+    calculation_coordinator.request(get_calculation_parameters())
+
+def button_action_update_data(event):
+    cancel_prefetch()
+    # What-if path: applies the values edited in the table without a new LCA calculation
+    if panel_lca_instance.df_tabulator is None:
+        pn.state.notifications.error('Please compute an LCA score first!', duration=5000)
+        return
+    with tracer.run('button_action_update_data', exact=widget_checkbox_exact_what_if.value):
+        if widget_checkbox_exact_what_if.value:
+            # The edits become changes of the LCA matrices; the supply chain is traversed again
+            number_of_changes = panel_lca_instance.apply_user_input_to_matrices(widget_tabulator.value)
+            with tracer.span('widget serialization') as span:
+                widget_tabulator.value = create_tabulator_view(panel_lca_instance.df_tabulator)
+                span.set(rows=len(widget_tabulator.value))
+            with tracer.span('update_contributions'):
+                update_contributions()
+            message = f'Applied {number_of_changes} changes to the LCA matrices!'
+        else:
+            positions = panel_lca_instance.apply_user_input(widget_tabulator.value)
+            with tracer.span('widget serialization') as span:
+                update_tabulator_rows(
+                    df=panel_lca_instance.df_tabulator,
+                    positions=positions,
+                    columns=['SupplyAmount', 'BurdenIntensity', 'Burden(Direct)', 'Edited?'],
+                )
+                span.set(rows=len(positions))
+            message = f'Updated {len(positions)} rows based on user input!'
+        with tracer.span('update_piechart'):
+            update_piechart(panel_lca_instance.scope_dict)
+        with tracer.span('update_sankey'):
+            update_sankey()
+        widget_number_lca_score.value = panel_lca_instance.scope_aggregator.total
+    update_performance_panel()
+    pn.state.notifications.success(message, duration=5000)
+
+# On-demand profiling of the calculation and what-if handlers (see `profiling.py`),
+# enabled with the checkbox in the performance card or the URL query parameter `?profile=true`.
+# Like all widgets of this column, the checkbox and the profiler are shared by the sessions of the server process.
+def get_profiling_parameters() -> dict:
+    return dict(get_calculation_parameters(), exact_what_if=widget_checkbox_exact_what_if.value)
+
+def notify_profile_saved(paths: dict):
+    pn.state.notifications.info(f"Profile saved to {paths['parameters'].removesuffix('.json')}.*", duration=10000)
+
+def checkbox_action_profiling(event):
+    profiler.enabled = event.new
+
+def sync_profiling_with_location():
+    # called once the page of a session has loaded (see `index.py`), with the location of that session
+    if pn.state.location is not None:
+        pn.state.location.sync(widget_checkbox_profiling, {'value': 'profile'})
+
+profiler = Profiler(get_parameters=get_profiling_parameters, on_saved=notify_profile_saved)
+widget_checkbox_profiling.param.watch(checkbox_action_profiling, 'value')
 
 # Bind event handlers
 widget_button_load_db.on_click(button_action_load_database)
-widget_button_lca.on_click(button_action_perform_lca)
+widget_button_lca.on_click(profiler.wrap(button_action_perform_lca))
+widget_button_graph.on_click(profiler.wrap(button_action_update_data))
+widget_float_slider_cutoff.param.watch(input_action_update_calculation, 'value_throttled')
+widget_select_traversal_engine.param.watch(input_action_update_calculation, 'value')
+widget_float_input_amount.param.watch(input_action_update_calculation, 'value')
+widget_select_method.param.watch(input_action_update_calculation, 'value')
+widget_autocomplete_product.param.watch(cancel_prefetch, 'value')
 
 # Define col1 layout
 management_col = pn.Column(
@@ -142,9 +342,19 @@ management_col = pn.Column(
     widget_float_input_amount,
     pn.pane.Markdown("Cutoff documentation here."),
     widget_float_slider_cutoff,
+    widget_select_traversal_engine,
     widget_button_lca,
     widget_button_graph,
+    widget_checkbox_exact_what_if,
     pn.Spacer(height=10),
     widget_number_lca_score,
     widget_plotly_figure_piechart,
+    pn.Card(
+        widget_markdown_performance,
+        widget_tabulator_performance,
+        widget_checkbox_profiling,
+        title='Performance',
+        collapsed=True,
+        sizing_mode='stretch_width',
+    ),
 )
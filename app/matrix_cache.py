@@ -0,0 +1,294 @@
+# matrix_cache.py
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from functools import partial
+
+import numpy as np
+from scipy import sparse
+import matrix_utils as mu
+import bw2data as bd
+from bw_graph_tools.matrix_tools import guess_production_exchanges
+import bw_graph_tools as bgt
+
+# Version of the layout of the cache entries; entries of other versions are never read
+MATRIX_CACHE_FORMAT = 1
+
+# Number of cache entries (database versions) kept per cache directory; the least recently used are deleted
+MATRIX_CACHE_MAX_ENTRIES = 8
+
+# Arrays of a cache entry, one `.npy` file each
+MATRIX_CACHE_ARRAYS = [
+    'technosphere_data', 'technosphere_indices', 'technosphere_indptr',
+    'biosphere_data', 'biosphere_indices', 'biosphere_indptr',
+    'product_ids', 'activity_ids', 'biosphere_ids',
+    'production_rows', 'production_cols',
+]
+
+# Content hashes of processed database files, by path, size and modification time
+_file_hashes = {}
+
+
+def get_file_hash(path: str) -> str:
+    """
+    Returns the SHA-256 hash of the contents of a file.
+    Hashes are only computed again if the size or modification time of the file changed.
+    """
+    stat = os.stat(path)
+    signature = (path, stat.st_size, stat.st_mtime_ns)
+    if signature not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        _file_hashes[signature] = digest.hexdigest()
+    return _file_hashes[signature]
+
+
+# Content hashes of databases, by project and database names (see `get_database_content_hash`)
+_database_content_hashes = {}
+
+
+def get_databases_modified(names) -> tuple:
+    """
+    Returns the modification times of databases, as recorded by bw2data whenever a database is written.
+    """
+    return tuple((name, bd.databases.get(name, {}).get('modified')) for name in sorted(names))
+
+
+def get_database_content_hash(database_names: list) -> str:
+    """
+    Returns a hash of the contents of the databases and all databases they depend on,
+    computed from their processed datapackages (which are processed first if they have been modified).
+
+    The hash is memoized, since databases only change on ingestion, which invalidates it
+    (see `invalidate_database_content_hash`). As a safeguard against writes outside of the ingestion,
+    it is also computed again if the modification time of any of the databases changed.
+    """
+    key = (bd.projects.current, tuple(sorted(database_names)))
+    entry = _database_content_hashes.get(key)
+    if entry is not None:
+        names, modified, content_hash = entry
+        if get_databases_modified(names) == modified:
+            return content_hash
+    bd.databases.clean()
+    names = set.union(*[bd.Database(name).find_graph_dependents() for name in database_names])
+    digest = hashlib.sha256(f'format {MATRIX_CACHE_FORMAT}'.encode())
+    for name in sorted(names):
+        digest.update(f'{name}:{get_file_hash(bd.Database(name).filepath_processed())}'.encode())
+    _database_content_hashes[key] = (names, get_databases_modified(names), digest.hexdigest())
+    return digest.hexdigest()
+
+
+def invalidate_database_content_hash():
+    """
+    Forgets the memoized database content hashes (see `get_database_content_hash`); called after every ingestion.
+    """
+    _database_content_hashes.clear()
+
+
+class CachedMappedMatrix:
+    """
+    Stand-in for `matrix_utils.MappedMatrix` for matrices loaded from the cache:
+    the matrix, the mappers from database ids to matrix indices and,
+    for the technosphere, the production exchanges (see `get_production_exchanges`).
+    """
+
+    def __init__(self, matrix, row_ids: np.ndarray, col_ids: np.ndarray, production_exchanges: tuple = None):
+        self.matrix = matrix
+        self.row_mapper = mu.ArrayMapper(array=np.asarray(row_ids), empty_ok=True)
+        self.col_mapper = mu.ArrayMapper(array=np.asarray(col_ids), empty_ok=True)
+        self.production_exchanges = production_exchanges
+
+
+def get_production_exchanges(mapped_matrix) -> tuple:
+    """
+    Returns the row and column indices of the production exchanges of a technosphere matrix:
+    the cached ones for matrices loaded from the cache, otherwise `guess_production_exchanges`.
+    """
+    production_exchanges = getattr(mapped_matrix, 'production_exchanges', None)
+    if production_exchanges is not None:
+        return production_exchanges
+    return guess_production_exchanges(mapped_matrix)
+
+
+class CachedMatrixGraphTraversal(bgt.NewNodeEachVisitGraphTraversal):
+    """
+    `bgt.NewNodeEachVisitGraphTraversal` which also accepts LCAs with matrices loaded from the cache.
+    """
+
+    @classmethod
+    def get_production_exchanges(cls, mapped_matrix) -> tuple:
+        return get_production_exchanges(mapped_matrix)
+
+
+class MatrixCache:
+    """
+    On-disk cache of the technosphere and biosphere matrices of LCAs and their index mappings,
+    keyed by a hash of the contents of the databases (see `get_database_content_hash`).
+
+    Every entry is a directory of `.npy` files (CSR arrays, database ids of the rows and columns,
+    production exchanges), which are memory-mapped read-only when loaded.
+    All processes and sessions using the same database therefore share one copy of the matrices in the page cache
+    instead of building and holding their own. Entries are written to a temporary directory and renamed,
+    so that concurrent processes never read incomplete entries.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the cache. By default, `lca_matrix_cache` in the directory of the current Brightway project.
+    max_entries : int
+        Number of entries kept; the least recently used are deleted.
+    """
+
+    def __init__(self, directory: str = None, max_entries: int = MATRIX_CACHE_MAX_ENTRIES):
+        self._directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def directory(self) -> str:
+        return self._directory or os.path.join(bd.projects.dir, 'lca_matrix_cache')
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def load(self, lca, key: str) -> bool:
+        """
+        Sets the matrices, mapped matrices and dictionaries of `lca` from the cache entry `key`,
+        as `lca.load_lci_data()` would. Returns `False` if there is no such entry.
+        """
+        path = self.get_path(key)
+        try:
+            with open(os.path.join(path, 'metadata.json')) as file:
+                metadata = json.load(file)
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in MATRIX_CACHE_ARRAYS}
+        except (OSError, ValueError):
+            return False
+        technosphere_matrix = sparse.csr_matrix(
+            (arrays['technosphere_data'], arrays['technosphere_indices'], arrays['technosphere_indptr']),
+            shape=tuple(metadata['technosphere_shape']),
+            copy=False,
+        )
+        biosphere_matrix = sparse.csr_matrix(
+            (arrays['biosphere_data'], arrays['biosphere_indices'], arrays['biosphere_indptr']),
+            shape=tuple(metadata['biosphere_shape']),
+            copy=False,
+        )
+        lca.technosphere_mm = CachedMappedMatrix(
+            technosphere_matrix,
+            row_ids=arrays['product_ids'],
+            col_ids=arrays['activity_ids'],
+            production_exchanges=(np.asarray(arrays['production_rows']), np.asarray(arrays['production_cols'])),
+        )
+        lca.technosphere_matrix = technosphere_matrix
+        lca.biosphere_mm = CachedMappedMatrix(biosphere_matrix, row_ids=arrays['biosphere_ids'], col_ids=arrays['activity_ids'])
+        lca.biosphere_matrix = biosphere_matrix
+        lca.dicts.product = partial(lca.technosphere_mm.row_mapper.to_dict)
+        lca.dicts.activity = partial(lca.technosphere_mm.col_mapper.to_dict)
+        lca.dicts.biosphere = partial(lca.biosphere_mm.row_mapper.to_dict)
+        # marks the entry as recently used (see `evict`)
+        os.utime(path)
+        return True
+
+    def store(self, lca, key: str):
+        """
+        Stores the matrices of `lca` (after `lca.load_lci_data()`) as cache entry `key`.
+        """
+        technosphere_matrix = sparse.csr_matrix(lca.technosphere_matrix)
+        biosphere_matrix = sparse.csr_matrix(lca.biosphere_matrix)
+        production_rows, production_cols = get_production_exchanges(lca.technosphere_mm)
+        arrays = {
+            'technosphere_data': technosphere_matrix.data,
+            'technosphere_indices': technosphere_matrix.indices,
+            'technosphere_indptr': technosphere_matrix.indptr,
+            'biosphere_data': biosphere_matrix.data,
+            'biosphere_indices': biosphere_matrix.indices,
+            'biosphere_indptr': biosphere_matrix.indptr,
+            'product_ids': np.array(sorted(lca.dicts.product, key=lca.dicts.product.get), dtype=np.int64),
+            'activity_ids': np.array(sorted(lca.dicts.activity, key=lca.dicts.activity.get), dtype=np.int64),
+            'biosphere_ids': np.array(sorted(lca.dicts.biosphere, key=lca.dicts.biosphere.get), dtype=np.int64),
+            'production_rows': np.asarray(production_rows, dtype=np.int64),
+            'production_cols': np.asarray(production_cols, dtype=np.int64),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path_temporary = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(path_temporary, f'{name}.npy'), array)
+            with open(os.path.join(path_temporary, 'metadata.json'), 'w') as file:
+                json.dump({
+                    'format': MATRIX_CACHE_FORMAT,
+                    'technosphere_shape': technosphere_matrix.shape,
+                    'biosphere_shape': biosphere_matrix.shape,
+                }, file)
+            os.rename(path_temporary, self.get_path(key))
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(path_temporary, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries beyond `max_entries`.
+        Processes which still use a deleted entry keep their memory maps.
+        """
+        entries = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if not name.startswith('.tmp-')
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def load_lci_data(self, lca, database_names: list) -> bool:
+        """
+        Loads the matrices of `lca` from the cache, or builds them with `lca.load_lci_data()` and stores them.
+
+        Parameters
+        ----------
+        lca : bw2calc.LCA
+            LCA object on which `lci()` has not been called yet.
+        database_names : list
+            Databases of the demanded activities.
+
+        Returns
+        -------
+        bool
+            Whether the matrices were loaded from the cache.
+        """
+        key = get_database_content_hash(database_names)
+        if self.load(lca, key):
+            self.hits += 1
+            return True
+        self.misses += 1
+        lca.load_lci_data()
+        try:
+            self.store(lca, key)
+        except OSError as error:
+            print(f'Could not store the LCA matrices in the cache: {error}')
+        return False
+
+
+# Cache of `PanelLCA.perform_lca`.
+# Chosen with the environment variable `LCA_MATRIX_CACHE_DIR`; set it to `off` to disable the cache.
+# Disabled in Pyodide, where files cannot be memory-mapped.
+_matrix_cache = None
+
+
+def get_matrix_cache() -> MatrixCache:
+    """
+    Returns the matrix cache of the app, or `None` if it is disabled.
+    """
+    global _matrix_cache
+    directory = os.environ.get('LCA_MATRIX_CACHE_DIR')
+    if directory == 'off' or sys.platform == 'emscripten':
+        return None
+    if _matrix_cache is None:
+        _matrix_cache = MatrixCache(directory=directory)
+    return _matrix_cache
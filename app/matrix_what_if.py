@@ -0,0 +1,181 @@
+# matrix_what_if.py
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu, bicgstab, spsolve
+from matrix_cache import get_production_exchanges
+from graph_traversal import parent_positions_from_uids
+
+
+class MatrixWhatIf:
+    """
+    Exact what-if calculations on the matrices of an LCA.
+
+    Changes of the supply amount of a traversal node become changes of the technosphere exchange
+    between the node and its consumer (or of the demand, for the nodes demanded by the functional unit);
+    changes of the burden intensity of a node scale the biosphere column of its activity.
+    Unlike the tree arithmetic of `lca_model.apply_user_input_to_arrays`, the changes therefore
+    apply to every visit of the same exchange or activity, including loops and shared suppliers.
+
+    The modified system is solved with a Sherman-Morrison-Woodbury update of the LU factorization
+    of the original technosphere matrix, which is computed once and cached: with changes in `k` columns,
+    a solve costs `k + 1` triangular solves and a dense `k x k` system.
+    With more than `max_rank` changed columns, an iterative solver warm-started from the previous supply vector is used,
+    and a direct solve if it does not converge.
+
+    All changes are stored relative to the original matrices, so that they can be accumulated and reset.
+
+    Parameters
+    ----------
+    lca : bw2calc.LCA
+        LCA object on which `lci()` and `lcia()` have been called. Its matrices are modified by `apply`.
+    max_rank : int
+        Maximum number of changed technosphere columns for the low-rank update.
+    """
+
+    def __init__(self, lca, max_rank: int = 64):
+        self.lca = lca
+        self.max_rank = max_rank
+        self.technosphere_matrix = lca.technosphere_matrix.tocsc(copy=True)
+        self.biosphere_matrix = lca.biosphere_matrix.tocsc(copy=True)
+        # rebuilt from the demand, since some graph traversals overwrite `lca.demand_array`
+        lca.build_demand_array()
+        self.demand_array = np.array(lca.demand_array, dtype=float)
+        self.demand = dict(lca.demand)
+        self.factorization = None
+
+        product_indices, activity_indices = get_production_exchanges(lca.technosphere_mm)
+        self.product_of_activity = np.full(self.technosphere_matrix.shape[1], -1, dtype=np.int64)
+        self.product_of_activity[activity_indices] = product_indices
+
+        self.technosphere_factors = {}
+        self.biosphere_factors = {}
+        self.demand_factor = 1.0
+        self.solver = None
+
+    def reset(self):
+        """
+        Discards all changes. The LCA is restored by the next call of `apply`.
+        """
+        self.technosphere_factors = {}
+        self.biosphere_factors = {}
+        self.demand_factor = 1.0
+
+    def add_node_edits(self, df_original, df_edited) -> int:
+        """
+        Translates user edits of a graph traversal table into matrix changes.
+
+        The relative change of the supply amount of every node is divided by the relative change of its parent,
+        so that only nodes whose supply amount was edited themselves (and not inherited from an edited parent)
+        change an exchange.
+
+        Parameters
+        ----------
+        df_original : pd.DataFrame
+            Traversal table of the current state of the LCA. Must contain the columns
+            'UID', 'ParentUID', 'activity_datapackage_id', 'SupplyAmount' and 'BurdenIntensity'.
+        df_edited : pd.DataFrame
+            The same table after the user edits (see `PanelLCA.update_data_based_on_user_input`).
+
+        Returns
+        -------
+        int
+            Number of matrix changes.
+        """
+        parent_positions = parent_positions_from_uids(df_original['UID'].to_numpy(), df_original['ParentUID'].to_numpy())
+        supply_original = df_original['SupplyAmount'].to_numpy(dtype=float)
+        supply_ratio = np.ones(len(df_original))
+        np.divide(df_edited['SupplyAmount'].to_numpy(dtype=float), supply_original, out=supply_ratio, where=supply_original != 0)
+        parent_ratio = np.where(parent_positions >= 0, supply_ratio[np.where(parent_positions >= 0, parent_positions, 0)], 1.0)
+        exchange_factor = np.ones(len(df_original))
+        np.divide(supply_ratio, parent_ratio, out=exchange_factor, where=parent_ratio != 0)
+
+        intensity_original = df_original['BurdenIntensity'].to_numpy(dtype=float)
+        intensity_factor = np.ones(len(df_original))
+        np.divide(df_edited['BurdenIntensity'].to_numpy(dtype=float), intensity_original, out=intensity_factor, where=intensity_original != 0)
+
+        activities = np.array(
+            [self.lca.dicts.activity[activity_id] for activity_id in df_original['activity_datapackage_id'].tolist()],
+            dtype=np.int64,
+        )
+        number_of_changes = 0
+        for position in np.flatnonzero(~np.isclose(exchange_factor, 1, rtol=1e-12, atol=0)).tolist():
+            parent = parent_positions[position]
+            if parent < 0:
+                self.demand_factor *= exchange_factor[position]
+            else:
+                key = (int(self.product_of_activity[activities[position]]), int(activities[parent]))
+                self.technosphere_factors[key] = self.technosphere_factors.get(key, 1.0) * exchange_factor[position]
+            number_of_changes += 1
+        for position in np.flatnonzero(~np.isclose(intensity_factor, 1, rtol=1e-12, atol=0)).tolist():
+            activity = int(activities[position])
+            self.biosphere_factors[activity] = self.biosphere_factors.get(activity, 1.0) * intensity_factor[position]
+            number_of_changes += 1
+        return number_of_changes
+
+    def get_technosphere_change(self) -> sparse.csc_matrix:
+        """
+        Returns the difference between the modified and the original technosphere matrix.
+        """
+        if not self.technosphere_factors:
+            return sparse.csc_matrix(self.technosphere_matrix.shape)
+        rows, columns = (np.array(indices, dtype=np.int64) for indices in zip(*self.technosphere_factors.keys()))
+        original = np.asarray(self.technosphere_matrix[rows, columns]).ravel()
+        factors = np.array(list(self.technosphere_factors.values()))
+        return sparse.csc_matrix((original * (factors - 1), (rows, columns)), shape=self.technosphere_matrix.shape)
+
+    def get_biosphere_matrix(self) -> sparse.csc_matrix:
+        scaling = np.ones(self.biosphere_matrix.shape[1])
+        for activity, factor in self.biosphere_factors.items():
+            scaling[activity] = factor
+        return (self.biosphere_matrix @ sparse.diags(scaling)).tocsc()
+
+    def solve(self, technosphere_change: sparse.csc_matrix, demand_array: np.ndarray) -> np.ndarray:
+        """
+        Solves `(A + technosphere_change) x = demand_array`, where `A` is the original technosphere matrix.
+        """
+        changed_columns = np.flatnonzero(np.diff(technosphere_change.indptr))
+        if len(changed_columns) <= self.max_rank:
+            if self.factorization is None:
+                self.factorization = splu(self.technosphere_matrix)
+            x = self.factorization.solve(demand_array)
+            if not len(changed_columns):
+                self.solver = 'factorization'
+                return x
+            # (A + U V^T)^-1 b = x - Z (I + V^T Z)^-1 V^T x, with U = change[:, J], V = I[:, J], Z = A^-1 U
+            z = self.factorization.solve(technosphere_change[:, changed_columns].toarray())
+            capacitance = np.eye(len(changed_columns)) + z[changed_columns, :]
+            self.solver = 'low-rank update'
+            return x - z @ np.linalg.solve(capacitance, x[changed_columns])
+
+        technosphere_matrix = (self.technosphere_matrix + technosphere_change).tocsc()
+        x, info = bicgstab(technosphere_matrix, demand_array, x0=self.lca.supply_array, rtol=1e-10)
+        if info == 0:
+            self.solver = 'iterative'
+            return x
+        self.solver = 'direct'
+        return spsolve(technosphere_matrix, demand_array)
+
+    def apply(self) -> float:
+        """
+        Solves the modified system and writes the modified matrices, supply and characterized inventory to the LCA.
+
+        Returns
+        -------
+        float
+            The modified LCA score.
+        """
+        technosphere_change = self.get_technosphere_change()
+        demand_array = self.demand_array * self.demand_factor
+        supply_array = self.solve(technosphere_change, demand_array)
+
+        lca = self.lca
+        lca.technosphere_matrix = (self.technosphere_matrix + technosphere_change).tocsr()
+        lca.biosphere_matrix = self.get_biosphere_matrix().tocsr()
+        lca.demand = {key: amount * self.demand_factor for key, amount in self.demand.items()}
+        lca.demand_array = demand_array
+        lca.supply_array = supply_array
+        count = len(supply_array)
+        lca.inventory = lca.biosphere_matrix @ sparse.spdiags([supply_array], [0], count, count)
+        lca.lcia_calculation()
+        return lca.score
@@ -0,0 +1,130 @@
+# method_registry.py
+
+import os
+import csv
+from functools import lru_cache
+
+import bw2data as bd
+
+PATH_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_data')
+PATH_IMPACT_CATEGORIES_NAMES = os.path.join(PATH_DATA, 'USEEIO_impact_categories_names.csv')
+PATH_IMPACT_CATEGORIES_UNITS = os.path.join(PATH_DATA, 'USEEIO_impact_categories_units.csv')
+
+
+def read_two_column_csv(path: str) -> dict:
+    """
+    Reads a headerless two-column CSV file into a dictionary.
+
+    Parameters
+    ----------
+    path : str
+        Path to the CSV file. A UTF-8 byte order mark is ignored.
+
+    Returns
+    -------
+    dict
+        Dictionary mapping the values of the first column to the values of the second column.
+        Returns an empty dictionary if the file does not exist.
+    """
+    if not os.path.isfile(path):
+        return {}
+    with open(path, mode='r', newline='', encoding='utf-8-sig') as file:
+        return {row[0].strip(): row[1].strip() for row in csv.reader(file) if len(row) >= 2}
+
+
+@lru_cache(maxsize=None)
+def load_impact_category_metadata() -> dict:
+    """
+    Loads the names and units of the impact categories from `app/_data`.
+    The files are read only once per process; the result is shared by all sessions.
+
+    Returns
+    -------
+    dict
+        Dictionary mapping impact category abbreviations to `(name, unit)` tuples, eg.
+        `{'GCC': ('Global Climate Change', '[kg CO2 eq]'), ...}`.
+    """
+    dict_names = read_two_column_csv(PATH_IMPACT_CATEGORIES_NAMES)
+    dict_units = read_two_column_csv(PATH_IMPACT_CATEGORIES_UNITS)
+    return {
+        abbreviation: (dict_names.get(abbreviation, abbreviation), f'[{dict_units[abbreviation]}]' if abbreviation in dict_units else '')
+        for abbreviation in dict_names.keys() | dict_units.keys()
+    }
+
+
+class MethodRegistry:
+    """
+    Indexed lookup table of the impact assessment methods of a Brightway project.
+
+    Methods are keyed by their method tuple, eg. `('Impact Potential', 'GCC')`.
+    Names and units are taken from the impact category metadata in `app/_data`.
+    Methods missing there fall back to the `description` and `unit` stored in `bd.methods`,
+    and finally to the abbreviation itself.
+    """
+
+    def __init__(self, dict_methods_metadata: dict):
+        dict_category_metadata = load_impact_category_metadata()
+        self.dict_methods = {}
+        self.dict_abbreviations = {}
+        for method, metadata in dict_methods_metadata.items():
+            abbreviation = method[-1]
+            name, unit = dict_category_metadata.get(abbreviation, (None, None))
+            if name is None:
+                name = metadata.get('description') or abbreviation
+            if not unit:
+                unit = f"[{metadata['unit']}]" if metadata.get('unit') else ''
+            self.dict_methods[method] = (abbreviation, name, unit)
+            self.dict_abbreviations[abbreviation] = method
+
+    def __len__(self) -> int:
+        return len(self.dict_methods)
+
+    def __contains__(self, method: tuple) -> bool:
+        return method in self.dict_methods
+
+    def get_name(self, method: tuple) -> str:
+        return self.dict_methods[method][1]
+
+    def get_unit(self, method: tuple) -> str:
+        return self.dict_methods[method][2]
+
+    def get_method(self, abbreviation: str) -> tuple:
+        """
+        Returns the method tuple for an impact category abbreviation, eg. `'GCC'`.
+        """
+        return self.dict_abbreviations[abbreviation]
+
+    @property
+    def dict_db_methods(self) -> dict:
+        """
+        Returns the methods in the format used by `PanelLCA.dict_db_methods`, eg.
+        `{'GCC': [('Impact Potential', 'GCC'), 'Global Climate Change', '[kg CO2 eq]'], ...}`.
+        """
+        return {
+            abbreviation: [method, name, unit]
+            for method, (abbreviation, name, unit) in self.dict_methods.items()
+        }
+
+    @property
+    def list_methods_for_autocomplete(self) -> list:
+        """
+        Returns the methods in the format used by the method select widget, eg.
+        `[('GCC', 'Global Climate Change', '[kg CO2 eq]'), ...]`.
+        """
+        return list(self.dict_methods.values())
+
+
+@lru_cache(maxsize=8)
+def _build_method_registry(project_name: str, number_of_methods: int) -> MethodRegistry:
+    return MethodRegistry({method: dict(bd.methods[method]) for method in bd.methods})
+
+
+def get_method_registry() -> MethodRegistry:
+    """
+    Returns the method registry of the current Brightway project.
+
+    The registry is cached per project and shared across sessions.
+    It is only rebuilt when the number of methods in the project changes,
+    eg. after a new method has been written.
+    """
+    return _build_method_registry(bd.projects.current, len(bd.methods))
@@ -0,0 +1,135 @@
+# plots.py
+
+import plotly.graph_objects as go
+
+# Colors of the pie chart slices; labels not listed here are drawn in black
+PIECHART_COLORS = {
+    'Scope 1': '#33cc33',
+    'Scope 2': '#ffcc00',
+    'Scope 3': '#3366ff',
+}
+
+def get_piechart_colors(labels: list) -> list:
+    return [PIECHART_COLORS.get(label, '#000000') for label in labels]
+
+def create_plotly_figure_piechart(data_dict: dict) -> go.Figure:
+    plotly_figure = go.Figure(
+        data=[
+            go.Pie(
+                labels=list(data_dict.keys()),
+                values=list(data_dict.values()),
+                marker=dict(colors=get_piechart_colors(data_dict.keys()))
+            )
+        ]
+    )
+    plotly_figure.update_traces(
+        marker=dict(
+            line=dict(color='#000000', width=2)
+        )
+    )
+    plotly_figure.update_layout(
+        autosize=True,
+        height=300,
+        legend=dict(
+            orientation="v",
+            yanchor="auto",
+            y=1,
+            xanchor="right",
+            x=-0.3
+        ),
+        margin=dict(
+            l=50,
+            r=50,
+            b=0,
+            t=0,
+            pad=0
+        ),
+    )
+    return plotly_figure
+
+def update_plotly_figure_piechart(plotly_figure: go.Figure, data_dict: dict):
+    """
+    Updates a pie chart created by `create_plotly_figure_piechart` in place.
+
+    Layout and colors are left untouched; only the trace properties which changed are set.
+    If the figure is displayed in a `pn.pane.Plotly` (with the default `link_figure=True`),
+    Panel sends them to the browser as a Plotly restyle message instead of re-sending the whole figure.
+
+    Parameters
+    ----------
+    plotly_figure : go.Figure
+        The pie chart, eg. `widget_plotly_figure_piechart.object`.
+    data_dict : dict
+        Dictionary mapping the slice labels to their values, eg. `PanelLCA.scope_dict`.
+    """
+    trace = plotly_figure.data[0]
+    labels = list(data_dict.keys())
+    values = [float(value) for value in data_dict.values()]
+    if list(trace.labels) != labels:
+        plotly_figure.plotly_restyle(
+            {'labels': [labels], 'values': [values], 'marker.colors': [get_piechart_colors(labels)]},
+            trace_indexes=[0],
+        )
+    elif list(trace.values) != values:
+        plotly_figure.plotly_restyle({'values': [values]}, trace_indexes=[0])
+
+# Color of the Sankey nodes which collect all suppliers not shown
+SANKEY_OTHER_COLOR = '#bbbbbb'
+
+def get_sankey_properties(sankey_data: dict) -> dict:
+    """
+    Returns the Sankey trace properties for the output of `sankey.aggregate_sankey_links`, as plain lists.
+    """
+    return {
+        'node.label': list(sankey_data['label']),
+        'node.color': [PIECHART_COLORS.get(f'Scope {scope}', SANKEY_OTHER_COLOR) for scope in sankey_data['scope']],
+        'link.source': [int(index) for index in sankey_data['source']],
+        'link.target': [int(index) for index in sankey_data['target']],
+        'link.value': [float(value) for value in sankey_data['value']],
+    }
+
+def create_plotly_figure_sankey(sankey_data: dict = None) -> go.Figure:
+    plotly_figure = go.Figure(
+        data=[
+            go.Sankey(
+                arrangement='snap',
+                node=dict(pad=10, thickness=12, line=dict(color='#000000', width=0.5)),
+                link=dict(color='rgba(0, 0, 0, 0.2)'),
+            )
+        ]
+    )
+    plotly_figure.update_layout(
+        autosize=True,
+        height=600,
+        margin=dict(
+            l=10,
+            r=10,
+            b=10,
+            t=10,
+            pad=0
+        ),
+    )
+    if sankey_data is not None:
+        update_plotly_figure_sankey(plotly_figure, sankey_data)
+    return plotly_figure
+
+def update_plotly_figure_sankey(plotly_figure: go.Figure, sankey_data: dict):
+    """
+    Updates a Sankey diagram created by `create_plotly_figure_sankey` in place.
+    As for `update_plotly_figure_piechart`, only the node and link properties which changed are sent to the browser.
+
+    Parameters
+    ----------
+    plotly_figure : go.Figure
+        The Sankey diagram.
+    sankey_data : dict
+        Nodes and links of the diagram (see `sankey.aggregate_sankey_links`).
+    """
+    trace = plotly_figure.data[0]
+    restyle_data = {
+        key: [value]
+        for key, value in get_sankey_properties(sankey_data).items()
+        if list(trace[key] or ()) != value
+    }
+    if restyle_data:
+        plotly_figure.plotly_restyle(restyle_data, trace_indexes=[0])
@@ -0,0 +1,242 @@
+# prefetch.py
+
+import os
+import sys
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bw2data.backends import ActivityDataset
+from utils import create_sanitized_key
+from sparql_queries import get_technosphere, get_biosphere
+from lca_model import PanelLCA
+from result_cache import get_result_cache
+
+# Number of activities prefetched after every calculation.
+# Set with the environment variable `LCA_PREFETCH_SIZE`; `0` disables prefetching.
+PREFETCH_MAX_ITEMS = int(os.environ.get('LCA_PREFETCH_SIZE', 5))
+
+# Number of recent selections considered as prefetch candidates
+PREFETCH_RECENT_SELECTIONS = 20
+
+# Number of fetched supply chains held in memory until their product is selected; the oldest are discarded
+PREFETCH_MAX_SUPPLY_CHAINS = 20
+
+# Selections of all sessions of this process, most recent last, and how often each product was selected
+_recent_selections = deque(maxlen=PREFETCH_RECENT_SELECTIONS)
+_selection_counts = Counter()
+
+
+def record_selection(product_label: str):
+    """
+    Records the calculation of a product, to prefetch recent and popular products (see `get_prefetch_candidates`).
+    """
+    if product_label in _recent_selections:
+        _recent_selections.remove(product_label)
+    _recent_selections.append(product_label)
+    _selection_counts[product_label] += 1
+
+
+def get_child_labels(panel_lca: PanelLCA) -> list:
+    """
+    Returns the products directly supplying the product of the last graph traversal (`df_traversal`),
+    largest cumulative burden first.
+    """
+    df = panel_lca.df_traversal
+    if df is None or df.empty:
+        return []
+    root_uids = df.loc[df['ParentUID'] == -1, 'UID']
+    df_children = df[df['ParentUID'].isin(root_uids)].sort_values('Burden(Cumulative)', ascending=False)
+    ids = df_children['activity_datapackage_id'].unique().tolist()
+    if not ids:
+        return []
+    dict_codes = {
+        row.id: row.code for row in
+        ActivityDataset.select(ActivityDataset.id, ActivityDataset.code).where(ActivityDataset.id.in_(ids))
+    }
+    dict_code_to_label = {create_sanitized_key(src): label for label, src in panel_lca.dict_label_to_src.items()}
+    labels = [dict_code_to_label.get(dict_codes.get(i)) for i in ids]
+    return [label for label in labels if label is not None]
+
+
+def get_prefetch_candidates(panel_lca: PanelLCA, product_label: str, max_items: int = PREFETCH_MAX_ITEMS) -> list:
+    """
+    Returns the products most likely to be selected after `product_label`:
+    its direct suppliers (see `get_child_labels`), then recent and popular selections (see `record_selection`).
+
+    Parameters
+    ----------
+    panel_lca : PanelLCA
+        Instance of the last calculation.
+    product_label : str
+        The srcLabel of the product of the last calculation; it is not a candidate itself.
+    max_items : int
+        Maximum number of candidates.
+    """
+    candidates = get_child_labels(panel_lca)
+    candidates += reversed(_recent_selections)
+    candidates += [label for label, _ in _selection_counts.most_common(max_items)]
+    candidates = [
+        label for label in dict.fromkeys(candidates)
+        if label != product_label and label in panel_lca.dict_label_to_src
+    ]
+    return candidates[:max_items]
+
+
+class Prefetcher:
+    """
+    Speculatively prepares the products a user is likely to select next (see `get_prefetch_candidates`),
+    so that the next selection skips the SPARQL queries and, for products already ingested, the calculation.
+
+    After every calculation, `schedule` replaces the pending work:
+    - The SPARQL queries of products not yet ingested (see `PanelLCA.is_ingested`) start in a background thread.
+      The responses are only held in memory (see `take_supply_chain`) and ingested once the product is selected,
+      since every ingestion changes the database version, and with it the keys of all cached results and matrices.
+    - The results of products already ingested are queued. `step`, which the app calls in idle time,
+      starts one calculation at a time in the background thread, with the method, amount, cut-off and engine
+      of the last calculation, and stores the result in the result cache.
+
+    Calculations run on a separate `PanelLCA` instance, so that the state of the session is never modified,
+    and never write to the database. `cancel` (called on every new user input) empties the queue
+    and cancels the queries which have not started; responses which have arrived are kept.
+
+    Prefetching is disabled in Pyodide, which has no threads, and if `max_items` is 0.
+
+    Parameters
+    ----------
+    max_items : int
+        Size of the queue.
+    """
+
+    def __init__(self, max_items: int = PREFETCH_MAX_ITEMS):
+        self.max_items = max_items
+        self.queue = deque(maxlen=max(max_items, 1))
+        self.fetches = {}
+        self.supply_chains = OrderedDict()
+        # label and future of the calculation in progress
+        self.calculation = None
+        self.params = None
+        self.panel_lca = None
+        self.executor = None
+        self.completed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0 and sys.platform != 'emscripten'
+
+    def __len__(self) -> int:
+        """
+        Returns the number of queued calculations and queries and calculations in progress.
+        """
+        return len(self.queue) + len(self.fetches) + (self.calculation is not None)
+
+    def schedule(self, panel_lca: PanelLCA, params: dict):
+        """
+        Replaces the pending work by the likely next products after a calculation.
+
+        Parameters
+        ----------
+        panel_lca : PanelLCA
+            Instance of the calculation; its database, products and methods are used.
+        params : dict
+            Parameters of the calculation, see `management_col.get_calculation_parameters`.
+        """
+        self.cancel()
+        if not self.enabled:
+            return
+        if self.panel_lca is None:
+            self.panel_lca = PanelLCA()
+        self.panel_lca.db_name = panel_lca.db_name
+        self.panel_lca.dict_label_to_src = panel_lca.dict_label_to_src
+        self.panel_lca.dict_db_methods = panel_lca.dict_db_methods
+        self.params = params
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        for label in get_prefetch_candidates(panel_lca, params['product'], self.max_items):
+            if panel_lca.is_ingested(label):
+                self.queue.append(label)
+            elif label not in self.supply_chains and label not in self.fetches:
+                src = panel_lca.dict_label_to_src[label]
+                self.fetches[label] = self.executor.submit(lambda src: (get_technosphere(src), get_biosphere(src)), src)
+
+    def cancel(self):
+        """
+        Empties the queue and cancels the queries which have not started.
+        Queries and calculations in progress complete; their results are kept.
+        """
+        self.queue.clear()
+        self.fetches = {label: future for label, future in self.fetches.items() if not future.cancel()}
+
+    def collect(self):
+        """
+        Moves the responses of completed queries to `supply_chains`, discarding the oldest beyond `PREFETCH_MAX_SUPPLY_CHAINS`.
+        """
+        for label, future in list(self.fetches.items()):
+            if not future.done():
+                continue
+            del self.fetches[label]
+            try:
+                self.supply_chains[label] = future.result()
+            except Exception as error:
+                print(f"Prefetching '{label}' failed: {error}")
+                continue
+            self.supply_chains.move_to_end(label)
+            while len(self.supply_chains) > PREFETCH_MAX_SUPPLY_CHAINS:
+                self.supply_chains.popitem(last=False)
+
+    def take_supply_chain(self, label: str) -> tuple:
+        """
+        Returns and forgets the prefetched SPARQL responses of a product
+        (see `PanelLCA.get_src_and_get_technosphere_and_biosphere`), or `None` if they have not arrived.
+        """
+        self.collect()
+        return self.supply_chains.pop(label, None)
+
+    def step(self) -> bool:
+        """
+        Performs one unit of prefetching work without blocking: collects the arrived SPARQL responses
+        and starts the next queued calculation in the background thread, once the previous one has completed.
+
+        Returns
+        -------
+        bool
+            Whether work is left; `False` once all queries and calculations have completed.
+        """
+        self.collect()
+        if self.calculation is not None:
+            label, future = self.calculation
+            if not future.done():
+                return True
+            self.calculation = None
+            try:
+                future.result()
+                self.completed += 1
+            except Exception as error:
+                print(f"Prefetching '{label}' failed: {error}")
+        if self.queue:
+            label = self.queue.popleft()
+            self.calculation = (label, self.executor.submit(self.calculate, label, self.params))
+        return len(self) > 0
+
+    def calculate(self, label: str, params: dict):
+        """
+        Calculates the result of a product and stores it in the result cache,
+        unless it is already there, the cache is disabled or the product is no longer ingested
+        (eg. after the database has been replaced). Runs in the background thread.
+        """
+        panel_lca = self.panel_lca
+        if get_result_cache() is None or not panel_lca.is_ingested(label):
+            return
+        panel_lca.set_graph_traversal_cutoff(params['cutoff'] / 100)
+        panel_lca.set_graph_traversal_engine(params['engine'])
+        node = panel_lca.get_src_and_get_technosphere_and_biosphere(label)
+        if panel_lca.load_cached_result(label, params['method'], params['amount']):
+            return
+        panel_lca.set_chosen_activity(node)
+        panel_lca.set_chosen_method_and_unit(params['method'])
+        panel_lca.set_chosen_amount(params['amount'])
+        panel_lca.perform_lca()
+        panel_lca.perform_contribution_analysis()
+        panel_lca.perform_graph_traversal()
+        panel_lca.set_df_tabulator_from_traversal()
+        panel_lca.perform_scope_analysis(df=panel_lca.df_tabulator)
+        panel_lca.store_result()
@@ -0,0 +1,166 @@
+# profiling.py
+
+import os
+import sys
+import json
+import time
+import cProfile
+import functools
+import threading
+from datetime import datetime, timezone
+from collections import Counter
+from contextlib import contextmanager
+
+# Directory of the saved profiles.
+# Set with the environment variable `LCA_PROFILE_DIR`; by default `profiles` in the working directory.
+PROFILE_DIRECTORY = os.environ.get('LCA_PROFILE_DIR', 'profiles')
+
+# Interval between two stack samples in seconds
+PROFILE_SAMPLE_INTERVAL_S = 0.005
+
+
+def get_frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Samples the call stack of a thread at a fixed interval from a background thread
+    and counts the sampled stacks in the collapsed format of flame graph tools
+    (eg. `flamegraph.pl`, speedscope): one line per stack, frames from the root separated by `;`, then the count.
+
+    Parameters
+    ----------
+    thread_id : int
+        Identifier of the sampled thread (see `threading.get_ident`).
+    interval_s : float
+        Interval between two samples in seconds.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float = PROFILE_SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(get_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+@contextmanager
+def profile_run(name: str, parameters: dict = None, directory: str = PROFILE_DIRECTORY):
+    """
+    Profiles the enclosed code with `cProfile` and a `StackSampler` and saves, in `directory`,
+    a pstats file (`.pstats`, eg. for `snakeviz`), a collapsed stack file (`.collapsed`, for flame graphs)
+    and the parameters of the run with its wall time (`.json`), all named `<UTC timestamp>_<name>`.
+
+    Yields a dictionary, which holds the paths of the files (`pstats`, `collapsed`, `parameters`) after the run.
+    If another deterministic profiler is active (eg. a debugger), only the stacks are sampled.
+
+    Parameters
+    ----------
+    name : str
+        Name of the run, eg. the event handler.
+    parameters : dict
+        Parameters of the run (JSON serializable), saved with the profile.
+    directory : str
+        Directory of the saved profiles; created if necessary.
+    """
+    os.makedirs(directory, exist_ok=True)
+    started = datetime.now(timezone.utc)
+    prefix = os.path.join(directory, f"{started.strftime('%Y%m%dT%H%M%S_%f')}_{name}")
+    paths = {}
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        profile = None
+    # Pyodide has no threads; only the deterministic profile is saved
+    sampler = StackSampler(threading.get_ident()) if sys.platform != 'emscripten' else None
+    if sampler is not None:
+        sampler.start()
+    start = time.perf_counter()
+    try:
+        yield paths
+    finally:
+        wall_time_s = time.perf_counter() - start
+        if sampler is not None:
+            sampler.stop()
+        if profile is not None:
+            profile.disable()
+            paths['pstats'] = f'{prefix}.pstats'
+            profile.dump_stats(paths['pstats'])
+        if sampler is not None:
+            paths['collapsed'] = f'{prefix}.collapsed'
+            sampler.write_collapsed(paths['collapsed'])
+        paths['parameters'] = f'{prefix}.json'
+        with open(paths['parameters'], 'w') as file:
+            json.dump({
+                'name': name,
+                'started': started.isoformat(),
+                'wall_time_s': wall_time_s,
+                'samples': sum(sampler.stacks.values()) if sampler is not None else 0,
+                'sample_interval_s': PROFILE_SAMPLE_INTERVAL_S,
+                'parameters': parameters or {},
+            }, file, indent=2, default=str)
+        print(f"Saved the profile of '{name}' to {prefix}.*")
+
+
+class Profiler:
+    """
+    On-demand profiling of event handlers (see `profile_run`), eg. of the calculation of a pathologically slow product.
+
+    Handlers are wrapped once with `wrap`; they are only profiled while `enabled` is set.
+    While disabled, a call costs a single attribute check, so that the wrappers can stay in production.
+
+    Parameters
+    ----------
+    get_parameters : callable
+        Returns the parameters saved with every profile, eg. the widget values.
+    on_saved : callable
+        Called with the paths of the files (see `profile_run`) after every profiled call.
+    directory : str
+        Directory of the saved profiles.
+    """
+
+    def __init__(self, get_parameters=None, on_saved=None, directory: str = PROFILE_DIRECTORY):
+        self.get_parameters = get_parameters
+        self.on_saved = on_saved
+        self.directory = directory
+        self.enabled = False
+        self.last_paths = None
+
+    def wrap(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            parameters = self.get_parameters() if self.get_parameters is not None else {}
+            with profile_run(function.__name__, parameters=parameters, directory=self.directory) as paths:
+                result = function(*args, **kwargs)
+            self.last_paths = paths
+            if self.on_saved is not None:
+                self.on_saved(paths)
+            return result
+        return wrapper
@@ -0,0 +1,604 @@
+# rdf_import.py
+
+"""
+Offline import of a WISER RDF dump (N-Triples or Turtle, optionally gzipped) into a Brightway database,
+eg. for air-gapped use or to serve all products without the SPARQL endpoint.
+
+The dump is parsed as a stream of triples. Only the triples which `sparql_queries.get_technosphere`
+and `sparql_queries.get_biosphere` query (`WISER_PREDICATES` and the types in `WISER_TYPES`) are kept,
+and they are spilled to a temporary SQLite file instead of memory. The supply chains of all activities
+are then extracted with the same joins as the SPARQL queries and written to the database in a single bulk write.
+Memory therefore scales with the size of the resulting database, not with the size of the dump.
+
+The database is replaced and marked as imported (database metadata `rdf_dump`), so that `PanelLCA`
+lists its products and serves their supply chains from the database instead of the SPARQL endpoint.
+
+Usage (from the `app` directory):
+
+    python rdf_import.py wiser_export.nt.gz
+    python rdf_import.py wiser_export.ttl --database my_database --spill-file /scratch/wiser.sqlite
+"""
+
+import os
+import re
+import gzip
+import time
+import sqlite3
+import argparse
+import tempfile
+import itertools
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+
+import bw2data as bd
+from utils import create_sanitized_key
+from characterization import characterize_database
+from matrix_cache import invalidate_database_content_hash
+
+WISER = 'https://purl.org/wiser#'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDF_FIRST = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#first'
+RDF_REST = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#rest'
+RDF_NIL = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#nil'
+
+# Predicates used by the queries of `sparql_queries.py`, with the short names used in the spill file
+WISER_PREDICATES = {
+    f'{WISER}{name}': name for name in [
+        'hasChildActivitiy',
+        'hasExchange',
+        'isReferenceExchangeOf',
+        'hasMeanValue',
+        'pathToNameObject',
+        'pathToUnitObject',
+        'pathToGeographyObject',
+        'pathToExchangeNameObject',
+        'pathToExchangeUnitObject',
+        'name',
+        'hasUnit',
+        'hasGeography',
+        'category',
+        'subCategory',
+    ]
+}
+
+# Types used by the queries of `sparql_queries.py`; other `rdf:type` triples are dropped
+WISER_TYPES = {
+    f'{WISER}{name}' for name in ['BActivity', 'BBiosphereExchange', 'BBiosphereOutputExchange', 'BBiopshereInputExchange']
+}
+
+# Number of triples inserted into the spill file at once
+SPILL_BATCH_SIZE = 50_000
+
+
+def open_dump(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def get_dump_format(path: str) -> str:
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.nt'):
+        return 'nt'
+    if name.endswith('.ttl'):
+        return 'ttl'
+    raise ValueError(f"Unknown RDF format of '{path}'. Use N-Triples ('.nt') or Turtle ('.ttl'), optionally gzipped.")
+
+
+ESCAPE_SEQUENCES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+
+
+def unescape(string: str) -> str:
+    """
+    Replaces the escape sequences of N-Triples and Turtle strings (eg. `\\n`, `\\u00e9`).
+    """
+    if '\\' not in string:
+        return string
+    def replace(match):
+        sequence = match.group(1)
+        if sequence[0] in 'uU' and len(sequence) > 1:
+            return chr(int(sequence[1:], 16))
+        return ESCAPE_SEQUENCES.get(sequence, sequence)
+    return ESCAPE.sub(replace, string)
+
+
+NTRIPLES_TERM = r'<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?'
+NTRIPLES_LINE = re.compile(rf'\s*({NTRIPLES_TERM})\s*(<[^>]*>)\s*({NTRIPLES_TERM})\s*\.\s*(?:#.*)?$')
+
+
+def ntriples_term(term: str) -> str:
+    """
+    Returns the value of an N-Triples term: the IRI without brackets, the blank node label (`_:b0`)
+    or the lexical form of a literal (without language tag or datatype).
+    """
+    if term[0] == '<':
+        return term[1:-1]
+    if term[0] == '"':
+        return unescape(term[1:term.rindex('"')])
+    return term
+
+
+def iter_ntriples(file):
+    """
+    Yields the triples of an N-Triples file as `(subject, predicate, object)` tuples of strings, one line at a time.
+    """
+    for number, line in enumerate(file, start=1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = NTRIPLES_LINE.match(line)
+        if match is None:
+            raise SyntaxError(f'Invalid N-Triples statement in line {number}: {line.strip()[:200]}')
+        subject, predicate, obj = match.groups()
+        yield ntriples_term(subject), predicate[1:-1], ntriples_term(obj)
+
+
+TURTLE_TOKEN = re.compile(r'''
+    (?P<skip>\s+|\#[^\n]*)
+    |(?P<directive>@prefix|@base|(?i:prefix|base)(?=\s))
+    |(?P<iri><[^>]*>)
+    |(?P<long_string>"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^'\\]|\\.|'(?!''))*\'\'\')
+    |(?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    |(?P<language>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+    |(?P<datatype>\^\^)
+    |(?P<blank_node>_:[\w-]+(?:\.+[\w-]+)*)
+    |(?P<number>[+-]?(?:\d*\.\d+(?:[eE][+-]?\d+)?|\d+[eE][+-]?\d+|\d+))
+    |(?P<boolean>(?:true|false)(?![\w:-]))
+    |(?P<a>a(?![\w:-]))
+    |(?P<prefixed_name>(?:[A-Za-z][\w-]*(?:\.+[\w-]+)*)?:(?:(?:[\w:%-]|\\.)+(?:\.+(?:[\w:%-]|\\.)+)*)?)
+    |(?P<punctuation>[.;,\[\]()])
+''', re.VERBOSE)
+
+
+# Number of lines of a Turtle file tokenized at once
+TURTLE_BLOCK_LINES = 1000
+
+
+def iter_turtle_tokens(file, block_lines: int = TURTLE_BLOCK_LINES):
+    """
+    Yields the tokens of a Turtle file as `(kind, token)` tuples, with the kinds of `TURTLE_TOKEN`.
+
+    The file is tokenized in blocks of lines. Only the tokens of long strings (`\"\"\"...\"\"\"`) can span lines;
+    if one starts in a block but does not end there, the block is extended until it does.
+    Since quotes are only matched by the tokenizer, quotes in comments, IRIs or short strings are never
+    mistaken for the start of a long string.
+    """
+    block = ''.join(itertools.islice(file, block_lines))
+    position = 0
+    while position < len(block):
+        match = TURTLE_TOKEN.match(block, position)
+        if block.startswith(('"""', "'''"), position) and (match is None or match.lastgroup != 'long_string'):
+            lines = ''.join(itertools.islice(file, block_lines))
+            if not lines:
+                raise SyntaxError('Unterminated long string at the end of the Turtle file.')
+            block = block[position:] + lines
+            position = 0
+            continue
+        if match is None:
+            raise SyntaxError(f'Invalid Turtle syntax: {block[position:position + 200]!r}')
+        position = match.end()
+        if match.lastgroup != 'skip':
+            yield match.lastgroup, match.group()
+        if position == len(block):
+            block = ''.join(itertools.islice(file, block_lines))
+            position = 0
+
+
+class TurtleParser:
+    """
+    Streaming parser of the Turtle syntax used in RDF dumps: prefix and base directives, prefixed names,
+    predicate and object lists, literals with language tag or datatype, numbers, booleans,
+    blank node property lists (`[ ... ]`) and collections (`( ... )`).
+
+    Triples are yielded statement by statement, so that memory does not grow with the size of the file.
+    """
+
+    def __init__(self, file, base: str = ''):
+        self.tokens = iter_turtle_tokens(file)
+        self.token = next(self.tokens, None)
+        self.prefixes = {}
+        self.base = base
+        self.blank_node_counter = itertools.count()
+        self.triples = []
+
+    def advance(self) -> tuple:
+        token, self.token = self.token, next(self.tokens, None)
+        if token is None:
+            raise SyntaxError('Unexpected end of the Turtle file.')
+        return token
+
+    def expect(self, value: str):
+        kind, token = self.advance()
+        if token != value:
+            raise SyntaxError(f"Expected '{value}' in Turtle file, found '{token}'.")
+
+    def new_blank_node(self) -> str:
+        return f'_:genid{next(self.blank_node_counter)}'
+
+    def resolve_iri(self, iri: str) -> str:
+        iri = unescape(iri[1:-1])
+        return urljoin(self.base, iri) if self.base else iri
+
+    def resolve_prefixed_name(self, name: str) -> str:
+        prefix, _, local = name.partition(':')
+        if prefix not in self.prefixes:
+            raise SyntaxError(f"Undefined prefix '{prefix}:' in Turtle file.")
+        return self.prefixes[prefix] + re.sub(r'\\(.)', r'\1', local)
+
+    def __iter__(self):
+        while self.token is not None:
+            kind, token = self.token
+            if kind == 'directive':
+                self.parse_directive()
+            else:
+                self.parse_triples()
+            yield from self.triples
+            self.triples = []
+
+    def parse_directive(self):
+        kind, directive = self.advance()
+        if directive.lower().endswith('prefix'):
+            kind, prefix = self.advance()
+            kind, iri = self.advance()
+            self.prefixes[prefix[:-1]] = self.resolve_iri(iri)
+        else:
+            kind, iri = self.advance()
+            self.base = self.resolve_iri(iri)
+        if directive.startswith('@'):
+            self.expect('.')
+
+    def parse_triples(self):
+        if self.token == ('punctuation', '['):
+            subject = self.parse_blank_node_property_list()
+            if self.token != ('punctuation', '.'):
+                self.parse_predicate_object_list(subject)
+        else:
+            subject = self.parse_term()
+            self.parse_predicate_object_list(subject)
+        self.expect('.')
+
+    def parse_predicate_object_list(self, subject: str):
+        while True:
+            kind, token = self.advance()
+            predicate = RDF_TYPE if kind == 'a' else self.parse_iri(kind, token)
+            while True:
+                self.triples.append((subject, predicate, self.parse_term()))
+                if self.token != ('punctuation', ','):
+                    break
+                self.advance()
+            if self.token != ('punctuation', ';'):
+                return
+            while self.token == ('punctuation', ';'):
+                self.advance()
+            if self.token in (('punctuation', '.'), ('punctuation', ']')):
+                return
+
+    def parse_blank_node_property_list(self) -> str:
+        self.expect('[')
+        blank_node = self.new_blank_node()
+        if self.token != ('punctuation', ']'):
+            self.parse_predicate_object_list(blank_node)
+        self.expect(']')
+        return blank_node
+
+    def parse_collection(self) -> str:
+        self.expect('(')
+        head = previous = RDF_NIL
+        while self.token != ('punctuation', ')'):
+            node = self.new_blank_node()
+            if previous == RDF_NIL:
+                head = node
+            else:
+                self.triples.append((previous, RDF_REST, node))
+            self.triples.append((node, RDF_FIRST, self.parse_term()))
+            previous = node
+        self.expect(')')
+        if previous != RDF_NIL:
+            self.triples.append((previous, RDF_REST, RDF_NIL))
+        return head
+
+    def parse_iri(self, kind: str, token: str) -> str:
+        if kind == 'iri':
+            return self.resolve_iri(token)
+        if kind == 'prefixed_name':
+            return self.resolve_prefixed_name(token)
+        raise SyntaxError(f"Expected an IRI in Turtle file, found '{token}'.")
+
+    def parse_term(self) -> str:
+        """
+        Returns the value of the next subject or object: an IRI, a blank node label
+        or the lexical form of a literal (without language tag or datatype).
+        """
+        if self.token == ('punctuation', '['):
+            return self.parse_blank_node_property_list()
+        if self.token == ('punctuation', '('):
+            return self.parse_collection()
+        kind, token = self.advance()
+        if kind in ('string', 'long_string'):
+            value = unescape(token[3:-3] if kind == 'long_string' else token[1:-1])
+            if self.token is not None and self.token[0] == 'language':
+                self.advance()
+            elif self.token is not None and self.token[0] == 'datatype':
+                self.advance()
+                self.parse_iri(*self.advance())
+            return value
+        if kind in ('number', 'boolean', 'blank_node'):
+            return token
+        return self.parse_iri(kind, token)
+
+
+def iter_triples(path: str):
+    """
+    Yields the triples of an RDF dump as `(subject, predicate, object)` tuples of strings.
+
+    Parameters
+    ----------
+    path : str
+        Path of an N-Triples (`.nt`) or Turtle (`.ttl`) file, optionally gzipped (`.gz`).
+    """
+    dump_format = get_dump_format(path)
+    with open_dump(path) as file:
+        if dump_format == 'nt':
+            yield from iter_ntriples(file)
+        else:
+            yield from TurtleParser(file, base=f'file://{os.path.abspath(path)}')
+
+
+def spill_triples(triples, connection: sqlite3.Connection) -> int:
+    """
+    Writes the triples used by the WISER queries (see `WISER_PREDICATES` and `WISER_TYPES`) to the table `triples`.
+
+    Returns
+    -------
+    int
+        Number of triples read.
+    """
+    connection.execute('CREATE TABLE triples (s TEXT, p TEXT, o TEXT)')
+    number_of_triples = 0
+    batch = []
+    for subject, predicate, obj in triples:
+        number_of_triples += 1
+        if predicate in WISER_PREDICATES:
+            batch.append((subject, WISER_PREDICATES[predicate], obj))
+        elif predicate == RDF_TYPE and obj in WISER_TYPES:
+            batch.append((subject, 'type', obj[len(WISER):]))
+        if len(batch) >= SPILL_BATCH_SIZE:
+            connection.executemany('INSERT INTO triples VALUES (?, ?, ?)', batch)
+            batch = []
+    connection.executemany('INSERT INTO triples VALUES (?, ?, ?)', batch)
+    connection.execute('CREATE INDEX triples_ps ON triples (p, s)')
+    connection.commit()
+    return number_of_triples
+
+
+# Joins of `sparql_queries.get_technosphere` and `get_biosphere`, on the spilled triples.
+# Nodes with several names, units or geographies get the first one.
+# Without the statistics of `ANALYZE`, SQLite chooses a join order which is quadratic in the number of activities.
+ATTRIBUTE_TABLES = """
+CREATE TEMP TABLE names AS
+    SELECT path.s AS node, MIN(value.o) AS name FROM triples path
+    JOIN triples value ON value.p = 'name' AND value.s = path.o
+    WHERE path.p = 'pathToNameObject' GROUP BY path.s;
+CREATE TEMP TABLE units AS
+    SELECT path.s AS node, MIN(value.o) AS unit FROM triples path
+    JOIN triples value ON value.p = 'hasUnit' AND value.s = path.o
+    WHERE path.p = 'pathToUnitObject' GROUP BY path.s;
+CREATE TEMP TABLE locations AS
+    SELECT path.s AS node, MIN(value.o) AS location FROM triples path
+    JOIN triples value ON value.p = 'hasGeography' AND value.s = path.o
+    WHERE path.p = 'pathToGeographyObject' GROUP BY path.s;
+CREATE UNIQUE INDEX names_node ON names (node);
+CREATE UNIQUE INDEX units_node ON units (node);
+CREATE UNIQUE INDEX locations_node ON locations (node);
+ANALYZE;
+"""
+
+TECHNOSPHERE_QUERY = """
+SELECT DISTINCT child_of.s AS parent, child_of.o AS child, mean.o AS value
+FROM triples child_of
+JOIN triples exchange ON exchange.p = 'hasExchange' AND exchange.s = child_of.s
+JOIN triples reference ON reference.p = 'isReferenceExchangeOf' AND reference.s = exchange.o AND reference.o = child_of.o
+LEFT JOIN triples mean ON mean.p = 'hasMeanValue' AND mean.s = exchange.o
+WHERE child_of.p = 'hasChildActivitiy' AND child_of.s != child_of.o
+    AND child_of.s IN (SELECT node FROM names) AND child_of.o IN (SELECT node FROM names)
+"""
+
+BIOSPHERE_QUERY = """
+SELECT DISTINCT exchange.s AS activity, flow_name.o AS flow, flow_unit.o AS unit, mean.o AS value,
+    category.o AS category, sub_category.o AS sub_category
+FROM triples exchange
+JOIN triples type ON type.p = 'type' AND type.s = exchange.o AND type.o = 'BBiosphereExchange'
+JOIN triples name_path ON name_path.p = 'pathToExchangeNameObject' AND name_path.s = exchange.o
+JOIN triples flow_name ON flow_name.p = 'name' AND flow_name.s = name_path.o
+JOIN triples unit_path ON unit_path.p = 'pathToExchangeUnitObject' AND unit_path.s = exchange.o
+JOIN triples flow_unit ON flow_unit.p = 'hasUnit' AND flow_unit.s = unit_path.o
+JOIN triples mean ON mean.p = 'hasMeanValue' AND mean.s = exchange.o
+JOIN triples category ON category.p = 'category' AND category.s = exchange.o
+JOIN triples sub_category ON sub_category.p = 'subCategory' AND sub_category.s = exchange.o
+WHERE exchange.p = 'hasExchange' AND exchange.s IN (SELECT node FROM names)
+    AND instr(lower(flow_name.o), lower(?)) > 0
+"""
+
+
+def create_database_data(connection: sqlite3.Connection, db_name: str, flow_name_filter: str = '') -> dict:
+    """
+    Returns the activities, elementary flows and exchanges of the spilled triples
+    in the format of `bd.Database.write`, with the same codes and fields as
+    `PanelLCA.get_src_and_get_technosphere_and_biosphere`.
+
+    Activities of type `wiser:BActivity` are the products of the database; they store their IRI as `src`.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to a spill file (see `spill_triples`).
+    db_name : str
+        Name of the Brightway database.
+    flow_name_filter : str
+        Only elementary flows whose name contains this string (case-insensitive) are imported.
+        By default all, as by `sparql_queries.get_biosphere`.
+    """
+    connection.executescript(ATTRIBUTE_TABLES)
+    data = {}
+
+    def add_activity(iri: str) -> tuple:
+        key = (db_name, create_sanitized_key(iri))
+        if key not in data:
+            name, unit, location = connection.execute(
+                """
+                SELECT names.name, units.unit, locations.location FROM names
+                LEFT JOIN units ON units.node = names.node
+                LEFT JOIN locations ON locations.node = names.node
+                WHERE names.node = ?
+                """,
+                (iri,),
+            ).fetchone()
+            data[key] = {
+                'name': name,
+                'categories': ('technosphere',),
+                'location': location or 'GLO',
+                'unit': unit or 'unitless',
+                'type': bd.labels.chimaera_node_default,
+                'exchanges': [],
+            }
+        return key
+
+    for (iri,) in connection.execute(
+            "SELECT DISTINCT type.s FROM triples type JOIN names ON names.node = type.s "
+            "WHERE type.p = 'type' AND type.o = 'BActivity'"
+        ):
+        data[add_activity(iri)]['src'] = iri
+
+    for parent, child, value in connection.execute(TECHNOSPHERE_QUERY).fetchall():
+        parent_key = add_activity(parent)
+        child_key = add_activity(child)
+        if value:
+            data[parent_key]['exchanges'].append({'input': child_key, 'amount': float(value), 'type': 'technosphere'})
+
+    for activity, flow, unit, value, category, sub_category in connection.execute(BIOSPHERE_QUERY, (flow_name_filter,)).fetchall():
+        flow_key = (db_name, create_sanitized_key(flow))
+        if flow_key not in data:
+            data[flow_key] = {
+                'name': flow_key[1],
+                'categories': ('biosphere', sub_category or ''),
+                'unit': unit or 'unitless',
+                'type': 'emission',
+                'exchanges': [],
+            }
+        if value:
+            data[add_activity(activity)]['exchanges'].append({'input': flow_key, 'amount': float(value), 'type': 'biosphere'})
+    return data
+
+
+def import_rdf_dump(
+        path: str,
+        db_name: str,
+        spill_file: str = None,
+        flow_name_filter: str = '',
+    ) -> dict:
+    """
+    Imports an RDF dump into the Brightway database `db_name` of the project `db_name` (see `PanelLCA.set_db`),
+    replacing its contents. The elementary flows are characterized as by the SPARQL ingestion
+    (see `characterization.characterize_database`).
+
+    Parameters
+    ----------
+    path : str
+        Path of the dump (see `iter_triples`).
+    db_name : str
+        Name of the Brightway project and database.
+    spill_file : str
+        Path of the SQLite file for the extracted triples; by default a temporary file, which is deleted afterwards.
+    flow_name_filter : str
+        See `create_database_data`.
+
+    Returns
+    -------
+    dict
+        Statistics of the import: number of triples, kept triples, activities, products, flows, exchanges and wall times.
+    """
+    statistics = {}
+    start = time.perf_counter()
+    spill_directory = None
+    if spill_file is None:
+        spill_directory = tempfile.mkdtemp(prefix='rdf_import_')
+        spill_file = os.path.join(spill_directory, 'triples.sqlite')
+    elif os.path.exists(spill_file):
+        os.remove(spill_file)
+    try:
+        connection = sqlite3.connect(spill_file)
+        statistics['triples'] = spill_triples(iter_triples(path), connection)
+        statistics['kept_triples'] = connection.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+        statistics['parse_s'] = time.perf_counter() - start
+        data = create_database_data(connection, db_name, flow_name_filter=flow_name_filter)
+        connection.close()
+    finally:
+        if spill_directory is not None:
+            for name in os.listdir(spill_directory):
+                os.remove(os.path.join(spill_directory, name))
+            os.rmdir(spill_directory)
+    statistics['extract_s'] = time.perf_counter() - start - statistics['parse_s']
+
+    flows = [key for key, dataset in data.items() if dataset['type'] == 'emission']
+    statistics.update({
+        'activities': len(data) - len(flows),
+        'products': sum('src' in dataset for dataset in data.values()),
+        'flows': len(flows),
+        'exchanges': sum(len(dataset['exchanges']) for dataset in data.values()),
+    })
+
+    bd.projects.set_current(db_name)
+    database = bd.Database(db_name)
+    if db_name not in bd.databases:
+        database.register()
+    database.write(data)
+    database.metadata['rdf_dump'] = {
+        'path': os.path.abspath(path),
+        'imported': datetime.now(timezone.utc).isoformat(),
+        'flow_name_filter': flow_name_filter,
+    }
+    bd.databases.flush()
+
+    ipcc = bd.Method(('IPCC',))
+    if ipcc.name not in bd.methods:
+        ipcc.register(description='Sample IPCC Method', unit='kg CO2eq')
+    statistics['characterized_flows'] = characterize_database(db_name)['characterized_flows']
+    invalidate_database_content_hash()
+    statistics['wall_time_s'] = time.perf_counter() - start
+    return statistics
+
+
+def is_imported_database(db_name: str) -> bool:
+    """
+    Returns whether the database has been imported from an RDF dump (see `import_rdf_dump`).
+    """
+    return db_name in bd.databases and 'rdf_dump' in bd.databases[db_name]
+
+
+def get_imported_activity_labels(db_name: str) -> list:
+    """
+    Returns the products of an imported database in the format of `sparql_queries.get_activity_labels`.
+    """
+    from bw2data.backends import ActivityDataset
+    rows = ActivityDataset.select(ActivityDataset.name, ActivityDataset.data).where(ActivityDataset.database == db_name)
+    return [{'src': row.data['src'], 'srcLabel': row.name} for row in rows if 'src' in row.data]
+
+
+def main():
+    from constants import DATABASE_NAME
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', type=str, help='N-Triples or Turtle file, optionally gzipped.')
+    parser.add_argument('--database', type=str, default=DATABASE_NAME)
+    parser.add_argument('--spill-file', type=str, default=None, help='SQLite file for the extracted triples (default: temporary).')
+    parser.add_argument('--flow-name-filter', type=str, default='', help='Only import elementary flows whose name contains this string.')
+    args = parser.parse_args()
+    statistics = import_rdf_dump(args.path, args.database, spill_file=args.spill_file, flow_name_filter=args.flow_name_filter)
+    print(
+        f"Imported {statistics['activities']:,} activities ({statistics['products']:,} products), "
+        f"{statistics['flows']:,} elementary flows ({statistics['characterized_flows']:,} characterized) and {statistics['exchanges']:,} exchanges "
+        f"from {statistics['triples']:,} triples in {statistics['wall_time_s']:,.1f} s"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# result_cache.py
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Default size budget of the result cache, in MB (see `get_result_cache`)
+RESULT_CACHE_DEFAULT_MB = 256
+
+
+def get_result_key(
+        database_version: str,
+        activity_code: str,
+        method: tuple,
+        amount: float,
+        cutoff: float,
+        engine: str,
+        dict_scope_overrides: dict = None,
+        method_version: str = '',
+    ) -> str:
+    """
+    Returns the content address of a calculation result: a SHA-256 hash of all inputs which determine it.
+
+    Parameters
+    ----------
+    database_version : str
+        Content hash of the database (see `matrix_cache.get_database_content_hash`).
+    activity_code : str
+        Code of the demanded activity.
+    method : tuple
+        Method tuple.
+    amount : float
+        Demanded amount.
+    cutoff : float
+        Graph traversal cutoff (fraction of the total score).
+    engine : str
+        Graph traversal engine.
+    dict_scope_overrides : dict
+        Scopes chosen by the user, which take precedence over the scope classifier.
+    method_version : str
+        Content hash of the characterization factors of the method,
+        which change without the database if elementary flows are characterized again.
+    """
+    inputs = [
+        database_version,
+        activity_code,
+        list(method),
+        float(amount),
+        float(cutoff),
+        engine,
+        sorted((int(key), int(value)) for key, value in (dict_scope_overrides or {}).items()),
+        method_version,
+    ]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def get_result_size(result: dict) -> int:
+    """
+    Returns the memory used by the dataframes of a result in bytes.
+    """
+    dataframes = [result['df_traversal']] + list((result.get('contributions') or {}).values())
+    return int(sum(df.memory_usage(deep=True).sum() for df in dataframes))
+
+
+class ResultCache:
+    """
+    Content-addressed cache of calculation results (see `get_result_key`) with a size budget and LRU eviction.
+
+    A result is a dictionary with the LCA `score`, the `scope_dict`, the compact traversal table `df_traversal`
+    (see `lca_model.compact_traversal_table`) and optionally the `contributions`, so that a cache hit
+    can be shown without any bw2calc calculation. Cached dataframes are shared and must not be modified.
+
+    If `directory` is given, results are also written to disk (one pickle file per result)
+    and results evicted from memory, or stored by other processes, are read from there.
+    The files are subject to the same size budget, with their modification time as last use.
+
+    The cache is shared by all sessions of the app; it is thread-safe.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Size budget in bytes, in memory and on disk each.
+    directory : str
+        Directory for disk persistence. By default, results are kept in memory only.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_DEFAULT_MB * 10**6, directory: str = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries or (self.directory is not None and os.path.exists(self.get_path(key)))
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def get(self, key: str) -> dict:
+        """
+        Returns the result stored under `key` and marks it as recently used, or `None`.
+        """
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+        result = self.read(key)
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.add(key, result)
+        return result
+
+    def put(self, key: str, result: dict):
+        """
+        Stores a result under `key`, evicting the least recently used results beyond the size budget.
+        Results larger than the budget are not stored.
+        """
+        if get_result_size(result) > self.max_bytes:
+            return
+        with self.lock:
+            self.add(key, result)
+        self.write(key, result)
+
+    def add(self, key: str, result: dict):
+        if key in self.entries:
+            self.size -= self.sizes[key]
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        self.sizes[key] = get_result_size(result)
+        self.size += self.sizes[key]
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            evicted, _ = self.entries.popitem(last=False)
+            self.size -= self.sizes.pop(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.size = 0
+
+    def read(self, key: str) -> dict:
+        if self.directory is None:
+            return None
+        path = self.get_path(key)
+        try:
+            result = pd.read_pickle(path)
+            # marks the file as recently used (see `evict_files`)
+            os.utime(path)
+        except (OSError, EOFError, ValueError):
+            return None
+        return result
+
+    def write(self, key: str, result: dict):
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            file, path_temporary = tempfile.mkstemp(prefix='.tmp-', dir=self.directory)
+            os.close(file)
+            pd.to_pickle(result, path_temporary)
+            os.replace(path_temporary, self.get_path(key))
+            self.evict_files()
+        except OSError as error:
+            print(f'Could not write the result to the cache: {error}')
+
+    def evict_files(self):
+        """
+        Deletes the least recently used result files beyond the size budget.
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort(reverse=True)
+        total = 0
+        for _, size, path in files:
+            total += size
+            if total > self.max_bytes:
+                os.remove(path)
+
+
+# Result cache of the app, shared by all sessions.
+# Size budget from the environment variable `LCA_RESULT_CACHE_MB` (`0` disables the cache);
+# results are persisted to the directory `LCA_RESULT_CACHE_DIR`, if set.
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Returns the result cache of the app, or `None` if it is disabled.
+    """
+    global _result_cache
+    max_megabytes = float(os.environ.get('LCA_RESULT_CACHE_MB', RESULT_CACHE_DEFAULT_MB))
+    if max_megabytes <= 0:
+        return None
+    if _result_cache is None:
+        directory = os.environ.get('LCA_RESULT_CACHE_DIR') if sys.platform != 'emscripten' else None
+        _result_cache = ResultCache(max_bytes=int(max_megabytes * 10**6), directory=directory)
+    return _result_cache
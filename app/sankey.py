@@ -0,0 +1,154 @@
+# sankey.py
+
+import numpy as np
+import pandas as pd
+from graph_traversal import parent_positions_from_uids, iter_levels
+
+# Maximum number of links of the supply chain diagram, independent of the size of the traversal
+SANKEY_MAX_LINKS = 500
+
+# Scope of the "other" nodes, which collect the burden of all nodes not shown
+SANKEY_OTHER_SCOPE = 0
+
+
+def upstream_burdens_not_in_table(
+        parent_positions: np.ndarray,
+        burden_cumulative: np.ndarray,
+        burden_direct: np.ndarray,
+    ) -> np.ndarray:
+    """
+    Returns, for every node of a traversal tree, the part of its cumulative burden
+    which is not covered by the node itself or its children in the table, ie. the burden of the inputs removed by the cutoff.
+    """
+    remainder = burden_cumulative - burden_direct
+    has_parent = parent_positions >= 0
+    np.subtract.at(remainder, parent_positions[has_parent], burden_cumulative[has_parent])
+    return remainder
+
+
+def rollup_cumulative_burdens(
+        parent_positions: np.ndarray,
+        depths: np.ndarray,
+        burden_direct: np.ndarray,
+        burden_upstream: np.ndarray,
+    ) -> np.ndarray:
+    """
+    Returns the cumulative burden of every node of a traversal tree:
+    its direct burden, plus the burden of its inputs not in the table, plus the cumulative burdens of its children.
+    The tree is summed up level by level, from the deepest level to the top.
+
+    Parameters
+    ----------
+    parent_positions : np.ndarray
+        Position of the parent of every node, -1 for nodes without parent.
+    depths : np.ndarray
+        Depth of every node.
+    burden_direct : np.ndarray
+        Direct burden of every node.
+    burden_upstream : np.ndarray
+        Burden of the inputs of every node which are not in the table (see `upstream_burdens_not_in_table`).
+    """
+    cumulative = burden_direct + burden_upstream
+    for level in reversed(list(iter_levels(depths))):
+        level = level[parent_positions[level] >= 0]
+        np.add.at(cumulative, parent_positions[level], cumulative[level])
+    return cumulative
+
+
+def current_cumulative_burdens(df: pd.DataFrame, df_original: pd.DataFrame = None) -> np.ndarray:
+    """
+    Returns the cumulative burden of every node of a supply chain table.
+
+    Without `df_original`, the 'Burden(Cumulative)' column of `df` is returned.
+    Otherwise, `df` is a table edited by the user (eg. `PanelLCA.df_tabulator`) with the same rows as
+    the traversal table `df_original`. The cumulative burdens are then summed up from the edited direct burdens;
+    the burden of inputs removed by the cutoff is scaled with the edited supply amount of their consumer.
+    """
+    if df_original is None:
+        return df['Burden(Cumulative)'].to_numpy(dtype=float)
+    parent_positions = parent_positions_from_uids(df_original['UID'].to_numpy(), df_original['ParentUID'].to_numpy())
+    upstream = upstream_burdens_not_in_table(
+        parent_positions=parent_positions,
+        burden_cumulative=df_original['Burden(Cumulative)'].to_numpy(dtype=float),
+        burden_direct=df_original['Burden(Direct)'].to_numpy(dtype=float),
+    )
+    supply_amount_original = df_original['SupplyAmount'].to_numpy(dtype=float)
+    ratio = np.ones(len(df))
+    np.divide(df['SupplyAmount'].to_numpy(dtype=float), supply_amount_original, out=ratio, where=supply_amount_original != 0)
+    return rollup_cumulative_burdens(
+        parent_positions=parent_positions,
+        depths=df_original['Depth'].to_numpy(),
+        burden_direct=df['Burden(Direct)'].to_numpy(dtype=float),
+        burden_upstream=upstream * ratio,
+    )
+
+
+def aggregate_sankey_links(
+        df: pd.DataFrame,
+        df_original: pd.DataFrame = None,
+        max_links: int = SANKEY_MAX_LINKS,
+    ) -> dict:
+    """
+    Aggregates a supply chain table into the nodes and links of a Sankey diagram of bounded size.
+
+    Every link points from a supplier to its consumer and carries the cumulative burden of the supplier.
+    Only the nodes with the highest absolute cumulative burdens are shown (at most `max_links // 2`);
+    a node is only shown together with all its ancestors.
+    All other suppliers of a shown node, as well as its inputs removed by the cutoff, are merged into a single "other" node per consumer.
+    Sankey diagrams cannot show negative flows; links carry absolute values.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Supply chain table. Must contain the columns 'UID', 'ParentUID', 'Name', 'Scope', 'Depth',
+        'Burden(Direct)' and 'Burden(Cumulative)'.
+    df_original : pd.DataFrame
+        The traversal table from which `df` has been derived by user edits (see `current_cumulative_burdens`).
+    max_links : int
+        Maximum number of links.
+
+    Returns
+    -------
+    dict
+        Dictionary with the keys `label`, `scope` (one entry per Sankey node; `SANKEY_OTHER_SCOPE` for "other" nodes)
+        and `source`, `target`, `value` (one entry per link, node indices into `label`).
+    """
+    cumulative = current_cumulative_burdens(df, df_original)
+    parent_positions = parent_positions_from_uids(df['UID'].to_numpy(), df['ParentUID'].to_numpy())
+    depths = df['Depth'].to_numpy()
+
+    # the largest nodes, ranked by the smallest absolute cumulative burden on their path from the top;
+    # a node never ranks above its parent, so the shown nodes always include all their ancestors
+    path_minimum = np.abs(cumulative)
+    for level in iter_levels(depths):
+        level = level[parent_positions[level] >= 0]
+        path_minimum[level] = np.minimum(path_minimum[level], path_minimum[parent_positions[level]])
+    shown = np.zeros(len(df), dtype=bool)
+    shown[np.lexsort((depths, -path_minimum))[:max(1, max_links // 2)]] = True
+    has_shown_parent = (parent_positions >= 0) & shown[np.where(parent_positions >= 0, parent_positions, 0)]
+
+    shown_positions = np.flatnonzero(shown)
+    node_index = np.full(len(df), -1, dtype=np.int64)
+    node_index[shown_positions] = np.arange(len(shown_positions))
+
+    # links between shown nodes
+    linked = shown & has_shown_parent
+    sources = node_index[linked]
+    targets = node_index[parent_positions[linked]]
+    values = np.abs(cumulative[linked])
+
+    # one "other" node per shown consumer: hidden suppliers plus inputs removed by the cutoff
+    other = cumulative - df['Burden(Direct)'].to_numpy(dtype=float)
+    np.subtract.at(other, parent_positions[linked], cumulative[linked])
+    other = np.abs(other[shown_positions])
+    consumers_with_other = np.flatnonzero(other > 0)
+    other_nodes = len(shown_positions) + np.arange(len(consumers_with_other))
+
+    scopes = pd.to_numeric(df['Scope'], errors='coerce').fillna(3).to_numpy(dtype=np.int64)
+    return {
+        'label': df['Name'].to_numpy()[shown_positions].astype(str).tolist() + ['Other'] * len(consumers_with_other),
+        'scope': np.concatenate([scopes[shown_positions], np.full(len(consumers_with_other), SANKEY_OTHER_SCOPE)]),
+        'source': np.concatenate([sources, other_nodes]),
+        'target': np.concatenate([targets, consumers_with_other]),
+        'value': np.concatenate([values, other[consumers_with_other]]),
+    }
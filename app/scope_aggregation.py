@@ -0,0 +1,156 @@
+# scope_aggregation.py
+
+import numpy as np
+import pandas as pd
+from graph_traversal import parent_positions_from_uids, iter_levels
+
+SCOPES = (1, 2, 3)
+
+
+def normalize_scopes(scopes: np.ndarray) -> np.ndarray:
+    """
+    Returns the scopes as integer array; everything which is not Scope 1 or 2 counts as Scope 3.
+    """
+    scopes = pd.to_numeric(pd.Series(scopes), errors='coerce').to_numpy()
+    return np.where((scopes == 1) | (scopes == 2), scopes, 3).astype(np.int64)
+
+
+def normalize_burdens(burdens: np.ndarray) -> np.ndarray:
+    """
+    Returns the burdens as float array; missing burdens (eg. cleared cells of the table) count as 0.
+    """
+    return np.nan_to_num(np.asarray(burdens, dtype=float), nan=0.0)
+
+
+def tier_1_uids_from_branches(uids: np.ndarray, branches) -> np.ndarray:
+    """
+    Returns the UID of the direct supplier of the reference product through which every node is reached,
+    ie. the second element of its branch. The reference product node itself (and nodes without branch) get their own UID.
+    """
+    return np.array([
+        branch[1] if isinstance(branch, list) and len(branch) > 1 else uid
+        for uid, branch in zip(uids.tolist(), branches)
+    ], dtype=np.int64)
+
+
+def tier_1_uids_from_parent_uids(uids: np.ndarray, parent_uids: np.ndarray, depths: np.ndarray) -> np.ndarray:
+    """
+    Same as `tier_1_uids_from_branches`, but computed level by level from the parent UID of every node.
+    """
+    uids = np.asarray(uids, dtype=np.int64)
+    parent_positions = parent_positions_from_uids(uids, parent_uids)
+    tier_1_uids = uids.copy()
+    for level in iter_levels(depths):
+        # nodes whose parent has a parent of its own inherit the tier 1 UID of the parent
+        parents = parent_positions[level]
+        deep = parents >= 0
+        deep[deep] = parent_positions[parents[deep]] >= 0
+        tier_1_uids[level[deep]] = tier_1_uids[parents[deep]]
+    return tier_1_uids
+
+
+class ScopeAggregator:
+    """
+    Aggregates the direct burdens of a graph traversal table by scope, depth and branch in one vectorized pass.
+
+    Branches are identified by the direct supplier of the reference product through which a node is reached
+    (see `tier_1_uids_from_branches`).
+
+    The totals are running sums: after a single row has changed (eg. its scope or burden was edited),
+    `update_row` corrects them without aggregating the whole table again.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Graph traversal table. Must contain the columns 'UID', 'Scope' and 'Burden(Direct)'.
+        Missing burdens count as 0, here and in the updates.
+        The columns 'Depth' and 'ParentUID' (or 'Branch') are used for the breakdowns if present.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.uids = df['UID'].to_numpy(dtype=np.int64)
+        self.positions = pd.Index(self.uids)
+        self.scopes = normalize_scopes(df['Scope'].to_numpy())
+        self.burdens = normalize_burdens(df['Burden(Direct)'].to_numpy(dtype=float))
+        if 'Depth' in df.columns:
+            self.depths = df['Depth'].to_numpy(dtype=np.int64)
+        else:
+            self.depths = np.zeros(len(df), dtype=np.int64)
+        if 'ParentUID' in df.columns:
+            self.tier_1_uids = tier_1_uids_from_parent_uids(self.uids, df['ParentUID'].to_numpy(), self.depths)
+        elif 'Branch' in df.columns:
+            self.tier_1_uids = tier_1_uids_from_branches(self.uids, df['Branch'])
+        else:
+            self.tier_1_uids = self.uids.copy()
+
+        # one bincount per breakdown; every row is read exactly once per breakdown
+        self.totals_by_scope = np.bincount(self.scopes, weights=self.burdens, minlength=4)
+        self.totals_by_depth = np.bincount(self.depths, weights=self.burdens) if len(self.depths) else np.zeros(0)
+        branch_keys, branch_codes = np.unique(self.tier_1_uids, return_inverse=True)
+        self.branch_keys = pd.Index(branch_keys)
+        self.branch_codes = branch_codes.ravel()
+        self.totals_by_branch = np.bincount(self.branch_codes, weights=self.burdens, minlength=len(branch_keys))
+        self.total = float(self.totals_by_scope.sum())
+
+    @property
+    def scope_dict(self) -> dict:
+        """
+        Returns the scope totals in the format of `PanelLCA.scope_dict`, eg. `{'Scope 1': 0.1, 'Scope 2': 0.2, 'Scope 3': 0.7}`.
+        """
+        return {f'Scope {scope}': float(self.totals_by_scope[scope]) for scope in SCOPES}
+
+    @property
+    def depth_dict(self) -> dict:
+        return {int(depth): float(self.totals_by_depth[depth]) for depth in np.unique(self.depths)}
+
+    @property
+    def branch_dict(self) -> dict:
+        return {int(uid): float(total) for uid, total in zip(self.branch_keys, self.totals_by_branch)}
+
+    def update_row(self, uid: int, burden: float = None, scope: int = None):
+        """
+        Updates the running totals after the burden and/or the scope of a single row has changed.
+
+        Parameters
+        ----------
+        uid : int
+            UID of the changed row.
+        burden : float
+            New direct burden of the row. Unchanged if `None`.
+        scope : int
+            New scope of the row. Unchanged if `None`.
+        """
+        position = self.positions.get_loc(uid)
+        old_burden = self.burdens[position]
+        old_scope = self.scopes[position]
+        new_burden = old_burden if burden is None else float(normalize_burdens(burden))
+        new_scope = old_scope if scope is None else normalize_scopes(np.array([scope]))[0]
+
+        self.totals_by_scope[old_scope] -= old_burden
+        self.totals_by_scope[new_scope] += new_burden
+        delta = new_burden - old_burden
+        self.totals_by_depth[self.depths[position]] += delta
+        self.totals_by_branch[self.branch_codes[position]] += delta
+        self.total += delta
+
+        self.burdens[position] = new_burden
+        self.scopes[position] = new_scope
+
+    def update_rows(self, uids: np.ndarray, burdens: np.ndarray = None, scopes: np.ndarray = None):
+        """
+        Updates the running totals after the burdens and/or scopes of several rows have changed.
+        Equivalent to calling `update_row` for every row, but vectorized.
+        """
+        positions = self.positions.get_indexer(np.asarray(uids, dtype=np.int64))
+        new_burdens = self.burdens[positions] if burdens is None else normalize_burdens(burdens)
+        new_scopes = self.scopes[positions] if scopes is None else normalize_scopes(scopes)
+        deltas = new_burdens - self.burdens[positions]
+
+        np.subtract.at(self.totals_by_scope, self.scopes[positions], self.burdens[positions])
+        np.add.at(self.totals_by_scope, new_scopes, new_burdens)
+        np.add.at(self.totals_by_depth, self.depths[positions], deltas)
+        np.add.at(self.totals_by_branch, self.branch_codes[positions], deltas)
+        self.total += float(deltas.sum())
+
+        self.burdens[positions] = new_burdens
+        self.scopes[positions] = new_scopes
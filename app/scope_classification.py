@@ -0,0 +1,189 @@
+# scope_classification.py
+
+import re
+
+import numpy as np
+import pandas as pd
+from bw2data.backends import ActivityDataset
+
+
+class ScopeRule:
+    """
+    A rule assigning an emission scope to all activities matching any of its criteria.
+
+    Parameters
+    ----------
+    scope : int
+        The scope (1, 2 or 3) assigned to matching activities.
+    activity_ids : iterable
+        Activity ids (`activity_datapackage_id`) matching the rule.
+    name_pattern : str
+        Regular expression searched (case-insensitive) anywhere in the activity name;
+        eg. `electricity\b` matches `market for electricity, high voltage`.
+    categories : iterable
+        Activity categories matching the rule, eg. `'electricity'`. Compared case-insensitively
+        with every element of the `categories` tuple of an activity.
+    classification_codes : dict
+        Classification systems and code prefixes matching the rule, eg. `{'ISIC': ['351'], 'NAICS': ['2211']}`.
+        A system matches every `classifications` entry of an activity whose system name contains it (case-insensitive).
+    """
+
+    def __init__(
+            self,
+            scope: int,
+            activity_ids=(),
+            name_pattern: str = None,
+            categories=(),
+            classification_codes: dict = None,
+        ):
+        self.scope = scope
+        self.activity_ids = set(activity_ids)
+        self.name_pattern = re.compile(name_pattern, re.IGNORECASE) if name_pattern else None
+        self.categories = {category.lower() for category in categories}
+        self.classification_codes = {
+            system.lower(): tuple(prefixes)
+            for system, prefixes in (classification_codes or {}).items()
+        }
+
+    def matches(self, activity_id: int, name: str, data: dict) -> bool:
+        """
+        Returns `True` if the activity matches any criterion of the rule.
+
+        Parameters
+        ----------
+        activity_id : int
+            Activity id.
+        name : str
+            Activity name.
+        data : dict
+            Activity data, as stored in the `data` field of the activity in the database.
+        """
+        if activity_id in self.activity_ids:
+            return True
+        if self.name_pattern is not None and name and self.name_pattern.search(name):
+            return True
+        if self.categories and any(
+            str(category).lower() in self.categories for category in (data.get('categories') or ())
+        ):
+            return True
+        for system, code in data.get('classifications') or ():
+            for rule_system, prefixes in self.classification_codes.items():
+                if rule_system in str(system).lower() and str(code).startswith(prefixes):
+                    return True
+        return False
+
+
+# Scope 2: purchased electricity, steam, heat and cooling
+DEFAULT_SCOPE_RULES = [
+    ScopeRule(
+        scope=2,
+        name_pattern=r'(electricity|electric power|steam|district heat|heat, district|district cooling)\b',
+        categories=['electricity', 'electricity supply'],
+        classification_codes={
+            'ISIC': ['351', '353'],
+            'NAICS': ['2211', '22133'],
+        },
+    ),
+]
+
+
+class ScopeClassifier:
+    """
+    Assigns emission scopes to activities based on a list of `ScopeRule`s.
+    The first matching rule wins; activities matching no rule are in Scope 3.
+
+    The rules are evaluated only once per activity. The results are compiled into
+    a sorted array of activity ids and an array of scopes, so that whole traversal tables
+    can be classified with a single vectorized lookup.
+    Activities not seen before (eg. after new data has been ingested) are compiled on demand.
+    """
+
+    def __init__(self, rules: list = None, default_scope: int = 3):
+        self.rules = DEFAULT_SCOPE_RULES if rules is None else rules
+        self.default_scope = default_scope
+        self.compiled_ids = np.array([], dtype=np.int64)
+        self.compiled_scopes = np.array([], dtype=np.int8)
+
+    def classify_activity(self, activity_id: int, name: str, data: dict) -> int:
+        for rule in self.rules:
+            if rule.matches(activity_id, name, data):
+                return rule.scope
+        return self.default_scope
+
+    def compile(self, activity_ids: np.ndarray):
+        """
+        Adds the scopes of all activities in `activity_ids` which have not been compiled yet to the lookup arrays.
+        """
+        missing = np.setdiff1d(np.asarray(activity_ids, dtype=np.int64), self.compiled_ids)
+        if not len(missing):
+            return
+        new_ids, new_scopes = [], []
+        missing = missing.tolist()
+        for start in range(0, len(missing), 10000):
+            query = (
+                ActivityDataset
+                .select(ActivityDataset.id, ActivityDataset.name, ActivityDataset.data)
+                .where(ActivityDataset.id << missing[start:start + 10000])
+            )
+            for activity_id, name, data in query.tuples():
+                new_ids.append(activity_id)
+                new_scopes.append(self.classify_activity(activity_id, name, data or {}))
+        ids = np.concatenate([self.compiled_ids, np.array(new_ids, dtype=np.int64)])
+        scopes = np.concatenate([self.compiled_scopes, np.array(new_scopes, dtype=np.int8)])
+        order = np.argsort(ids, kind='stable')
+        self.compiled_ids = ids[order]
+        self.compiled_scopes = scopes[order]
+
+    def lookup(self, activity_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns the scope of every activity in `activity_ids`, compiling unknown activities first.
+        """
+        activity_ids = np.asarray(activity_ids, dtype=np.int64)
+        self.compile(activity_ids)
+        scopes = np.full(len(activity_ids), self.default_scope, dtype=np.int8)
+        if not len(self.compiled_ids):
+            return scopes
+        positions = np.searchsorted(self.compiled_ids, activity_ids).clip(max=len(self.compiled_ids) - 1)
+        found = self.compiled_ids[positions] == activity_ids
+        scopes[found] = self.compiled_scopes[positions[found]]
+        return scopes
+
+
+def assign_scopes(
+        df: pd.DataFrame,
+        classifier: ScopeClassifier,
+        dict_scope_overrides: dict = None,
+    ) -> pd.DataFrame:
+    """
+    Returns a copy of a graph traversal dataframe with the 'Scope' column set.
+    The dataframe itself is not modified, since it may be shared (eg. by the traversal or result cache).
+
+    The first node of the traversal (UID 0, the reference product) is in Scope 1.
+    All other nodes are classified by `classifier`.
+    Scopes chosen by the user take precedence over both.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Graph traversal dataframe. Must contain the columns 'UID' and 'activity_datapackage_id'.
+    classifier : ScopeClassifier
+        The classifier used for all nodes except the first one.
+    dict_scope_overrides : dict
+        Dictionary mapping activity ids to user-chosen scopes.
+
+    Returns
+    -------
+    pd.DataFrame
+        Copy of the dataframe with a 'Scope' column (inserted after 'UID' if it did not exist).
+    """
+    scopes = classifier.lookup(df['activity_datapackage_id'].to_numpy())
+    scopes[df['UID'].to_numpy() == 0] = 1
+    if dict_scope_overrides:
+        overrides = df['activity_datapackage_id'].map(dict_scope_overrides).to_numpy(dtype=float)
+        scopes = np.where(np.isnan(overrides), scopes, overrides).astype(np.int8)
+    df = df.copy()
+    if 'Scope' in df.columns:
+        df['Scope'] = scopes
+    else:
+        df.insert(df.columns.get_loc('UID') + 1, 'Scope', scopes)
+    return df
@@ -3,22 +3,142 @@
 import panel as pn
 import pandas as pd
 from lca_model import PanelLCA
-from utils import create_plotly_figure_piechart
+from plots import create_plotly_figure_piechart, update_plotly_figure_piechart, create_plotly_figure_sankey, update_plotly_figure_sankey
+from sankey import aggregate_sankey_links
+from tracing import tracer, run_to_records
 
 # Shared LCA model instance
 panel_lca_instance = PanelLCA()
 
+# Columns which are used internally but never sent to the browser
+TABULATOR_INTERNAL_COLUMNS = ['activity_datapackage_id', 'ParentUID', 'producer_unique_id', 'Burden(Cumulative)', 'Branch']
+
 # Shared Tabulator widget
+# With remote pagination, the dataframe stays on the server;
+# only the visible page is sent to the browser and sorting/filtering happen on the server.
 widget_tabulator = pn.widgets.Tabulator(
     pd.DataFrame([['']], columns=['Data will appear here after calculations...']),
     theme='site',
     show_index=False,
-    hidden_columns=['activity_datapackage_id', 'producer_unique_id'],
+    pagination='remote',
+    page_size=50,
     layout='fit_data_stretch',
     sizing_mode='stretch_width'
 )
 
+def create_tabulator_view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the columns of a supply chain table which are shown in `widget_tabulator`.
+    Rows keep their index, so that edits in the widget can be mapped back to `df`.
+    """
+    return df.drop(columns=[column for column in TABULATOR_INTERNAL_COLUMNS if column in df.columns])
+
+# Up to this number of changed rows, the Tabulator is patched row by row; above, its columns are replaced at once
+TABULATOR_PATCH_MAX_ROWS = 1000
+
+def update_tabulator_rows(df: pd.DataFrame, positions, columns: list):
+    """
+    Updates the rows at `positions` of `widget_tabulator` with the values of `df`,
+    a table with the same rows as the one shown (eg. `panel_lca_instance.df_tabulator`).
+    With remote pagination, only the changes on the current page are sent to the browser.
+    """
+    columns = [column for column in columns if column in widget_tabulator.value.columns]
+    if len(positions) <= TABULATOR_PATCH_MAX_ROWS:
+        widget_tabulator.patch(
+            {
+                column: list(zip(positions.tolist(), df[column].to_numpy()[positions].tolist()))
+                for column in columns
+            },
+            as_index=False,
+        )
+    else:
+        for column in columns:
+            widget_tabulator.value[column] = df[column].to_numpy()
+        widget_tabulator.param.trigger('value')
+
 # Shared Plotly figure
+# The figure is created once; later updates only change the values of its trace (see `update_piechart`)
 widget_plotly_figure_piechart = pn.pane.Plotly(
-    create_plotly_figure_piechart({'Scope 1': 0})
+    create_plotly_figure_piechart({'Scope 1': 0, 'Scope 2': 0, 'Scope 3': 0})
+)
+
+def update_piechart(data_dict: dict):
+    update_plotly_figure_piechart(widget_plotly_figure_piechart.object, data_dict)
+
+# Shared Sankey diagram of the supply chain
+# Its size is bounded by `sankey.SANKEY_MAX_LINKS`; updates only change the nodes and links of its trace
+widget_plotly_figure_sankey = pn.pane.Plotly(
+    create_plotly_figure_sankey(),
+    sizing_mode='stretch_width',
+)
+
+def update_sankey():
+    """
+    Updates the Sankey diagram from `panel_lca_instance.df_tabulator`.
+    If the table has been edited by the user, the cumulative burdens are summed up again from the edited rows.
+    """
+    df = panel_lca_instance.df_tabulator
+    if df is None:
+        return
+    df_original = panel_lca_instance.df_traversal if 'Edited?' in df.columns and df['Edited?'].any() else None
+    update_plotly_figure_sankey(
+        widget_plotly_figure_sankey.object,
+        aggregate_sankey_links(df, df_original=df_original),
+    )
+
+# Shared tables of the largest contributions to the LCA score, over the whole supply chain (see `contribution_analysis.py`)
+widget_tabulator_contribution_activities = pn.widgets.Tabulator(
+    pd.DataFrame(columns=['Rank', 'Name', 'Score', 'Share [%]']),
+    theme='site',
+    show_index=False,
+    disabled=True,
+    hidden_columns=['id'],
+    layout='fit_data_stretch',
+    sizing_mode='stretch_width',
+)
+widget_tabulator_contribution_flows = pn.widgets.Tabulator(
+    pd.DataFrame(columns=['Rank', 'Name', 'Score', 'Share [%]']),
+    theme='site',
+    show_index=False,
+    disabled=True,
+    hidden_columns=['id'],
+    layout='fit_data_stretch',
+    sizing_mode='stretch_width',
+)
+
+def update_contributions():
+    """
+    Updates the contribution tables from the current LCA of `panel_lca_instance`,
+    or from the result cache if the result was loaded from there.
+    """
+    if panel_lca_instance.lca is not None:
+        contributions = panel_lca_instance.perform_contribution_analysis()
+    else:
+        contributions = panel_lca_instance.contributions
+    if contributions is None:
+        return
+    widget_tabulator_contribution_activities.value = contributions['activities']
+    widget_tabulator_contribution_flows.value = contributions['flows']
+
+# Shared table of the stages of the last calculation (see `tracing.py`)
+PERFORMANCE_COLUMNS = ['Stage', 'Wall Time [ms]', 'Share [%]', 'Rows', 'Memory Δ [MB]']
+widget_markdown_performance = pn.pane.Markdown('No calculation yet.')
+widget_tabulator_performance = pn.widgets.Tabulator(
+    pd.DataFrame(columns=PERFORMANCE_COLUMNS),
+    theme='site',
+    show_index=False,
+    disabled=True,
+    sortable=False,
+    layout='fit_data_stretch',
+    sizing_mode='stretch_width',
 )
+
+def update_performance_panel():
+    """
+    Shows the stages of the last traced run (`tracing.tracer.last_run`).
+    """
+    run = tracer.last_run
+    if run is None:
+        return
+    widget_markdown_performance.object = f"**{run['name']}**: {run['wall_time_s'] * 1000:,.0f} ms"
+    widget_tabulator_performance.value = pd.DataFrame(run_to_records(run), columns=PERFORMANCE_COLUMNS)
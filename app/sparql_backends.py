@@ -0,0 +1,288 @@
+# sparql_backends.py
+
+import os
+import re
+import json
+import time
+import hashlib
+import requests
+from abc import ABC, abstractmethod
+import numpy as np
+
+# Names of the elementary flows of the synthetic backend;
+# they cover the name filter of `sparql_queries.get_biosphere` as well as other flows
+SYNTHETIC_FLOW_NAMES = (
+    'Carbon dioxide, fossil',
+    'Carbon dioxide, non-fossil',
+    'Methane, fossil',
+    'Dinitrogen monoxide',
+    'Sulfur dioxide',
+    'Particulate Matter, < 2.5 um',
+)
+
+
+class SPARQLBackend(ABC):
+    """
+    Answers SPARQL queries with `sparql-results+json` dictionaries (see `utils.sparql_query`).
+
+    Parameters
+    ----------
+    latency_ms : float
+        Delay added to every query, eg. to emulate a remote endpoint.
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.number_of_queries = 0
+
+    def query(self, query: str, endpoint_url: str) -> dict:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        self.number_of_queries += 1
+        return self.execute(query, endpoint_url)
+
+    @abstractmethod
+    def execute(self, query: str, endpoint_url: str) -> dict:
+        """
+        Answers a query; implemented by every backend.
+        """
+
+
+class HTTPBackend(SPARQLBackend):
+    """
+    Sends queries to the SPARQL endpoint (the default backend).
+    """
+
+    def execute(self, query: str, endpoint_url: str) -> dict:
+        headers = {'Accept': 'application/sparql-results+json'}
+        params = {'query': query}
+        response = requests.get(endpoint_url, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json()
+
+
+def get_query_key(query: str) -> str:
+    """
+    Returns a hash of a query which does not depend on its whitespace (eg. indentation).
+    """
+    return hashlib.sha256(' '.join(query.split()).encode()).hexdigest()
+
+
+class RecordedBackend(SPARQLBackend):
+    """
+    Answers queries with responses recorded in a directory, one JSON file per query (see `get_query_key`).
+
+    If `record_from` is given, queries without recorded response are sent to that backend
+    and its responses are recorded; otherwise, they raise a `LookupError`.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the recorded responses.
+    record_from : SPARQLBackend
+        Backend answering the queries which have not been recorded yet (eg. `HTTPBackend`).
+    latency_ms : float
+        See `SPARQLBackend`.
+    """
+
+    def __init__(self, directory: str, record_from: SPARQLBackend = None, latency_ms: float = 0):
+        super().__init__(latency_ms=latency_ms)
+        self.directory = directory
+        self.record_from = record_from
+
+    def get_path(self, query: str) -> str:
+        return os.path.join(self.directory, f'{get_query_key(query)}.json')
+
+    def execute(self, query: str, endpoint_url: str) -> dict:
+        path = self.get_path(query)
+        if os.path.exists(path):
+            with open(path) as file:
+                return json.load(file)['response']
+        if self.record_from is None:
+            raise LookupError(f'No recorded response for query {get_query_key(query)} in {self.directory}.')
+        response = self.record_from.query(query, endpoint_url)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({'query': query, 'response': response}, file)
+        return response
+
+
+def uri_binding(value: str) -> dict:
+    return {'type': 'uri', 'value': value}
+
+
+def literal_binding(value) -> dict:
+    return {'type': 'literal', 'value': str(value)}
+
+
+class SyntheticBackend(SPARQLBackend):
+    """
+    Answers the queries of `sparql_queries.py` with a random but reproducible supply chain,
+    so that ingestion can be tested and measured without the endpoint.
+
+    Activity `i` has up to `children_per_activity` child activities with larger numbers,
+    so that the supply chain has no loops, and `flows_per_activity` biosphere exchanges.
+    The size of the responses grows with these parameters: the technosphere query of activity 0
+    returns about `number_of_activities * children_per_activity` bindings.
+
+    Parameters
+    ----------
+    number_of_activities : int
+        Number of activities.
+    children_per_activity : int
+        Maximum number of child activities of every activity.
+    flows_per_activity : int
+        Number of biosphere exchanges of every activity (names from `SYNTHETIC_FLOW_NAMES`, in turn).
+    seed : int
+        Seed of the random amounts and child activities.
+    latency_ms : float
+        See `SPARQLBackend`.
+    """
+
+    base_uri = 'https://example.org/wiser/synthetic/'
+
+    def __init__(
+            self,
+            number_of_activities: int = 1000,
+            children_per_activity: int = 4,
+            flows_per_activity: int = 2,
+            seed: int = 0,
+            latency_ms: float = 0,
+        ):
+        super().__init__(latency_ms=latency_ms)
+        self.number_of_activities = number_of_activities
+        self.flows_per_activity = flows_per_activity
+        rng = np.random.default_rng(seed)
+        self.children = []
+        self.amounts = []
+        for activity in range(number_of_activities):
+            candidates = np.arange(activity + 1, number_of_activities)
+            children = np.sort(rng.choice(candidates, size=min(children_per_activity, len(candidates)), replace=False))
+            self.children.append(children.tolist())
+            self.amounts.append(rng.uniform(0.01, 0.5, size=len(children)).round(6).tolist())
+        self.flow_amounts = rng.uniform(0, 1, size=(number_of_activities, flows_per_activity)).round(6)
+
+    def get_uri(self, activity: int) -> str:
+        return f'{self.base_uri}activity/{activity}'
+
+    def get_name(self, activity: int) -> str:
+        return f'Synthetic Activity {activity}'
+
+    def get_activity(self, uri: str) -> int:
+        if not uri.startswith(f'{self.base_uri}activity/'):
+            raise LookupError(f'Unknown activity {uri}.')
+        return int(uri.rsplit('/', 1)[1])
+
+    def get_upstream_activities(self, activity: int) -> list:
+        """
+        Returns `activity` and all activities in its supply chain, like the path `wiser:hasChildActivitiy*`.
+        """
+        visited = {activity}
+        stack = [activity]
+        while stack:
+            for child in self.children[stack.pop()]:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append(child)
+        return sorted(visited)
+
+    def execute(self, query: str, endpoint_url: str) -> dict:
+        if 'wiser:BActivity' in query:
+            variables = ['src', 'srcLabel']
+            bindings = [
+                {'src': uri_binding(self.get_uri(activity)), 'srcLabel': literal_binding(self.get_name(activity))}
+                for activity in range(self.number_of_activities)
+            ]
+            return {'head': {'vars': variables}, 'results': {'bindings': bindings}}
+
+        match = re.search(r'VALUES\s*\(\?src\)\s*\{\s*\(\s*<([^>]+)>', query)
+        if match is None:
+            raise ValueError('The synthetic backend only answers the queries of `sparql_queries.py`.')
+        src = match.group(1)
+        activities = self.get_upstream_activities(self.get_activity(src))
+
+        if 'BBiosphereExchange' in query:
+            variables = ['src', 'parentElement', 'srcLabel', 'exchangeName', 'unit', 'value', 'category', 'subCategory', 'isOutput']
+            name_filter = re.search(r'CONTAINS\(LCASE\(STR\(\?exchangeName\)\),\s*"([^"]*)"\)', query)
+            bindings = []
+            for activity in activities:
+                for flow in range(self.flows_per_activity):
+                    name = SYNTHETIC_FLOW_NAMES[flow % len(SYNTHETIC_FLOW_NAMES)]
+                    if name_filter is not None and name_filter.group(1) not in name.lower():
+                        continue
+                    bindings.append({
+                        'src': uri_binding(src),
+                        'parentElement': uri_binding(self.get_uri(activity)),
+                        'srcLabel': literal_binding(self.get_name(activity)),
+                        'exchangeName': literal_binding(name),
+                        'unit': literal_binding('kg'),
+                        'value': literal_binding(self.flow_amounts[activity, flow]),
+                        'category': literal_binding('air'),
+                        'subCategory': literal_binding('unspecified'),
+                        'isOutput': literal_binding('true'),
+                    })
+            return {'head': {'vars': variables}, 'results': {'bindings': bindings}}
+
+        variables = ['src', 'parentElement', 'parent', 'childElement', 'child', 'location', 'value', 'unit', 'parentLocation', 'parentUnit']
+        bindings = [
+            {
+                'src': uri_binding(src),
+                'parentElement': uri_binding(self.get_uri(activity)),
+                'parent': literal_binding(self.get_name(activity)),
+                'childElement': uri_binding(self.get_uri(child)),
+                'child': literal_binding(self.get_name(child)),
+                'location': literal_binding('GLO'),
+                'value': literal_binding(amount),
+                'unit': literal_binding('USD'),
+                'parentLocation': literal_binding('GLO'),
+                'parentUnit': literal_binding('USD'),
+            }
+            for activity in activities
+            for child, amount in zip(self.children[activity], self.amounts[activity])
+        ]
+        return {'head': {'vars': variables}, 'results': {'bindings': bindings}}
+
+
+def create_sparql_backend(specification: str, latency_ms: float = 0) -> SPARQLBackend:
+    """
+    Creates a backend from a short specification:
+
+    - `http`: the SPARQL endpoint
+    - `recorded:<directory>`: recorded responses only
+    - `record:<directory>`: recorded responses; other queries are sent to the endpoint and recorded
+    - `synthetic` or `synthetic:<activities>[,<children per activity>[,<flows per activity>]]`: a synthetic supply chain
+    """
+    kind, _, argument = specification.partition(':')
+    if kind == 'http':
+        return HTTPBackend(latency_ms=latency_ms)
+    if kind == 'recorded':
+        return RecordedBackend(argument, latency_ms=latency_ms)
+    if kind == 'record':
+        return RecordedBackend(argument, record_from=HTTPBackend(), latency_ms=latency_ms)
+    if kind == 'synthetic':
+        sizes = [int(size) for size in argument.split(',') if size]
+        return SyntheticBackend(*sizes, latency_ms=latency_ms)
+    raise ValueError(f"Unknown SPARQL backend '{specification}'. Choose 'http', 'recorded:<directory>', 'record:<directory>' or 'synthetic'.")
+
+
+# Backend of `utils.sparql_query`.
+# Chosen with the environment variables `SPARQL_BACKEND` (see `create_sparql_backend`) and `SPARQL_LATENCY_MS`.
+_sparql_backend = None
+
+
+def get_sparql_backend() -> SPARQLBackend:
+    global _sparql_backend
+    if _sparql_backend is None:
+        _sparql_backend = create_sparql_backend(
+            os.environ.get('SPARQL_BACKEND', 'http'),
+            latency_ms=float(os.environ.get('SPARQL_LATENCY_MS', 0)),
+        )
+    return _sparql_backend
+
+
+def set_sparql_backend(backend: SPARQLBackend):
+    """
+    Replaces the backend of `utils.sparql_query`, eg. with a `SyntheticBackend` in load tests.
+    """
+    global _sparql_backend
+    _sparql_backend = backend
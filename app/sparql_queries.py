@@ -104,7 +104,6 @@ def get_biosphere(selected_src):
         ?exchange wiser:subCategory ?subCategory.
         OPTIONAL {{ ?exchange a :BBiopshereInputExchange. BIND(true AS ?isInput) }}
         OPTIONAL {{ ?exchange a :BBiosphereOutputExchange. BIND(true AS ?isOutput) }}
-        FILTER(CONTAINS(LCASE(STR(?exchangeName)), "carbon dioxide"))
     }}
     """
     data = sparql_query(query, SPARQL_ENDPOINT_URL)
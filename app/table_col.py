@@ -1,29 +1,106 @@
 # col2.py
 
+import sys
+import asyncio
 import panel as pn
 import pandas as pd
-from shared_ui import widget_tabulator
+from export import export_table, available_export_formats, is_pyarrow_available
+from shared_ui import panel_lca_instance, widget_tabulator, widget_plotly_figure_sankey, widget_tabulator_contribution_activities, widget_tabulator_contribution_flows, update_piechart, update_sankey
 
 # Download components for the Tabulator
-filename_download, button_download = widget_tabulator.download_menu(
-    text_kwargs={'name': 'Filename', 'value': 'data.csv'},
-    button_kwargs={'name': 'Download Table'}
+# The table is paginated on the server, so the file is written on the server from the full table.
+# On the server, the export runs in a worker thread, so that large tables do not block the UI.
+# Pyodide has no threads; there, the export runs directly.
+dict_export_formats = available_export_formats()
+
+select_download_format = pn.widgets.Select(
+    name='Format',
+    options=list(dict_export_formats.keys()),
+    width=120,
+)
+checkbox_download_branches = pn.widgets.Checkbox(
+    name='Include branches',
+    value=False,
+    disabled=not is_pyarrow_available(),
+    align='center',
+)
+
+def get_download_table() -> pd.DataFrame:
+    if panel_lca_instance.df_tabulator is not None:
+        return panel_lca_instance.df_tabulator
+    return widget_tabulator.value
+
+async def download_table():
+    file_format, _ = dict_export_formats[select_download_format.value]
+    kwargs = dict(
+        df=get_download_table(),
+        file_format=file_format,
+        include_branches=checkbox_download_branches.value,
+    )
+    if sys.platform == 'emscripten':
+        return export_table(**kwargs)
+    return await asyncio.to_thread(export_table, **kwargs)
+
+filename_download = pn.widgets.TextInput(name='Filename', value='data')
+button_download = pn.widgets.FileDownload(
+    callback=download_table,
+    filename='data' + dict_export_formats[select_download_format.value][1],
+    label='Download Table',
+    button_type='default',
 )
+
+def update_download_filename(event):
+    _, extension = dict_export_formats[select_download_format.value]
+    filename = filename_download.value or 'data'
+    for known_extension in [extension for _, extension in dict_export_formats.values()] + ['.csv']:
+        filename = filename.removesuffix(known_extension)
+    button_download.filename = filename + extension
+
+filename_download.param.watch(update_download_filename, 'value')
+select_download_format.param.watch(update_download_filename, 'value')
 filename_download.sizing_mode = 'stretch_width'
 button_download.align = 'center'
 button_download.icon = 'download'
 
-# Event handler for Tabulator edits (if needed)
+# Event handler for Tabulator edits
 def on_tabulator_edit(event):
-    # Handle Tabulator edits here
-    # For example, you might want to update calculations based on user edits
-    pass
+    # The widget only holds a view of `df_tabulator`; scope edits are written back by row position.
+    # Edited supply amounts and burden intensities stay in the widget
+    # until they are applied with `PanelLCA.apply_user_input` (see `management_col.button_action_update_data`).
+    df_tabulator = panel_lca_instance.df_tabulator
+    if df_tabulator is None or event.column not in df_tabulator.columns:
+        return
+    # Scopes chosen by the user are kept for all following graph traversals
+    if event.column == 'Scope':
+        df_tabulator.iloc[event.row, df_tabulator.columns.get_loc(event.column)] = event.value
+        activity_datapackage_id = df_tabulator['activity_datapackage_id'].iloc[event.row]
+        panel_lca_instance.set_scope_override(activity_datapackage_id, event.value)
+        if panel_lca_instance.scope_aggregator is not None:
+            panel_lca_instance.scope_aggregator.update_row(
+                uid=df_tabulator['UID'].iloc[event.row],
+                scope=event.value,
+            )
+            panel_lca_instance.scope_dict = panel_lca_instance.scope_aggregator.scope_dict
+            update_piechart(panel_lca_instance.scope_dict)
+        update_sankey()
 
 # Bind the event handler to the Tabulator
 widget_tabulator.on_edit(on_tabulator_edit)
 
 # Define col2 layout
 table_col = pn.Column(
-    pn.Row('# Table of Upstream Processes', filename_download, button_download),
-    widget_tabulator,
+    pn.Row('# Table of Upstream Processes', filename_download, select_download_format, checkbox_download_branches, button_download),
+    pn.Tabs(
+        ('Table', widget_tabulator),
+        ('Supply Chain', widget_plotly_figure_sankey),
+        ('Hotspots', pn.Column(
+            '### Activities with the largest direct contributions',
+            widget_tabulator_contribution_activities,
+            '### Elementary flows with the largest contributions',
+            widget_tabulator_contribution_flows,
+            sizing_mode='stretch_width',
+        )),
+        dynamic=True,
+        sizing_mode='stretch_width',
+    ),
 )
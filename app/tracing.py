@@ -0,0 +1,153 @@
+# tracing.py
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Structured trace logs: one JSON object per completed run.
+# Set the environment variable `LCA_TRACE_LOG` to a file path to also write them to a file (JSON lines).
+logger = logging.getLogger('brightway_webapp.trace')
+if os.environ.get('LCA_TRACE_LOG'):
+    _file_handler = logging.FileHandler(os.environ['LCA_TRACE_LOG'])
+    _file_handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_file_handler)
+    logger.setLevel(logging.INFO)
+
+
+def get_memory_usage() -> int:
+    """
+    Returns the memory currently used by the process in bytes:
+    the memory traced by `tracemalloc` if it is running, otherwise the resident set size (Linux only).
+    Returns `None` where neither is available (eg. in Pyodide).
+    """
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Span(dict):
+    """
+    A timed stage of a run. Attributes (eg. row counts) can be added with `set`.
+    """
+
+    def set(self, **attributes):
+        self.setdefault('attributes', {}).update(attributes)
+
+
+class Tracer:
+    """
+    Records the wall time and memory delta of the stages of a run (eg. a calculation triggered by a button),
+    as a flat list of nested spans.
+
+    A run is started with `run`; within it, stages are recorded with `span` (context manager)
+    or `traced` (decorator). Outside of a run, spans cost a single attribute lookup and record nothing.
+    Every completed run is logged as one JSON object (see `logger`) and kept as `last_run`.
+    Runs are recorded per thread, so that concurrent sessions do not mix their spans.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.last_run = None
+
+    @property
+    def current_run(self) -> dict:
+        return getattr(self.local, 'run', None)
+
+    @contextmanager
+    def run(self, name: str, **parameters):
+        """
+        Records a run. Nested calls record a span within the outer run instead.
+
+        Parameters
+        ----------
+        name : str
+            Name of the run, eg. the name of the event handler.
+        **parameters
+            Parameters of the run (must be JSON serializable), eg. the chosen product and method.
+        """
+        if self.current_run is not None:
+            with self.span(name, **parameters) as span:
+                yield span
+            return
+        self.local.run = {'name': name, 'parameters': parameters, 'start': time.time(), 'spans': []}
+        self.local.depth = 0
+        try:
+            with self.span(name) as span:
+                yield span
+        finally:
+            run, self.local.run = self.local.run, None
+            run['wall_time_s'] = run['spans'][0]['wall_time_s']
+            self.last_run = run
+            logger.info(json.dumps(run, default=str))
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Records a stage of the current run: its wall time, memory delta and `attributes`.
+        """
+        run = self.current_run
+        if run is None:
+            yield Span()
+            return
+        span = Span(name=name, depth=self.local.depth)
+        if attributes:
+            span.set(**attributes)
+        run['spans'].append(span)
+        memory_before = get_memory_usage()
+        self.local.depth += 1
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span['wall_time_s'] = time.perf_counter() - start
+            self.local.depth -= 1
+            memory_after = get_memory_usage()
+            span['memory_delta_mb'] = (memory_after - memory_before) / 1e6 if memory_before is not None else None
+
+    def traced(self, name: str = None):
+        """
+        Decorator recording every call of a function as a span of the current run.
+        """
+        def decorator(function):
+            span_name = name or function.__qualname__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if self.current_run is None:
+                    return function(*args, **kwargs)
+                with self.span(span_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def run_to_records(run: dict) -> list:
+    """
+    Returns the spans of a run as list of flat dictionaries (eg. for a table),
+    with stage names indented by non-breaking spaces (which HTML does not collapse).
+    """
+    if run is None:
+        return []
+    return [
+        {
+            'Stage': '\u00a0\u00a0\u00a0' * span['depth'] + span['name'],
+            'Wall Time [ms]': span.get('wall_time_s', 0) * 1000,
+            'Share [%]': span.get('wall_time_s', 0) / run['wall_time_s'] * 100 if run['wall_time_s'] else 0,
+            'Rows': span.get('attributes', {}).get('rows'),
+            'Memory Δ [MB]': span.get('memory_delta_mb'),
+        }
+        for span in run['spans']
+    ]
+
+
+# Shared tracer of the app
+tracer = Tracer()
@@ -1,13 +1,11 @@
 # utils.py
 
 import os
-import requests
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import panel as pn
 
 import re
+from sparql_backends import get_sparql_backend
 
 def create_sanitized_key(url: str) -> str:
     """
@@ -38,60 +36,19 @@ def brightway_wasm_database_storage_workaround() -> None:
     os.environ["BRIGHTWAY_DIR"] = "/bw_tmp/"
 
 def sparql_query(query, endpoint_url):
-    headers = {'Accept': 'application/sparql-results+json'}
-    params = {'query': query}
-    response = requests.get(endpoint_url, headers=headers, params=params)
-    response.raise_for_status()
-    return response.json()
-
-def create_plotly_figure_piechart(data_dict: dict) -> go.Figure:
-    marker_colors = []
-    for label in data_dict.keys():
-        if label == 'Scope 1':
-            marker_colors.append('#33cc33')
-        elif label == 'Scope 2':
-            marker_colors.append('#ffcc00')
-        elif label == 'Scope 3':
-            marker_colors.append('#3366ff')
-        else:
-            marker_colors.append('#000000')
-    plotly_figure = go.Figure(
-        data=[
-            go.Pie(
-                labels=list(data_dict.keys()),
-                values=list(data_dict.values()),
-                marker=dict(colors=marker_colors)
-            )
-        ]
-    )
-    plotly_figure.update_traces(
-        marker=dict(
-            line=dict(color='#000000', width=2)
-        )
-    )
-    plotly_figure.update_layout(
-        autosize=True,
-        height=300,
-        legend=dict(
-            orientation="v",
-            yanchor="auto",
-            y=1,
-            xanchor="right",
-            x=-0.3
-        ),
-        margin=dict(
-            l=50,
-            r=50,
-            b=0,
-            t=0,
-            pad=0
-        ),
-    )
-    return plotly_figure
+    """
+    Returns the `sparql-results+json` response to a query.
+    The query is answered by the current backend (see `sparql_backends.py`), by default the endpoint at `endpoint_url`.
+    """
+    return get_sparql_backend().query(query, endpoint_url)
 
 def determine_scope_emissions(df: pd.DataFrame):
     """
     Determines the scope 1/2/3 emissions from the graph traversal nodes dataframe.
+    Missing burdens are skipped.
+
+    The app uses `scope_aggregation.ScopeAggregator`; this function is kept as the baseline
+    of `dev/benchmark_suite.py`.
     """
     dict_scope = {
         'Scope 1': df.loc[df['Scope'] == 1]['Burden(Direct)'].sum(),
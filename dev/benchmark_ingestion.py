@@ -0,0 +1,91 @@
+# %%
+"""
+Measures ingestion throughput and end-to-end latency (product list, SPARQL queries, ingestion, LCA, graph traversal)
+without network access, with the synthetic or recorded SPARQL backends of `app/sparql_backends.py`.
+
+The Brightway project is written to a temporary directory, which is deleted afterwards.
+The time of every stage is taken from the tracer of the app (see `app/tracing.py`).
+
+Usage (from the repository root):
+
+    python dev/benchmark_ingestion.py --backend synthetic:500,4,2 --latency-ms 100
+    python dev/benchmark_ingestion.py --backend recorded:dev/sparql_fixtures --products "Some product label"
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+os.environ['BRIGHTWAY2_DIR'] = tempfile.mkdtemp(prefix='bw_benchmark_ingestion_')
+
+import pandas as pd
+import bw2data as bd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from lca_model import PanelLCA
+from sparql_backends import create_sparql_backend, set_sparql_backend
+from tracing import tracer
+
+
+def run_product(panel_lca: PanelLCA, label: str, cutoff: float) -> dict:
+    with tracer.run('end-to-end', product=label):
+        activity = panel_lca.get_src_and_get_technosphere_and_biosphere(label)
+        panel_lca.chosen_activity = activity
+        panel_lca.perform_lca()
+        panel_lca.set_graph_traversal_cutoff(cutoff)
+        panel_lca.perform_graph_traversal()
+    run = tracer.last_run
+    stages = {}
+    for span in run['spans']:
+        stages[span['name']] = stages.get(span['name'], 0) + span['wall_time_s']
+    bindings = sum(
+        span.get('attributes', {}).get('rows', 0)
+        for span in run['spans'] if span['name'].startswith('sparql')
+    )
+    ingestion = stages.get('ingestion: technosphere', 0) + stages.get('ingestion: biosphere', 0)
+    return {
+        'product': label,
+        'bindings': bindings,
+        'end_to_end_s': run['wall_time_s'],
+        'sparql_s': stages.get('sparql: get_technosphere', 0) + stages.get('sparql: get_biosphere', 0),
+        'ingestion_s': ingestion,
+        'ingestion_bindings_per_s': bindings / ingestion if ingestion else None,
+        'lca_s': stages.get('PanelLCA.perform_lca', 0),
+        'traversal_s': stages.get('PanelLCA.perform_graph_traversal', 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', type=str, default='synthetic:500,4,2', help="See `sparql_backends.create_sparql_backend`.")
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--products', type=str, nargs='+', default=None, help='Product labels (default: the first product).')
+    parser.add_argument('--cutoff', type=float, default=0.01)
+    parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file.')
+    args = parser.parse_args()
+
+    set_sparql_backend(create_sparql_backend(args.backend, latency_ms=args.latency_ms))
+    try:
+        panel_lca = PanelLCA()
+        panel_lca.db_name = 'benchmark_ingestion'
+        panel_lca.set_db()
+        panel_lca.set_list_db_products()
+        panel_lca.chosen_method = bd.Method(('IPCC',))
+        panel_lca.chosen_amount = 1
+        labels = args.products or panel_lca.list_db_products[:1]
+        list_results = [run_product(panel_lca, label, args.cutoff) for label in labels]
+    finally:
+        shutil.rmtree(os.environ['BRIGHTWAY2_DIR'], ignore_errors=True)
+
+    df_results = pd.DataFrame(list_results)
+    print(df_results.to_string(index=False, float_format='{:,.4f}'.format))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(list_results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
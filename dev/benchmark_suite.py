@@ -0,0 +1,462 @@
+# %%
+"""
+Self-contained benchmark suite for the hot paths of `app/lca_model.py` on synthetic supply chains.
+
+Unlike the `dev/test_*.py` scripts, no USEEIO project (`bi.install_project`) and no SPARQL endpoint is needed:
+random supply chain trees (graph traversal results) and DAGs (Brightway databases) of configurable size,
+depth and fan-out are generated, as well as SPARQL result lists in the format of `sparql_queries.py`.
+Brightway data is written to a temporary directory, which is deleted afterwards.
+
+Benchmarks (`--only` selects a subset):
+
+    nodes_dict_to_dataframe, edges_dict_to_dataframe, add_branch_information_to_edges_dataframe,
+    update_production_based_on_user_data, update_burden_intensity_based_on_user_data,
+    update_burden_based_on_user_data, update_data_based_on_user_input, scope_aggregation,
+    determine_scope_emissions, ingestion, perform_lca (without and with the matrix cache), graph_traversal
+
+Benchmarks of the row-by-row legacy functions are skipped above `--legacy-max-rows` rows.
+
+For every benchmark and size, the median wall time of `--repetitions` runs
+and the peak memory (tracemalloc, one additional run) are reported.
+With `--json`, the results are written together with the versions of Python and the main packages and the git commit,
+so that results of different releases can be compared; `--baseline` compares with such a file
+and exits with status 1 if a benchmark became slower by more than `--tolerance`.
+
+Usage (from the repository root):
+
+    python dev/benchmark_suite.py --rows 1000 10000 --json benchmark.json
+    python dev/benchmark_suite.py --baseline benchmark.json
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+os.environ['BRIGHTWAY2_DIR'] = tempfile.mkdtemp(prefix='bw_benchmark_suite_')
+
+import numpy as np
+import pandas as pd
+import bw2data as bd
+import bw2calc as bc
+from bw2data.backends import ActivityDataset
+from bw_graph_tools.graph_traversal.graph_objects import Node, Edge
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import lca_model
+from lca_model import PanelLCA
+from graph_traversal import branches_from_parent_uids
+from scope_aggregation import ScopeAggregator
+from utils import determine_scope_emissions
+
+TECHNOSPHERE = 'suite_technosphere'
+BIOSPHERE = 'suite_biosphere'
+METHOD = ('suite', 'GWP')
+
+
+# Generators
+
+def generate_supply_chain_tree(number_of_nodes: int, max_depth: int = 12, fan_out: int = 8, seed: int = 42) -> tuple:
+    """
+    Returns the parent UID (-1 for the root) and the depth (1 for the root) of every node of a random tree,
+    built breadth-first: every node above `max_depth` gets between 1 and `fan_out` children.
+    UIDs are positions; parents always come before their children.
+    """
+    rng = np.random.default_rng(seed)
+    parent_uids = np.full(number_of_nodes, -1, dtype=np.int64)
+    depths = np.ones(number_of_nodes, dtype=np.int64)
+    next_uid = 1
+    uid = -1
+    while next_uid < number_of_nodes and uid + 1 < next_uid:
+        uid += 1
+        if depths[uid] >= max_depth:
+            continue
+        number_of_children = min(int(rng.integers(1, fan_out + 1)), number_of_nodes - next_uid)
+        parent_uids[next_uid:next_uid + number_of_children] = uid
+        depths[next_uid:next_uid + number_of_children] = depths[uid] + 1
+        next_uid += number_of_children
+    if next_uid < number_of_nodes:
+        # the depth limit was reached; the remaining nodes are attached to random nodes above it
+        candidates = np.flatnonzero(depths[:next_uid] < max_depth)
+        parents = rng.choice(candidates, size=number_of_nodes - next_uid)
+        parent_uids[next_uid:] = parents
+        depths[next_uid:] = depths[parents] + 1
+    return parent_uids, depths
+
+
+def generate_supply_chain_dag(number_of_activities: int, max_depth: int = 8, fan_out: int = 4, seed: int = 42) -> tuple:
+    """
+    Returns the exchanges `(consumer, supplier, amount)` of a random layered supply chain DAG,
+    and the level of every activity. Activity 0 is the only activity on level 0;
+    every activity above the last level has `fan_out` suppliers on deeper levels.
+    Amounts are small enough for the supply chain to converge.
+    """
+    rng = np.random.default_rng(seed)
+    levels = np.concatenate([[0], np.sort(rng.integers(1, max_depth, size=number_of_activities - 1))])
+    exchanges = []
+    for consumer in range(number_of_activities):
+        deeper = np.flatnonzero(levels > levels[consumer])
+        if not len(deeper):
+            continue
+        suppliers = rng.choice(deeper, size=min(fan_out, len(deeper)), replace=False)
+        amounts = rng.uniform(0.01, 0.5, size=len(suppliers))
+        exchanges.extend(zip([consumer] * len(suppliers), suppliers.tolist(), amounts.tolist()))
+    return exchanges, levels
+
+
+def generate_sparql_bindings(exchanges: list, number_of_activities: int, flows_per_activity: int = 2, seed: int = 42) -> tuple:
+    """
+    Returns synthetic results of `sparql_queries.get_technosphere` and `sparql_queries.get_biosphere`
+    for the supply chain DAG `exchanges` (see `generate_supply_chain_dag`), in the same (parsed) format.
+    """
+    rng = np.random.default_rng(seed)
+
+    def uri(activity: int) -> str:
+        return f'https://example.org/wiser/activity/{activity}'
+
+    technosphere = [
+        {
+            'src': uri(0),
+            'parentElement': uri(consumer),
+            'parent': f'Activity {consumer}',
+            'childElement': uri(supplier),
+            'child': f'Activity {supplier}',
+            'location': 'GLO',
+            'value': str(amount),
+            'unit': 'USD',
+            'parentLocation': 'GLO',
+            'parentUnit': 'USD',
+        }
+        for consumer, supplier, amount in exchanges
+    ]
+    biosphere = [
+        {
+            'src': uri(0),
+            'parentElement': uri(activity),
+            'srcLabel': f'Activity {activity}',
+            'exchangeName': f'Carbon dioxide {flow}',
+            'unit': 'kg',
+            'value': str(float(rng.uniform(0, 1))),
+            'category': 'air',
+            'subCategory': 'unspecified',
+            'isOutput': 'true',
+            'isInput': None,
+        }
+        for activity in range(number_of_activities)
+        for flow in range(flows_per_activity)
+    ]
+    return technosphere, biosphere
+
+
+def write_supply_chain_database(exchanges: list, number_of_activities: int, seed: int = 42) -> tuple:
+    """
+    Writes the supply chain DAG `exchanges` with one emission per activity and a method characterizing it,
+    using bulk `Database.write`. Returns the reference activity (activity 0) and the ids of all activities.
+    """
+    rng = np.random.default_rng(seed)
+    bd.Database(BIOSPHERE).write({
+        (BIOSPHERE, 'co2'): {'name': 'Carbon Dioxide', 'type': 'emission', 'unit': 'kg', 'categories': ('air',)},
+    })
+    data = {
+        (TECHNOSPHERE, f'a{index}'): {
+            'name': f'Activity {index}',
+            'unit': 'USD',
+            'location': 'GLO',
+            'type': 'process',
+            'exchanges': [
+                {'input': (TECHNOSPHERE, f'a{index}'), 'amount': 1, 'type': 'production'},
+                {'input': (BIOSPHERE, 'co2'), 'amount': float(rng.uniform(0, 1)), 'type': 'biosphere'},
+            ],
+        }
+        for index in range(number_of_activities)
+    }
+    for consumer, supplier, amount in exchanges:
+        data[(TECHNOSPHERE, f'a{consumer}')]['exchanges'].append(
+            {'input': (TECHNOSPHERE, f'a{supplier}'), 'amount': amount, 'type': 'technosphere'}
+        )
+    bd.Database(TECHNOSPHERE).write(data)
+    bd.Method(METHOD).write([((BIOSPHERE, 'co2'), 1.0)])
+    query = ActivityDataset.select(ActivityDataset.id).where(ActivityDataset.database == TECHNOSPHERE)
+    activity_ids = np.array([row[0] for row in query.tuples()], dtype=np.int64)
+    return bd.get_node(database=TECHNOSPHERE, code='a0'), activity_ids
+
+
+def create_traversal_objects(parent_uids: np.ndarray, depths: np.ndarray, activity_ids: np.ndarray, seed: int = 42) -> tuple:
+    """
+    Returns the `nodes` dictionary and `edges` list of a `bw_graph_tools` graph traversal with the shape of a tree
+    (see `generate_supply_chain_tree`), including the functional unit node (-1) and its edge.
+    """
+    rng = np.random.default_rng(seed)
+    number_of_nodes = len(parent_uids)
+    supply_amounts = rng.lognormal(size=number_of_nodes)
+    direct_scores = rng.lognormal(size=number_of_nodes)
+    node_activity_ids = activity_ids[rng.integers(0, len(activity_ids), size=number_of_nodes)]
+
+    def create_node(uid: int, activity_id: int, depth: int, supply_amount: float, direct_score: float) -> Node:
+        return Node(
+            unique_id=uid,
+            activity_datapackage_id=activity_id,
+            activity_index=uid,
+            reference_product_datapackage_id=activity_id,
+            reference_product_index=uid,
+            reference_product_production_amount=1.0,
+            depth=depth,
+            supply_amount=supply_amount,
+            cumulative_score=direct_score,
+            direct_emissions_score=direct_score,
+        )
+
+    nodes = {-1: create_node(-1, -1, 0, 1.0, 0.0)}
+    for uid in range(number_of_nodes):
+        nodes[uid] = create_node(uid, int(node_activity_ids[uid]), int(depths[uid]), float(supply_amounts[uid]), float(direct_scores[uid]))
+    edges = [
+        Edge(consumer_index=-1, consumer_unique_id=-1, producer_index=0, producer_unique_id=0, product_index=0, amount=1.0)
+    ] + [
+        Edge(consumer_index=int(parent), consumer_unique_id=int(parent), producer_index=uid, producer_unique_id=uid, product_index=uid, amount=1.0)
+        for uid, parent in enumerate(parent_uids.tolist()) if parent >= 0
+    ]
+    return nodes, edges
+
+
+def create_user_input(df: pd.DataFrame, share_edited: float = 0.01, seed: int = 42) -> pd.DataFrame:
+    """
+    Returns a copy of the traversal table `df` in which a share of the rows has edited supply amounts and burden intensities.
+    """
+    rng = np.random.default_rng(seed)
+    df_user = df.copy()
+    rows = rng.choice(np.arange(1, len(df)), size=max(2, int(len(df) * share_edited)), replace=False)
+    half = len(rows) // 2
+    df_user.loc[rows[:half], 'SupplyAmount'] *= 2
+    df_user.loc[rows[half:], 'BurdenIntensity'] *= 0.5
+    return df_user
+
+
+# Measurement
+
+def measure(function, setup, repetitions: int) -> dict:
+    """
+    Returns the median and minimum wall time of `repetitions` calls of `function(setup())`
+    and the peak memory allocated by one additional call. `setup` is not timed.
+    """
+    wall_times = []
+    for _ in range(repetitions):
+        argument = setup()
+        start = time.perf_counter()
+        function(argument)
+        wall_times.append(time.perf_counter() - start)
+    argument = setup()
+    tracemalloc.start()
+    function(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'wall_time_s': float(np.median(wall_times)),
+        'wall_time_min_s': float(np.min(wall_times)),
+        'peak_memory_mb': peak / 1e6,
+    }
+
+
+def get_environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'bw2data': '.'.join(map(str, bd.__version__)) if isinstance(bd.__version__, tuple) else str(bd.__version__),
+        'bw2calc': '.'.join(map(str, bc.__version__)) if isinstance(bc.__version__, tuple) else str(bc.__version__),
+    }
+
+
+# Benchmarks
+
+def benchmark_tree_functions(number_of_rows: int, activity_ids: np.ndarray, args) -> list:
+    """
+    Benchmarks the functions operating on graph traversal results and supply chain tables.
+    """
+    parent_uids, depths = generate_supply_chain_tree(number_of_rows, max_depth=args.max_depth, fan_out=args.fan_out)
+    nodes, edges = create_traversal_objects(parent_uids, depths, activity_ids)
+    df_traversal = lca_model.compact_traversal_table(lca_model.nodes_dict_to_dataframe(nodes).assign(ParentUID=parent_uids))
+    df_traversal['Scope'] = np.where(df_traversal['UID'] == 0, 1, 3)
+    df_user = create_user_input(df_traversal)
+    legacy = number_of_rows <= args.legacy_max_rows
+
+    def legacy_input(stage: int):
+        def setup():
+            df = df_traversal.copy()
+            df['Branch'] = branches_from_parent_uids(df['UID'].to_numpy(), df['ParentUID'].to_numpy())
+            df = lca_model.determine_edited_rows(lca_model.create_user_input_columns(df_original=df, df_user_input=df_user))
+            if stage >= 1:
+                df = lca_model.update_production_based_on_user_data(df)
+            if stage >= 2:
+                df = lca_model.update_burden_intensity_based_on_user_data(df)
+            return df
+        return setup
+
+    def fused_input():
+        panel_lca = PanelLCA()
+        panel_lca.df_traversal = df_traversal
+        panel_lca.df_tabulator_from_user = df_user
+        return panel_lca
+
+    benchmarks = {
+        'nodes_dict_to_dataframe': (lca_model.nodes_dict_to_dataframe, lambda: nodes, True),
+        'edges_dict_to_dataframe': (lca_model.edges_dict_to_dataframe, lambda: edges, True),
+        'add_branch_information_to_edges_dataframe': (
+            lca_model.add_branch_information_to_edges_dataframe, lambda: lca_model.edges_dict_to_dataframe(edges), legacy,
+        ),
+        'update_production_based_on_user_data': (lca_model.update_production_based_on_user_data, legacy_input(0), legacy),
+        'update_burden_intensity_based_on_user_data': (lca_model.update_burden_intensity_based_on_user_data, legacy_input(1), legacy),
+        'update_burden_based_on_user_data': (lca_model.update_burden_based_on_user_data, legacy_input(2), legacy),
+        'update_data_based_on_user_input': (PanelLCA.update_data_based_on_user_input, fused_input, True),
+        'scope_aggregation': (ScopeAggregator, lambda: df_traversal, True),
+        'determine_scope_emissions': (determine_scope_emissions, lambda: df_traversal, True),
+    }
+    list_results = []
+    for name, (function, setup, enabled) in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        if not enabled:
+            print(f'Skipping {name} for {number_of_rows} rows (see --legacy-max-rows)')
+            continue
+        list_results.append({'benchmark': name, 'size': number_of_rows, **measure(function, setup, args.repetitions)})
+    return list_results
+
+
+def benchmark_database_functions(number_of_activities: int, args) -> list:
+    """
+    Benchmarks SPARQL ingestion, the LCA calculation and the graph traversal on a supply chain DAG.
+    """
+    exchanges, _ = generate_supply_chain_dag(number_of_activities, max_depth=args.max_depth, fan_out=args.fan_out)
+    list_results = []
+
+    if not args.only or 'ingestion' in args.only:
+        technosphere, biosphere = generate_sparql_bindings(exchanges, number_of_activities)
+        lca_model.get_technosphere = lambda selected_src: technosphere
+        lca_model.get_biosphere = lambda selected_src: biosphere
+
+        def ingestion_setup():
+            project = f'suite_ingestion_{number_of_activities}'
+            if project in bd.projects:
+                bd.projects.delete_project(project, delete_dir=True)
+            bd.projects.set_current(project)
+            panel_lca = PanelLCA()
+            panel_lca.db_name = project
+            panel_lca.create_empty_db_with_co2_and_ipcc_sample()
+            panel_lca.dict_label_to_src = {'Activity 0': technosphere[0]['src']}
+            return panel_lca
+
+        list_results.append({
+            'benchmark': 'ingestion',
+            'size': number_of_activities,
+            'bindings': len(technosphere) + len(biosphere),
+            **measure(lambda panel_lca: panel_lca.get_src_and_get_technosphere_and_biosphere('Activity 0'), ingestion_setup, args.repetitions),
+        })
+
+    bd.projects.set_current(f'suite_database_{number_of_activities}')
+    activity, _ = write_supply_chain_database(exchanges, number_of_activities)
+    panel_lca = PanelLCA()
+    panel_lca.chosen_activity = activity
+    panel_lca.chosen_method = bd.Method(METHOD)
+    panel_lca.chosen_amount = 1
+    panel_lca.perform_lca()
+
+    if not args.only or 'perform_lca' in args.only:
+        # without and with the on-disk matrix cache (see `matrix_cache.py`), which has been filled by the call above
+        for name, matrix_cache_directory in [('perform_lca', 'off'), ('perform_lca[matrix cache]', '')]:
+            def lca_setup():
+                os.environ['LCA_MATRIX_CACHE_DIR'] = matrix_cache_directory
+                return panel_lca
+            list_results.append({
+                'benchmark': name,
+                'size': number_of_activities,
+                **measure(PanelLCA.perform_lca, lca_setup, args.repetitions),
+            })
+        os.environ.pop('LCA_MATRIX_CACHE_DIR')
+    if not args.only or 'graph_traversal' in args.only:
+        for engine in lca_model.GRAPH_TRAVERSAL_ENGINES:
+            def traversal_setup():
+                panel_lca.traversal_cache.clear()
+                panel_lca.set_graph_traversal_engine(engine)
+                panel_lca.set_graph_traversal_cutoff(args.cutoff)
+                return panel_lca
+            list_results.append({
+                'benchmark': f'graph_traversal[{engine}]',
+                'size': number_of_activities,
+                **measure(PanelLCA.perform_graph_traversal, traversal_setup, args.repetitions),
+            })
+    return list_results
+
+
+def compare_with_baseline(list_results: list, path: str, tolerance: float) -> bool:
+    """
+    Prints the wall time ratios to the results in the JSON file `path`.
+    Returns `True` if no benchmark became slower by more than `tolerance` (relative).
+    """
+    with open(path) as file:
+        baseline = {(row['benchmark'], row['size']): row for row in json.load(file)['results']}
+    passed = True
+    for row in list_results:
+        reference = baseline.get((row['benchmark'], row['size']))
+        if reference is None:
+            continue
+        ratio = row['wall_time_s'] / reference['wall_time_s']
+        regression = ratio > 1 + tolerance
+        passed &= not regression
+        print(f"{row['benchmark']:<45} {row['size']:>9,} {ratio:8.2f}x{'  REGRESSION' if regression else ''}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000], help='Sizes of the supply chain trees.')
+    parser.add_argument('--activities', type=int, nargs='+', default=[100, 500], help='Sizes of the supply chain DAGs.')
+    parser.add_argument('--max-depth', type=int, default=8)
+    parser.add_argument('--fan-out', type=int, default=4)
+    parser.add_argument('--cutoff', type=float, default=0.001)
+    parser.add_argument('--legacy-max-rows', type=int, default=2_000)
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--only', type=str, nargs='+', default=None, help='Names of the benchmarks to run.')
+    parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare with the results in this JSON file.')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    try:
+        list_results = []
+        for number_of_activities in args.activities:
+            list_results.extend(benchmark_database_functions(number_of_activities, args))
+        # tree benchmarks use the activities of the last database for the name lookups
+        _, activity_ids = write_supply_chain_database([], max(args.activities))
+        for number_of_rows in args.rows:
+            list_results.extend(benchmark_tree_functions(number_of_rows, activity_ids, args))
+        environment = get_environment()
+    finally:
+        shutil.rmtree(os.environ['BRIGHTWAY2_DIR'], ignore_errors=True)
+
+    df_results = pd.DataFrame(list_results)
+    print(df_results.to_string(index=False, float_format='{:,.4f}'.format))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'environment': environment, 'arguments': vars(args), 'results': list_results}, file, indent=2)
+    if args.baseline and not compare_with_baseline(list_results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# %%
+"""
+Compares the legacy chain of user input functions
+(`create_user_input_columns` -> `determine_edited_rows` -> `update_production_based_on_user_data`
+-> `update_burden_intensity_based_on_user_data` -> `update_burden_based_on_user_data` -> `.copy()`)
+with the fused `PanelLCA.update_data_based_on_user_input` on synthetic supply chain trees.
+
+Reports wall time and peak memory (tracemalloc) for 1k/10k/100k rows.
+The legacy chain scales quadratically; by default it is skipped above 10k rows (see `--legacy-max-rows`).
+
+Usage (from the repository root):
+
+    python dev/benchmark_user_input_pipeline.py
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import lca_model
+from lca_model import PanelLCA
+from graph_traversal import branches_from_parent_uids
+
+
+def create_synthetic_traversal_table(number_of_rows: int, max_children: int = 8, seed: int = 42) -> pd.DataFrame:
+    """
+    Returns a synthetic traversal table (same columns as `PanelLCA.df_traversal`) of a random tree.
+    """
+    rng = np.random.default_rng(seed)
+    parent_uids = np.full(number_of_rows, -1, dtype=np.int64)
+    depths = np.ones(number_of_rows, dtype=np.int64)
+    # breadth-first: every node gets a random number of children
+    next_uid = 1
+    for uid in range(number_of_rows):
+        number_of_children = min(int(rng.integers(1, max_children + 1)), number_of_rows - next_uid)
+        parent_uids[next_uid:next_uid + number_of_children] = uid
+        depths[next_uid:next_uid + number_of_children] = depths[uid] + 1
+        next_uid += number_of_children
+        if next_uid >= number_of_rows:
+            break
+    supply_amount = rng.lognormal(size=number_of_rows)
+    burden_intensity = rng.lognormal(size=number_of_rows)
+    df = pd.DataFrame({
+        'UID': np.arange(number_of_rows),
+        'Scope': np.where(np.arange(number_of_rows) == 0, 1, 3),
+        'Name': pd.Categorical([f'Activity {i % 1000}' for i in range(number_of_rows)]),
+        'SupplyAmount': supply_amount,
+        'BurdenIntensity': burden_intensity,
+        'Burden(Direct)': supply_amount * burden_intensity,
+        'Burden(Cumulative)': supply_amount * burden_intensity,
+        'Depth': depths,
+        'activity_datapackage_id': np.arange(number_of_rows) % 1000,
+        'ParentUID': parent_uids,
+    })
+    return lca_model.compact_traversal_table(df)
+
+
+def create_synthetic_user_input(df: pd.DataFrame, share_edited: float = 0.01, seed: int = 42) -> pd.DataFrame:
+    """
+    Returns a copy of `df` in which a share of the rows has edited supply amounts and/or burden intensities.
+    """
+    rng = np.random.default_rng(seed)
+    df_user = df.copy()
+    rows = rng.choice(np.arange(1, len(df)), size=max(1, int(len(df) * share_edited)), replace=False)
+    half = len(rows) // 2
+    df_user.loc[rows[:half + 1], 'SupplyAmount'] *= rng.uniform(0.5, 2, size=len(rows[:half + 1]))
+    df_user.loc[rows[half:], 'BurdenIntensity'] *= rng.uniform(0.5, 2, size=len(rows[half:]))
+    return df_user
+
+
+def run_legacy_chain(df_original: pd.DataFrame, df_user: pd.DataFrame) -> pd.DataFrame:
+    df_original = df_original.copy()
+    df_original['Branch'] = branches_from_parent_uids(df_original['UID'].to_numpy(), df_original['ParentUID'].to_numpy())
+    df = lca_model.create_user_input_columns(df_original=df_original, df_user_input=df_user)
+    df = lca_model.determine_edited_rows(df=df)
+    df = lca_model.update_production_based_on_user_data(df=df)
+    df = lca_model.update_burden_intensity_based_on_user_data(df=df)
+    df = lca_model.update_burden_based_on_user_data(df)
+    return df.copy()
+
+
+def run_fused_pipeline(df_original: pd.DataFrame, df_user: pd.DataFrame) -> pd.DataFrame:
+    panel_lca = PanelLCA()
+    panel_lca.df_traversal = df_original
+    panel_lca.df_tabulator_from_user = df_user
+    panel_lca.update_data_based_on_user_input()
+    return panel_lca.df_tabulator
+
+
+def measure(function, *args) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    wall_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'wall_time_s': wall_time, 'peak_memory_mb': peak / 1e6, 'result': result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--legacy-max-rows', type=int, default=10_000)
+    parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file.')
+    args = parser.parse_args()
+
+    list_results = []
+    for number_of_rows in args.rows:
+        df_original = create_synthetic_traversal_table(number_of_rows)
+        df_user = create_synthetic_user_input(df_original)
+        fused = measure(run_fused_pipeline, df_original, df_user)
+        row = {
+            'rows': number_of_rows,
+            'fused_wall_time_s': fused['wall_time_s'],
+            'fused_peak_memory_mb': fused['peak_memory_mb'],
+            'legacy_wall_time_s': None,
+            'legacy_peak_memory_mb': None,
+        }
+        if number_of_rows <= args.legacy_max_rows:
+            legacy = measure(run_legacy_chain, df_original, df_user)
+            row['legacy_wall_time_s'] = legacy['wall_time_s']
+            row['legacy_peak_memory_mb'] = legacy['peak_memory_mb']
+            assert np.allclose(legacy['result']['Burden(Direct)'], fused['result']['Burden(Direct)'])
+        list_results.append(row)
+
+    df_results = pd.DataFrame(list_results)
+    print(df_results.to_string(index=False, float_format='{:,.4f}'.format))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(list_results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# %%
+"""
+Compares the what-if path of the "Update Data based on User Input" button (`PanelLCA.apply_user_input`)
+with a full recompute (LCA calculation, graph traversal without cache and scope analysis)
+on a synthetic Brightway database.
+
+The database is written to a temporary Brightway directory, which is deleted afterwards.
+Reports the median wall time of several repetitions.
+
+Usage (from the repository root):
+
+    python dev/benchmark_what_if.py
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+
+os.environ['BRIGHTWAY2_DIR'] = tempfile.mkdtemp(prefix='bw_benchmark_')
+
+import numpy as np
+import pandas as pd
+import bw2data as bd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from lca_model import PanelLCA
+
+
+def create_synthetic_database(number_of_activities: int, number_of_inputs: int, seed: int = 42) -> tuple:
+    """
+    Writes a random supply chain database with one biosphere flow and a method characterizing it.
+    Returns the reference activity and the method tuple.
+    """
+    rng = np.random.default_rng(seed)
+    bd.projects.set_current('benchmark_what_if')
+    bd.Database('benchmark_biosphere').write({
+        ('benchmark_biosphere', 'co2'): {'name': 'Carbon Dioxide', 'type': 'emission', 'unit': 'kg', 'categories': ('air',)},
+    })
+    data = {}
+    for index in range(number_of_activities):
+        suppliers = rng.choice(number_of_activities, size=number_of_inputs, replace=False)
+        data[('benchmark_technosphere', f'a{index}')] = {
+            'name': f'Activity {index}',
+            'unit': 'USD',
+            'location': 'GLO',
+            'type': 'process',
+            'exchanges': [
+                {'input': ('benchmark_technosphere', f'a{index}'), 'amount': 1, 'type': 'production'},
+                {'input': ('benchmark_biosphere', 'co2'), 'amount': float(rng.uniform(0, 1)), 'type': 'biosphere'},
+            ] + [
+                {'input': ('benchmark_technosphere', f'a{supplier}'), 'amount': float(rng.uniform(0.01, 0.2)), 'type': 'technosphere'}
+                for supplier in suppliers if supplier != index
+            ],
+        }
+    bd.Database('benchmark_technosphere').write(data)
+    method = ('benchmark', 'GWP')
+    bd.Method(method).write([(('benchmark_biosphere', 'co2'), 1.0)])
+    return bd.get_node(database='benchmark_technosphere', code='a0'), method
+
+
+def run_full_recompute(panel_lca: PanelLCA):
+    panel_lca.perform_lca()
+    panel_lca.traversal_cache.clear()
+    panel_lca.perform_graph_traversal()
+    panel_lca.set_df_tabulator_from_traversal()
+    panel_lca.perform_scope_analysis(df=panel_lca.df_tabulator)
+
+
+def create_user_input(panel_lca: PanelLCA, number_of_edits: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Returns a copy of the table shown to the user with `number_of_edits` edited supply amounts and burden intensities.
+    """
+    rng = np.random.default_rng(seed)
+    df_user = panel_lca.df_tabulator.copy()
+    rows = rng.choice(np.arange(1, len(df_user)), size=min(number_of_edits, len(df_user) - 1), replace=False)
+    half = len(rows) // 2
+    df_user.loc[rows[:half], 'SupplyAmount'] *= 2
+    df_user.loc[rows[half:], 'BurdenIntensity'] *= 0.5
+    return df_user
+
+
+def median_wall_time(function, repetitions: int, setup=None) -> float:
+    wall_times = []
+    for _ in range(repetitions):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        wall_times.append(time.perf_counter() - start)
+    return float(np.median(wall_times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--activities', type=int, default=2000)
+    parser.add_argument('--inputs', type=int, default=4)
+    parser.add_argument('--cutoffs', type=float, nargs='+', default=[0.01, 0.001, 0.0001])
+    parser.add_argument('--edits', type=int, default=10)
+    parser.add_argument('--engine', type=str, default='sparse')
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file.')
+    args = parser.parse_args()
+
+    try:
+        activity, method = create_synthetic_database(args.activities, args.inputs)
+        panel_lca = PanelLCA()
+        panel_lca.chosen_activity = activity
+        panel_lca.chosen_method = bd.Method(method)
+        panel_lca.chosen_amount = 100
+        panel_lca.set_graph_traversal_engine(args.engine)
+
+        list_results = []
+        for cutoff in args.cutoffs:
+            panel_lca.set_graph_traversal_cutoff(cutoff)
+            full_recompute = median_wall_time(lambda: run_full_recompute(panel_lca), args.repetitions)
+            df_user = create_user_input(panel_lca, args.edits)
+
+            def reset():
+                panel_lca.set_df_tabulator_from_traversal()
+                panel_lca.perform_scope_analysis(df=panel_lca.df_tabulator)
+
+            what_if = median_wall_time(lambda: panel_lca.apply_user_input(df_user), args.repetitions, setup=reset)
+            list_results.append({
+                'cutoff': cutoff,
+                'rows': len(panel_lca.df_tabulator),
+                'edits': args.edits,
+                'full_recompute_s': full_recompute,
+                'what_if_s': what_if,
+                'speedup': full_recompute / what_if,
+            })
+    finally:
+        shutil.rmtree(os.environ['BRIGHTWAY2_DIR'], ignore_errors=True)
+
+    df_results = pd.DataFrame(list_results)
+    print(df_results.to_string(index=False, float_format='{:,.4f}'.format))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(list_results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
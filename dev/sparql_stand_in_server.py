@@ -0,0 +1,80 @@
+# %%
+"""
+Local stand-in for the WISER SPARQL endpoint, for offline and repeatable load tests.
+
+Serves the responses of a backend of `app/sparql_backends.py` (synthetic supply chain or recorded responses)
+as `application/sparql-results+json` over HTTP, using only the standard library.
+Queries are accepted as GET (`?query=...`), as form-encoded POST or as `application/sparql-query` POST.
+
+Point the app to the stand-in by setting `SPARQL_ENDPOINT_URL` to `http://localhost:<port>/sparql`,
+or use the backends in-process without a server (environment variable `SPARQL_BACKEND`).
+
+Usage (from the repository root):
+
+    python dev/sparql_stand_in_server.py --backend synthetic:1000,4,2 --latency-ms 50 --port 8890
+    python dev/sparql_stand_in_server.py --backend recorded:dev/sparql_fixtures
+"""
+import os
+import sys
+import json
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from sparql_backends import create_sparql_backend
+
+
+def create_handler(backend):
+    class SPARQLRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            self.answer(parse_qs(url.query).get('query', [None])[0])
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+            if self.headers.get('Content-Type', '').startswith('application/sparql-query'):
+                self.answer(body)
+            else:
+                self.answer(parse_qs(body).get('query', [None])[0])
+
+        def answer(self, query: str):
+            if not query:
+                self.send_error(400, 'Missing query')
+                return
+            try:
+                response = backend.query(query, endpoint_url=None)
+            except (LookupError, ValueError) as error:
+                self.send_error(404, str(error))
+                return
+            payload = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/sparql-results+json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return SPARQLRequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', type=str, default='synthetic', help="See `sparql_backends.create_sparql_backend`.")
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=8890)
+    args = parser.parse_args()
+
+    backend = create_sparql_backend(args.backend, latency_ms=args.latency_ms)
+    server = ThreadingHTTPServer((args.host, args.port), create_handler(backend))
+    print(f'Serving {args.backend} on http://{args.host}:{args.port}/sparql')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
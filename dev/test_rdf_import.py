@@ -0,0 +1,161 @@
+# %%
+"""
+Tests of the streaming Turtle parser of `app/rdf_import.py`:
+prefixes and base, predicate and object lists (`;` and `,`), blank node property lists (`[ ... ]`),
+collections (`( ... )`), long strings and escape sequences.
+
+Usage (from the repository root):
+
+    python -m pytest dev/test_rdf_import.py
+"""
+import io
+import os
+import sys
+import tempfile
+
+os.environ['BRIGHTWAY2_DIR'] = tempfile.mkdtemp(prefix='bw_test_rdf_import_')
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from rdf_import import TurtleParser, iter_turtle_tokens, RDF_TYPE, RDF_FIRST, RDF_REST, RDF_NIL
+
+EX = 'http://example.org/'
+
+
+def parse(turtle: str, block_lines: int = 1000) -> list:
+    parser = TurtleParser(io.StringIO(''))
+    # the file is tokenized in small blocks, so that long strings span blocks
+    parser.tokens = iter_turtle_tokens(io.StringIO(turtle), block_lines=block_lines)
+    parser.token = next(parser.tokens, None)
+    return list(parser)
+
+
+def test_prefixes_and_base():
+    triples = parse(
+        '@prefix ex: <http://example.org/> .\n'
+        'PREFIX wiser: <https://purl.org/wiser#>\n'
+        '@base <http://example.org/base/> .\n'
+        'ex:a wiser:hasName <relative> .\n'
+        'ex:b a ex:Type .\n'
+    )
+    assert triples == [
+        (EX + 'a', 'https://purl.org/wiser#hasName', EX + 'base/relative'),
+        (EX + 'b', RDF_TYPE, EX + 'Type'),
+    ]
+
+
+def test_undefined_prefix():
+    with pytest.raises(SyntaxError):
+        parse('ex:a ex:b ex:c .\n')
+
+
+def test_predicate_and_object_lists():
+    triples = parse(
+        '@prefix ex: <http://example.org/> .\n'
+        'ex:a ex:p ex:b, ex:c ;\n'
+        '     ex:q "x", 1.5, -2, true ;\n'
+        '     ;\n'
+        '     ex:r 3e2 ;\n'
+        '.\n'
+    )
+    assert triples == [
+        (EX + 'a', EX + 'p', EX + 'b'),
+        (EX + 'a', EX + 'p', EX + 'c'),
+        (EX + 'a', EX + 'q', 'x'),
+        (EX + 'a', EX + 'q', '1.5'),
+        (EX + 'a', EX + 'q', '-2'),
+        (EX + 'a', EX + 'q', 'true'),
+        (EX + 'a', EX + 'r', '3e2'),
+    ]
+
+
+def test_blank_node_property_lists():
+    triples = parse(
+        '@prefix ex: <http://example.org/> .\n'
+        'ex:a ex:p [ ex:q ex:b ; ex:r [ ex:s "nested" ] ] .\n'
+        '[ ex:t ex:c ] .\n'
+        'ex:d ex:p [] .\n'
+    )
+    # triples of nested nodes come first; only the set of triples is compared
+    assert sorted(triples) == sorted([
+        ('_:genid1', EX + 's', 'nested'),
+        ('_:genid0', EX + 'q', EX + 'b'),
+        ('_:genid0', EX + 'r', '_:genid1'),
+        (EX + 'a', EX + 'p', '_:genid0'),
+        ('_:genid2', EX + 't', EX + 'c'),
+        (EX + 'd', EX + 'p', '_:genid3'),
+    ])
+
+
+def test_collections():
+    triples = parse(
+        '@prefix ex: <http://example.org/> .\n'
+        'ex:a ex:p ( ex:b "c" ) .\n'
+        'ex:d ex:p () .\n'
+    )
+    assert triples == [
+        ('_:genid0', RDF_FIRST, EX + 'b'),
+        ('_:genid0', RDF_REST, '_:genid1'),
+        ('_:genid1', RDF_FIRST, 'c'),
+        ('_:genid1', RDF_REST, RDF_NIL),
+        (EX + 'a', EX + 'p', '_:genid0'),
+        (EX + 'd', EX + 'p', RDF_NIL),
+    ]
+
+
+def test_literals_with_language_and_datatype():
+    triples = parse(
+        '@prefix ex: <http://example.org/> .\n'
+        '@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .\n'
+        'ex:a ex:p "chat"@fr-CA, "1.0"^^xsd:decimal, \'single\'^^<http://example.org/type> .\n'
+    )
+    assert [obj for _, _, obj in triples] == ['chat', '1.0', 'single']
+
+
+@pytest.mark.parametrize('block_lines', [1, 2, 1000])
+def test_long_strings(block_lines):
+    triples = parse(
+        '@prefix ex: <http://example.org/> .\n'
+        '# a comment with """ is not the start of a long string\n'
+        'ex:a ex:p """first\n'
+        'line with "quotes" and \'\'\' inside\n'
+        'last""" .\n'
+        'ex:b ex:p "short string with \\"\\"\\" escaped quotes" .\n'
+        'ex:c ex:p \'\'\'single\n'
+        'quoted\'\'\' .\n'
+        'ex:d ex:p <http://example.org/"""> .\n'
+        'ex:e ex:p """""" .\n',
+        block_lines=block_lines,
+    )
+    assert triples == [
+        (EX + 'a', EX + 'p', 'first\nline with "quotes" and \'\'\' inside\nlast'),
+        (EX + 'b', EX + 'p', 'short string with """ escaped quotes'),
+        (EX + 'c', EX + 'p', 'single\nquoted'),
+        (EX + 'd', EX + 'p', 'http://example.org/"""'),
+        (EX + 'e', EX + 'p', ''),
+    ]
+
+
+def test_unterminated_long_string():
+    with pytest.raises(SyntaxError):
+        parse('<http://example.org/a> <http://example.org/p> """never closed .\n', block_lines=1)
+
+
+def test_escapes():
+    triples = parse(
+        '@prefix ex: <http://example.org/> .\n'
+        'ex:a ex:p "tab\\tnewline\\nquote\\"backslash\\\\" .\n'
+        'ex:a ex:p "\\u00e9\\U0001F600" .\n'
+        '<http://example.org/\\u0062> ex:local\\-name "x" .\n'
+    )
+    assert triples == [
+        (EX + 'a', EX + 'p', 'tab\tnewline\nquote"backslash\\'),
+        (EX + 'a', EX + 'p', 'é\U0001F600'),
+        (EX + 'b', EX + 'local-name', 'x'),
+    ]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
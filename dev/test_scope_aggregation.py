@@ -0,0 +1,68 @@
+# %%
+"""
+Tests of the scope, depth and branch totals of `ScopeAggregator` in `app/scope_aggregation.py`,
+including rows with missing burdens (eg. cleared cells of the table).
+
+Usage (from the repository root):
+
+    python -m pytest dev/test_scope_aggregation.py
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from scope_aggregation import ScopeAggregator
+
+
+def create_traversal_table() -> pd.DataFrame:
+    # reference product 0 with the direct suppliers 1 and 2; 3 supplies 1, 4 supplies 2
+    return pd.DataFrame({
+        'UID': [0, 1, 2, 3, 4],
+        'Scope': [1, 2, 3, 3, 1],
+        'Depth': [1, 2, 2, 3, 3],
+        'ParentUID': [-1, 0, 0, 1, 2],
+        'Burden(Direct)': [1.0, 2.0, 4.0, np.nan, 8.0],
+    })
+
+
+def test_totals_skip_missing_burdens():
+    aggregator = ScopeAggregator(create_traversal_table())
+    assert aggregator.scope_dict == {'Scope 1': 9.0, 'Scope 2': 2.0, 'Scope 3': 4.0}
+    assert aggregator.depth_dict == {1: 1.0, 2: 6.0, 3: 8.0}
+    assert aggregator.branch_dict == {0: 1.0, 1: 2.0, 2: 12.0}
+    assert aggregator.total == 15.0
+
+
+def test_update_row_with_missing_burden():
+    aggregator = ScopeAggregator(create_traversal_table())
+    aggregator.update_row(2, burden=np.nan)
+    aggregator.update_row(3, burden=16.0, scope=1)
+    assert aggregator.scope_dict == {'Scope 1': 25.0, 'Scope 2': 2.0, 'Scope 3': 0.0}
+    assert aggregator.branch_dict == {0: 1.0, 1: 18.0, 2: 8.0}
+    assert aggregator.total == 27.0
+
+
+def test_update_rows_matches_a_new_aggregation():
+    df = create_traversal_table()
+    aggregator = ScopeAggregator(df)
+    burdens = np.array([np.nan, 3.0])
+    scopes = np.array([2, 2])
+    aggregator.update_rows(np.array([1, 4]), burdens=burdens, scopes=scopes)
+
+    df.loc[df['UID'].isin([1, 4]), 'Burden(Direct)'] = burdens
+    df.loc[df['UID'].isin([1, 4]), 'Scope'] = scopes
+    expected = ScopeAggregator(df)
+    assert aggregator.scope_dict == pytest.approx(expected.scope_dict)
+    assert aggregator.depth_dict == pytest.approx(expected.depth_dict)
+    assert aggregator.branch_dict == pytest.approx(expected.branch_dict)
+    assert aggregator.total == pytest.approx(expected.total)
+    assert not np.isnan(aggregator.total)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))